@@ -1,16 +1,19 @@
 import os
 from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'UCL.settings')
+# Set up Django before the routing below imports any models
+django_asgi_app = get_asgi_application()
+
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
 import tournament.routing
-
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ucl.settings')
+from tournament.viewers import ViewerAuthMiddlewareStack
 
 application = ProtocolTypeRouter({
-    "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "http": django_asgi_app,
+    "websocket": ViewerAuthMiddlewareStack(
         URLRouter(
             tournament.routing.websocket_urlpatterns
         )
     ),
-})
\ No newline at end of file
+})
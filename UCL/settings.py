@@ -133,12 +133,61 @@ LOGIN_URL = '/accounts/login/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-ASGI_APPLICATION = 'ucl.asgi.application'
-CHANNEL_LAYERS = {
-    'default': {
+ASGI_APPLICATION = 'UCL.asgi.application'
+
+# Channel layer profiles, picked with the UCL_CHANNEL_LAYER environment variable.
+# "redis" connects consumers across processes; "memory" runs the realtime path
+# inside one process with no Redis server, for development and benchmarks.
+CHANNEL_LAYER_PROFILES = {
+    'redis': {
         'BACKEND': 'channels_redis.core.RedisChannelLayer',
         'CONFIG': {
             "hosts": [('127.0.0.1', 6379)],
         },
     },
+    'memory': {
+        'BACKEND': 'tournament.layers.LocalChannelLayer',
+    },
 }
+CHANNEL_LAYERS = {
+    'default': CHANNEL_LAYER_PROFILES[os.environ.get('UCL_CHANNEL_LAYER', 'redis')],
+}
+
+# Cache profiles, picked with the UCL_CACHE environment variable. Live score
+# journals and versions are kept in the cache, so a deployment with more than
+# one process needs "redis"; "memory" is private to each process.
+CACHE_PROFILES = {
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    },
+    'memory': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+CACHES = {
+    'default': CACHE_PROFILES[os.environ.get('UCL_CACHE', 'memory')],
+}
+
+# Seconds a live match's score may stay in memory before it is written to the
+# database; None writes only after MAX_PENDING_BALLS balls or a structural change
+LIVE_FLUSH_INTERVAL = 2.0
+
+# Seconds between keep-alive comments on an idle live score event stream
+LIVE_STREAM_HEARTBEAT = 15.0
+
+# Seconds over which a match's score pushes are merged into one frame; None sends each at once
+LIVE_BROADCAST_WINDOW = 0.1
+
+# Frames a match websocket may have queued before it is resynced with a snapshot
+LIVE_SEND_QUEUE_SIZE = 32
+
+# Seconds a signed viewer token admits websocket connections without a session lookup
+LIVE_VIEWER_TOKEN_MAX_AGE = 3 * 60 * 60
+
+# Runs of the remaining fixtures behind the standings page's qualification chances,
+# the worker processes they are spread over (None for one per core) and how many
+# places qualify
+QUALIFICATION_SIMULATIONS = 1_000_000
+QUALIFICATION_WORKERS = None
+QUALIFICATION_PLACES = 4
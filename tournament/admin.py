@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Team, Player, Match, BattingPerformance, BowlingPerformance
+from .models import Team, Player, Match, BattingPerformance, BowlingPerformance, PlayerCareerStats
+from . import standings
 
 class PlayerInline(admin.TabularInline):
     model = Player
@@ -10,6 +11,11 @@ class TeamAdmin(admin.ModelAdmin):
     list_display = ('name', 'home_ground', 'coach', 'founded')
     search_fields = ('name', 'home_ground')
 
+    def changelist_view(self, request, extra_context=None):
+        extra_context = extra_context or {}
+        extra_context['standings'] = standings.compute_standings()
+        return super().changelist_view(request, extra_context=extra_context)
+
 class PlayerAdmin(admin.ModelAdmin):
     list_display = ('name', 'team', 'age', 'role', 'jersey_number')
     list_filter = ('team', 'role', 'batting_style', 'bowling_style')
@@ -20,8 +26,14 @@ class MatchAdmin(admin.ModelAdmin):
     list_filter = ('result', 'date')
     search_fields = ('home_team__name', 'away_team__name', 'venue')
 
+class PlayerCareerStatsAdmin(admin.ModelAdmin):
+    list_display = ('player', 'runs', 'wickets', 'fifties', 'hundreds', 'five_wicket_hauls')
+    search_fields = ('player__name',)
+    list_select_related = ('player',)
+
 admin.site.register(Team, TeamAdmin)
 admin.site.register(Player, PlayerAdmin)
 admin.site.register(Match, MatchAdmin)
 admin.site.register(BattingPerformance)
-admin.site.register(BowlingPerformance)
\ No newline at end of file
+admin.site.register(BowlingPerformance)
+admin.site.register(PlayerCareerStats, PlayerCareerStatsAdmin)
\ No newline at end of file
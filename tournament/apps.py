@@ -1,4 +1,27 @@
+import os
+import sys
+
 from django.apps import AppConfig
+from django.core.signals import request_started
+
+# Programs that serve the site, as opposed to manage.py commands and the tests
+SERVERS = ('daphne', 'gunicorn', 'uvicorn', 'uwsgi')
+
+
+def serving():
+    program = os.path.basename(sys.argv[0]) if sys.argv else ''
+    if program in SERVERS:
+        return True
+    # Under the autoreloader only the child process serves
+    return sys.argv[1:2] == ['runserver'] and (os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv)
+
+
+def prewarm(sender, **kwargs):
+    """Start fitting the win probability table on a server's first request, once the app is up"""
+    from tournament import winprob
+    request_started.disconnect(prewarm, dispatch_uid='winprob_prewarm')
+    winprob.fit_later()
+
 
 class TournamentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
@@ -6,4 +29,6 @@ class TournamentConfig(AppConfig):
 
 
     def ready(self):
-        import tournament.signals
\ No newline at end of file
+        import tournament.signals
+        if serving():
+            request_started.connect(prewarm, dispatch_uid='winprob_prewarm')
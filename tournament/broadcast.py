@@ -0,0 +1,298 @@
+"""
+Live score pushes.
+
+Every change to a live match's score is sent to the match_<id> group that
+MatchConsumer joins, so open pages update as it happens instead of polling
+live_match_data, which is kept as the fallback for clients without a socket.
+
+Pushes are deltas. Each match has a Journal that numbers its events and
+keeps the last RING_SIZE of them, so a client that reconnects with the last
+sequence number it applied is sent only what it missed, or a full snapshot
+when that is no longer held. Journals live in the cache, which every process
+serving the matches has to share (UCL_CACHE=redis) for sequence numbers to
+mean the same thing whichever process a viewer reaches. The epoch changes
+whenever a journal is started afresh, which tells clients their sequence
+numbers no longer mean anything.
+
+The journal position also serves as the version of a match's live score:
+send() stores it in the cache, so live_match_data can answer a poll that
+already has it with a 304 without loading the match.
+
+A burst of scoring actions (a wicket, the next batsman, the end of the over)
+is coalesced: publishes for a match within LIVE_BROADCAST_WINDOW seconds are
+merged, the latest value of each field kept, and sent as one frame.
+counters() reports messages in against frames out. Each frame also updates
+the match's line on the all-matches ticker (see ticker.py).
+"""
+import atexit
+import logging
+import secrets
+import threading
+from collections import Counter
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import ticker, winprob
+
+logger = logging.getLogger(__name__)
+
+RING_SIZE = 128
+VERSION_TIMEOUT = 60 * 60
+JOURNAL_TIMEOUT = 24 * 60 * 60
+BROADCAST_WINDOW = 0.1
+
+# Latest unsent message and its flush timer, per match
+_pending = {}
+_timers = {}
+_pending_lock = threading.Lock()
+_counters = Counter()
+
+
+def group_name(match_id):
+    return f'match_{match_id}'
+
+
+def scoreboard(match):
+    """The live score as pushed to viewers and served by live_match_data"""
+    return {
+        'innings': match.innings,
+        'total_runs': match.total_runs,
+        'total_wickets': match.total_wickets,
+        'current_over': f"{match.current_over}.{match.current_ball}",
+        'current_run_rate': float(match.current_run_rate),
+        'striker': match.striker.name if match.striker else '',
+        'striker_runs': match.striker_runs,
+        'striker_balls': match.striker_balls,
+        'striker_fours': match.striker_fours,
+        'striker_sixes': match.striker_sixes,
+        'non_striker': match.non_striker.name if match.non_striker else '',
+        'non_striker_runs': match.non_striker_runs,
+        'non_striker_balls': match.non_striker_balls,
+        'non_striker_fours': match.non_striker_fours,
+        'non_striker_sixes': match.non_striker_sixes,
+        'bowler': match.bowler.name if match.bowler else '',
+        'bowler_runs': match.bowler_runs,
+        'bowler_wickets': match.bowler_wickets,
+        'bowler_overs': (match.bowler_balls // 6),
+        'partnership_runs': match.partnership_runs,
+        'partnership_balls': match.partnership_balls,
+        'last_wicket': last_wicket(match),
+        # Chance of the chasing side winning, in the second innings only
+        'win_probability': winprob.for_match(match),
+        # Scorecard rows are written behind; pages refetch them when this moves
+        'flushed_ball': match.flushed_ball,
+    }
+
+
+def last_wicket(match):
+    """The latest fall of wicket as "runs-wickets (overs)", worked back from the unbroken partnership"""
+    if not match.total_wickets:
+        return ''
+    runs = match.total_runs - match.partnership_runs
+    balls = match.current_over * 6 + match.current_ball - match.partnership_balls
+    return f"{runs}-{match.total_wickets} ({balls // 6}.{balls % 6})"
+
+
+class Journal:
+    """
+    The numbered event history of one match's feed.
+
+    Kept in the cache rather than in the process, so every process serving a
+    match numbers its events from one counter and resumes viewers from one
+    ring. Under an epoch, the cache holds the counter, the head (the latest
+    sequence number and the full score it left) and the last RING_SIZE
+    events, one key each.
+    """
+    __slots__ = ('match_id',)
+
+    def __init__(self, match_id):
+        self.match_id = match_id
+
+    def _key(self, *parts):
+        return ':'.join(map(str, ('live_journal', self.match_id, *parts)))
+
+    @property
+    def epoch(self):
+        """Started afresh when the cache no longer holds the journal"""
+        key = self._key('epoch')
+        epoch = cache.get(key)
+        if epoch is None:
+            # Whichever process adds first sets it for everyone
+            cache.add(key, secrets.token_hex(4), JOURNAL_TIMEOUT)
+            epoch = cache.get(key)
+        return epoch
+
+    def _head(self, epoch):
+        return cache.get(self._key(epoch, 'head')) or {'seq': 0, 'data': {}}
+
+    @property
+    def seq(self):
+        return self._head(self.epoch)['seq']
+
+    @property
+    def state(self):
+        return self._head(self.epoch)['data']
+
+    def record(self, message):
+        """Number the fields that changed since the last event, or None if nothing did"""
+        epoch = self.epoch
+        head = self._head(epoch)
+        data = {key: value for key, value in message.items()
+                if key not in head['data'] or head['data'][key] != value}
+        if not data:
+            return None
+        counter = self._key(epoch, 'seq')
+        # Picks up from the head if the counter alone was evicted
+        cache.add(counter, head['seq'], JOURNAL_TIMEOUT)
+        seq = cache.incr(counter)
+        event = {'type': 'delta', 'epoch': epoch, 'seq': seq, 'data': data}
+        entries = {self._key(epoch, seq): event}
+        if seq > head['seq']:
+            entries[self._key(epoch, 'head')] = {'seq': seq, 'data': dict(message)}
+        cache.set_many(entries, JOURNAL_TIMEOUT)
+        cache.delete(self._key(epoch, seq - RING_SIZE))
+        return event
+
+    def snapshot(self):
+        epoch = self.epoch
+        head = self._head(epoch)
+        return {'type': 'snapshot', 'epoch': epoch, 'seq': head['seq'], 'data': dict(head['data'])}
+
+    def since(self, epoch, seq):
+        """The events after seq, or a snapshot if some of them are no longer held"""
+        current = self.epoch
+        if epoch == current and isinstance(seq, int):
+            last = self._head(current)['seq']
+            if 0 <= last - seq <= RING_SIZE:
+                keys = [self._key(current, n) for n in range(seq + 1, last + 1)]
+                found = cache.get_many(keys)
+                if len(found) == len(keys):
+                    return [found[key] for key in keys]
+        return [self.snapshot()]
+
+
+def journal(match_id):
+    return Journal(int(match_id))
+
+
+def version_key(match_id):
+    return f'live_version:{match_id}'
+
+
+def version(match_id):
+    """ETag of the match's live score as last pushed, or None if it is not known"""
+    return cache.get(version_key(match_id))
+
+
+def forget_version(match_id):
+    cache.delete(version_key(match_id))
+
+
+def forget_all():
+    with _pending_lock:
+        for timer in _timers.values():
+            timer.cancel()
+        _timers.clear()
+        _pending.clear()
+        _counters.clear()
+    ticker.forget_all()
+
+
+def resume(match_id, epoch=None, seq=None):
+    """What a reconnecting viewer needs to catch up from the last event it applied"""
+    found = journal(match_id)
+    if found.seq == 0:
+        # Nothing pushed under this epoch yet; begin from the score as it stands
+        from . import live
+        from .models import Match
+        state = live.peek(match_id)
+        if state is not None:
+            with state.lock:
+                found.record(scoreboard(state.match))
+        else:
+            match = Match.objects.select_related(
+                'striker', 'non_striker', 'bowler',
+            ).filter(pk=match_id).first()
+            if match is None:
+                return []
+            found.record(scoreboard(match))
+    return found.since(epoch, seq)
+
+
+def publish(match):
+    """Push the match's current score to its viewers once the change is committed"""
+    message = scoreboard(match)
+    entry = ticker.item(match)
+    transaction.on_commit(lambda: submit(match.pk, message, entry))
+
+
+def _window():
+    return getattr(settings, 'LIVE_BROADCAST_WINDOW', BROADCAST_WINDOW)
+
+
+def submit(match_id, message, entry=None):
+    """Send a message now, or fold it into the frame already waiting for its match"""
+    window = _window()
+    with _pending_lock:
+        _counters['messages_in'] += 1
+        if window:
+            # Messages are whole scoreboards, so the latest holds the latest of every field
+            _pending[match_id] = (message, entry)
+            if match_id not in _timers:
+                timer = _timers[match_id] = threading.Timer(window, flush, args=(match_id,))
+                timer.daemon = True
+                timer.start()
+            return
+    send(match_id, message, entry)
+
+
+def flush(match_id):
+    """Send the frame waiting for a match, if any"""
+    with _pending_lock:
+        pending = _pending.pop(match_id, None)
+        timer = _timers.pop(match_id, None)
+    if timer is not None:
+        timer.cancel()
+    if pending is not None:
+        send(match_id, *pending)
+
+
+@atexit.register
+def flush_all():
+    for match_id in list(_pending):
+        flush(match_id)
+
+
+def counters():
+    """Messages published against frames sent to the channel layer, since startup"""
+    with _pending_lock:
+        return {'messages_in': _counters['messages_in'], 'frames_out': _counters['frames_out']}
+
+
+def send(match_id, message, entry=None):
+    if entry is not None:
+        ticker.send(entry)
+    try:
+        # Numbered only once committed, so a rolled back change never reaches the ring
+        found = journal(match_id)
+        event = found.record(message)
+        head = event or found.snapshot()
+        cache.set(version_key(match_id), f'"{head["epoch"]}-{head["seq"]}"', VERSION_TIMEOUT)
+        if event is None:
+            return
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        async_to_sync(layer.group_send)(group_name(match_id), {
+            'type': 'match_update',
+            'event': event,
+        })
+        with _pending_lock:
+            _counters['frames_out'] += 1
+    except Exception:
+        # Viewers fall back to polling; a dead channel layer must not fail scoring
+        logger.exception("Could not push score update for match %s", match_id)
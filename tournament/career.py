@@ -0,0 +1,115 @@
+"""
+Upkeep of the PlayerCareerStats table.
+
+The scoring engine turns each delivery's change to the batting and bowling
+lines into career deltas with batting_deltas() and bowling_deltas() and
+applies them to the career rows with F() increments. rebuild() regenerates
+the whole table from the performance rows for when the two have drifted apart.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import BattingPerformance, BowlingPerformance, PlayerCareerStats
+
+FIFTY = 50
+HUNDRED = 100
+FIVE_WICKETS = 5
+
+
+def overs_to_balls(overs):
+    """BowlingPerformance.overs is stored as overs.balls, e.g. 3.4"""
+    whole = int(overs)
+    return whole * 6 + round((overs - whole) * 10)
+
+
+def _crossed(before, after, threshold):
+    return int(after >= threshold) - int(before >= threshold)
+
+
+def _apply(player_id, **deltas):
+    increments = {field: F(field) + value for field, value in deltas.items() if value}
+    if not increments:
+        return
+    if not PlayerCareerStats.objects.filter(player_id=player_id).update(**increments):
+        PlayerCareerStats.objects.get_or_create(player_id=player_id)
+        PlayerCareerStats.objects.filter(player_id=player_id).update(**increments)
+
+
+def batting_innings_started(player_id):
+    _apply(player_id, batting_innings=1)
+
+
+def bowling_innings_started(player_id):
+    _apply(player_id, bowling_innings=1)
+
+
+def batting_deltas(runs_before, runs=0, balls=0, fours=0, sixes=0, dismissed=False):
+    """The career change caused by adding runs to a batting performance that had runs_before runs"""
+    runs_after = runs_before + runs
+    hundreds = _crossed(runs_before, runs_after, HUNDRED)
+    return dict(
+        runs=runs,
+        balls_faced=balls,
+        fours=fours,
+        sixes=sixes,
+        fifties=_crossed(runs_before, runs_after, FIFTY) - hundreds,
+        hundreds=hundreds,
+        dismissals=int(dismissed),
+    )
+
+
+def bowling_deltas(wickets_before, runs=0, balls=0, wickets=0):
+    """The career change caused by one delivery to a bowling performance that had wickets_before wickets"""
+    return dict(
+        runs_conceded=runs,
+        balls_bowled=balls,
+        wickets=wickets,
+        five_wicket_hauls=_crossed(wickets_before, wickets_before + wickets, FIVE_WICKETS),
+    )
+
+
+def rebuild():
+    """Regenerate every career row from the performance tables"""
+    careers = defaultdict(dict)
+
+    # Batting and bowling are aggregated separately so neither fans out the other
+    batting = BattingPerformance.objects.values('player_id').annotate(
+        innings_count=Count('id'),
+        runs_total=Sum('runs'),
+        balls_total=Sum('balls_faced'),
+        fours_total=Sum('fours'),
+        sixes_total=Sum('sixes'),
+        fifties_count=Count('id', filter=Q(runs__gte=FIFTY, runs__lt=HUNDRED)),
+        hundreds_count=Count('id', filter=Q(runs__gte=HUNDRED)),
+        dismissals_count=Count('id', filter=Q(not_out=False)),
+    ).order_by()
+    for row in batting:
+        careers[row['player_id']].update(
+            batting_innings=row['innings_count'],
+            runs=row['runs_total'],
+            balls_faced=row['balls_total'],
+            fours=row['fours_total'],
+            sixes=row['sixes_total'],
+            fifties=row['fifties_count'],
+            hundreds=row['hundreds_count'],
+            dismissals=row['dismissals_count'],
+        )
+
+    bowling = BowlingPerformance.objects.values_list('player_id', 'overs', 'runs_conceded', 'wickets')
+    for player_id, overs, runs_conceded, wickets in bowling.iterator(chunk_size=2000):
+        career = careers[player_id]
+        career['bowling_innings'] = career.get('bowling_innings', 0) + 1
+        career['balls_bowled'] = career.get('balls_bowled', 0) + overs_to_balls(overs)
+        career['runs_conceded'] = career.get('runs_conceded', 0) + runs_conceded
+        career['wickets'] = career.get('wickets', 0) + wickets
+        career['five_wicket_hauls'] = career.get('five_wicket_hauls', 0) + int(wickets >= FIVE_WICKETS)
+
+    with transaction.atomic():
+        PlayerCareerStats.objects.all().delete()
+        PlayerCareerStats.objects.bulk_create(
+            (PlayerCareerStats(player_id=player_id, **fields) for player_id, fields in careers.items()),
+            batch_size=500,
+        )
+    return len(careers)
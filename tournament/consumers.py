@@ -1,10 +1,54 @@
+import asyncio
 import json
+from collections import Counter, deque
+
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+
+from . import broadcast, ticker
+
+# Frames a match socket may have waiting before it is resynced with a snapshot
+SEND_QUEUE_SIZE = 32
+
+_metrics = Counter()
+
+
+def _queue_size():
+    return getattr(settings, 'LIVE_SEND_QUEUE_SIZE', SEND_QUEUE_SIZE)
+
+
+def metrics():
+    """Outbound queue totals for this process's match sockets"""
+    return {key: _metrics[key] for key in ('queued', 'sent', 'dropped', 'resyncs', 'depth', 'max_depth')}
+
+
+def reset_metrics():
+    _metrics.clear()
+
 
 class MatchConsumer(AsyncWebsocketConsumer):
+    """
+    Pushes a match's numbered score deltas; the server is the only source of events.
+
+    Frames wait in a bounded outbox drained by a writer task, so a viewer on
+    a slow link never holds up the channel layer. A viewer that falls
+    SEND_QUEUE_SIZE frames behind has its queued deltas, all superseded by
+    then, replaced with a single snapshot.
+    """
+
     async def connect(self):
         self.match_id = self.scope['url_route']['kwargs']['match_id']
-        self.match_group_name = f'match_{self.match_id}'
+        self.match_group_name = broadcast.group_name(self.match_id)
+        self.outbox = deque()
+        self.resync = False
+        self.ready = asyncio.Event()
+        self.writer = None
+
+        # A viewer token only admits its holder to the group it was issued for
+        if self.scope.get('viewer', self.match_group_name) != self.match_group_name:
+            await self.close()
+            return
 
         # Join match group
         await self.channel_layer.group_add(
@@ -13,33 +57,129 @@ class MatchConsumer(AsyncWebsocketConsumer):
         )
 
         await self.accept()
+        # Frames are only written to an accepted socket
+        self.writer = asyncio.ensure_future(self.write())
 
     async def disconnect(self, close_code):
+        if self.writer is not None:
+            self.writer.cancel()
+            self.writer = None
+        _metrics['depth'] -= len(self.outbox)
+        self.outbox.clear()
         # Leave match group
         await self.channel_layer.group_discard(
             self.match_group_name,
             self.channel_name
         )
 
-    # Receive message from WebSocket
-    async def receive(self, text_data):
-        text_data_json = json.loads(text_data)
-        message = text_data_json['message']
+    # Receive message from WebSocket: the only request is to catch up after
+    # the last event the client applied, {"type": "resume", "epoch": ..., "seq": ...}
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            request = json.loads(text_data or '')
+        except ValueError:
+            return
+        if not isinstance(request, dict) or request.get('type') != 'resume':
+            return
+        if not str(self.match_id).isdigit():
+            return
 
-        # Send message to match group
-        await self.channel_layer.group_send(
-            self.match_group_name,
-            {
-                'type': 'match_update',
-                'message': message
-            }
+        events = await database_sync_to_async(broadcast.resume)(
+            self.match_id, request.get('epoch'), request.get('seq'),
         )
+        for event in events:
+            self.enqueue(json.dumps(event, separators=(',', ':')))
+
+    async def dispatch(self, message):
+        # Pushes never touch the database, so skip the connection cleanup channels
+        # runs before every handler; it costs a thread hop per socket per update
+        if message['type'] == 'match_update':
+            await self.match_update(message)
+        else:
+            await super().dispatch(message)
 
     # Receive message from match group
     async def match_update(self, event):
-        message = event['message']
+        self.enqueue(json.dumps(event['event'], separators=(',', ':')))
+
+    def enqueue(self, text):
+        if len(self.outbox) >= _queue_size():
+            _metrics['depth'] -= len(self.outbox)
+            _metrics['dropped'] += len(self.outbox) + 1
+            _metrics['resyncs'] += 1
+            self.outbox.clear()
+            self.resync = True
+        elif not self.resync:
+            self.outbox.append(text)
+            _metrics['queued'] += 1
+            _metrics['depth'] += 1
+            _metrics['max_depth'] = max(_metrics['max_depth'], len(self.outbox))
+        else:
+            # The snapshot about to be sent already covers this
+            _metrics['dropped'] += 1
+        self.ready.set()
+
+    async def write(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.resync or self.outbox:
+                if self.resync:
+                    self.resync = False
+                    for event in await database_sync_to_async(broadcast.resume)(self.match_id):
+                        await self.send(text_data=json.dumps(event, separators=(',', ':')))
+                        _metrics['sent'] += 1
+                    continue
+                text = self.outbox.popleft()
+                _metrics['depth'] -= 1
+                await self.send(text_data=text)
+                _metrics['sent'] += 1
+
+
+class LiveTickerConsumer(AsyncWebsocketConsumer):
+    """One socket for the score lines of every live match, or of the ones the client picks"""
+
+    async def connect(self):
+        self.match_ids = None
+        if self.scope.get('viewer', ticker.GROUP) != ticker.GROUP:
+            await self.close()
+            return
+        await self.channel_layer.group_add(ticker.GROUP, self.channel_name)
+        await self.accept()
+        await self.send_snapshot()
+
+    async def disconnect(self, close_code):
+        await self.channel_layer.group_discard(ticker.GROUP, self.channel_name)
+
+    # Receive message from WebSocket: {"type": "subscribe", "match_ids": [...]}
+    # narrows the ticker to those matches, and "match_ids": null widens it again
+    async def receive(self, text_data=None, bytes_data=None):
+        try:
+            request = json.loads(text_data or '')
+        except ValueError:
+            return
+        if not isinstance(request, dict) or request.get('type') != 'subscribe':
+            return
+        match_ids = request.get('match_ids')
+        if isinstance(match_ids, list):
+            self.match_ids = {int(match_id) for match_id in match_ids if str(match_id).isdigit()}
+        else:
+            self.match_ids = None
+        await self.send_snapshot()
+
+    async def send_snapshot(self):
+        items = await database_sync_to_async(ticker.snapshot)(self.match_ids)
+        await self.send(text_data=json.dumps({'type': 'snapshot', 'items': items}, separators=(',', ':')))
+
+    async def dispatch(self, message):
+        # As in MatchConsumer, pushes need no database connection cleanup
+        if message['type'] == 'ticker_update':
+            await self.ticker_update(message)
+        else:
+            await super().dispatch(message)
 
-        # Send message to WebSocket
-        await self.send(text_data=json.dumps({
-            'message': message
-        }))
\ No newline at end of file
+    # Receive message from the ticker group
+    async def ticker_update(self, event):
+        item = event['item']
+        if self.match_ids is None or item['id'] in self.match_ids:
+            await self.send(text_data=json.dumps({'type': 'update', 'item': item}, separators=(',', ':')))
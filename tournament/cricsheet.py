@@ -0,0 +1,108 @@
+"""
+Cricsheet ball-by-ball JSON, read into plain tuples.
+
+Nothing here touches Django, so parse() can run in worker processes
+whatever their start method; tournament.importer maps the results onto
+the models.
+"""
+import json
+import os
+
+EXTRAS = {
+    'wides': 'wide',
+    'noballs': 'no_ball',
+    'byes': 'bye',
+    'legbyes': 'leg_bye',
+    'penalty': 'penalty',
+}
+
+WICKETS = {
+    'bowled': 'bowled',
+    'caught': 'caught',
+    'caught and bowled': 'caught',
+    'lbw': 'lbw',
+    'run out': 'run_out',
+    'stumped': 'stumped',
+    'hit wicket': 'hit_wicket',
+    'retired out': 'retired_out',
+    'obstructing the field': 'obstructing_field',
+    'hit the ball twice': 'hit_ball_twice',
+    'handled the ball': 'handled_ball',
+    'timed out': 'timed_out',
+}
+
+# Kinds that end an innings without being a wicket
+NOT_OUT = ('retired hurt', 'retired not out')
+
+
+def match_files(directory):
+    """The match files of an archive directory, in a stable order"""
+    return sorted(name for name in os.listdir(directory) if name.endswith('.json'))
+
+
+def parse(path):
+    """
+    One match file as a dict of plain values.
+
+    Each innings is (batting team, [(over, batter, bowler, runs, extra_runs,
+    extras, wicket_type, player_out), ...]), runs being those off the bat
+    and player_out '' unless a wicket fell; super overs are left out.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    info = data['info']
+    innings = []
+    for played in data.get('innings', []):
+        if played.get('super_over'):
+            continue
+        balls = []
+        for over in played.get('overs', []):
+            for delivery in over['deliveries']:
+                balls.append(_ball(over['over'], delivery))
+        innings.append((played['team'], balls))
+
+    outcome = info.get('outcome', {})
+    by = outcome.get('by', {})
+    toss = info.get('toss', {})
+    return {
+        'file': os.path.basename(path),
+        'date': info['dates'][0],
+        'venue': info.get('venue', ''),
+        'city': info.get('city', ''),
+        'umpires': info.get('officials', {}).get('umpires', []),
+        'teams': info['teams'],
+        'overs': info.get('overs'),
+        'players': info.get('players', {}),
+        'toss_winner': toss.get('winner'),
+        'toss_decision': toss.get('decision'),
+        'winner': outcome.get('winner'),
+        'result': outcome.get('result'),
+        'margin': next(iter(by.items()), None),
+        'player_of_match': (info.get('player_of_match') or [None])[0],
+        'innings': innings,
+    }
+
+
+def _ball(over, delivery):
+    extras = delivery.get('extras', {})
+    # A no-ball or wide decides how the ball counts, whatever else was run off it
+    kind = next((name for name in ('wides', 'noballs') if name in extras), next(iter(extras), ''))
+    wicket_type = player_out = ''
+    for wicket in delivery.get('wickets', []):
+        if wicket['kind'] in NOT_OUT:
+            continue
+        # A kind newer than this list is still a wicket, but not the bowler's
+        wicket_type = WICKETS.get(wicket['kind'], '')
+        player_out = wicket['player_out']
+        break
+    return (
+        over,
+        # Files from before 2021 call the batter the batsman
+        delivery.get('batter') or delivery['batsman'],
+        delivery['bowler'],
+        delivery['runs']['batter'],
+        delivery['runs']['extras'],
+        EXTRAS.get(kind, ''),
+        wicket_type,
+        player_out,
+    )
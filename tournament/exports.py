@@ -0,0 +1,125 @@
+"""
+Streaming CSV and JSON-lines exports.
+
+Each dataset is a values_list() read with iterator(chunk_size=CHUNK_SIZE),
+so rows go out as they come off the cursor and memory stays flat however
+big the table is. The season, team and date filters become WHERE clauses,
+and rows are read in index order so the first batch needs no sort.
+
+lines() produces the export as text a batch of rows at a time, the CSV
+header and the first row on their own so a download starts at once.
+stream() hands those batches to an async response, one thread hop per
+batch; under ASGI a plain iterator would be read whole before sending.
+"""
+import csv
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from .importer import chunks
+from .models import Ball, BattingPerformance, BowlingPerformance, Match, PlayerCareerStats
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+# name: (model, [(column, lookup)], ordering, path to the match or None, paths to a team)
+DATASETS = {
+    'matches': (Match, [
+        ('id', 'id'), ('match_number', 'match_number'), ('date', 'date'), ('venue', 'venue'),
+        ('home_team', 'home_team__name'), ('away_team', 'away_team__name'),
+        ('toss_winner', 'toss_winner__name'), ('toss_decision', 'toss_decision'),
+        ('first_team', 'first_team__name'), ('first_score', 'first_score'),
+        ('first_wickets', 'first_wickets'), ('first_balls', 'first_balls'),
+        ('second_team', 'second_team__name'), ('second_score', 'second_score'),
+        ('second_wickets', 'second_wickets'), ('second_balls', 'second_balls'),
+        ('result', 'result'), ('win_margin', 'win_margin'),
+    ], ('id',), '', ('home_team', 'away_team')),
+    'balls': (Ball, [
+        ('id', 'id'), ('match', 'match_id'), ('innings', 'innings'), ('over', 'over'),
+        ('ball', 'ball_number'), ('batsman', 'batsman__name'),
+        ('non_striker', 'non_striker__name'), ('bowler', 'bowler__name'),
+        ('runs', 'runs'), ('extra_runs', 'extra_runs'), ('extras', 'extras'), ('is_wicket', 'is_wicket'),
+        ('wicket_type', 'wicket_type'), ('player_out', 'player_out__name'),
+    ], ('match', 'innings', 'id'), 'match__', ('match__home_team', 'match__away_team')),
+    'batting': (BattingPerformance, [
+        ('match', 'match_id'), ('innings', 'innings'), ('player', 'player__name'),
+        ('team', 'player__team__name'), ('runs', 'runs'), ('balls_faced', 'balls_faced'),
+        ('fours', 'fours'), ('sixes', 'sixes'), ('not_out', 'not_out'), ('bowler', 'bowler__name'),
+    ], ('id',), 'match__', ('player__team',)),
+    'bowling': (BowlingPerformance, [
+        ('match', 'match_id'), ('innings', 'innings'), ('player', 'player__name'),
+        ('team', 'player__team__name'), ('overs', 'overs'), ('maidens', 'maidens'),
+        ('runs_conceded', 'runs_conceded'), ('wickets', 'wickets'), ('economy', 'economy'),
+    ], ('id',), 'match__', ('player__team',)),
+    # Career totals have no date, so only the team filter applies
+    'leaderboard': (PlayerCareerStats, [
+        ('player', 'player__name'), ('team', 'player__team__name'),
+        ('batting_innings', 'batting_innings'), ('runs', 'runs'), ('balls_faced', 'balls_faced'),
+        ('fours', 'fours'), ('sixes', 'sixes'), ('fifties', 'fifties'), ('hundreds', 'hundreds'),
+        ('dismissals', 'dismissals'), ('bowling_innings', 'bowling_innings'), ('wickets', 'wickets'),
+        ('balls_bowled', 'balls_bowled'), ('runs_conceded', 'runs_conceded'),
+        ('five_wicket_hauls', 'five_wicket_hauls'),
+    ], ('-runs',), None, ('player__team',)),
+}
+
+
+def rows(dataset, season=None, team=None, start=None, end=None):
+    """The column names of a dataset and a queryset of its rows with the filters applied"""
+    model, columns, ordering, match_path, team_paths = DATASETS[dataset]
+    queryset = model.objects.all()
+    if match_path is not None:
+        if season is not None:
+            queryset = queryset.filter(**{f'{match_path}date__year': season})
+        if start is not None:
+            queryset = queryset.filter(**{f'{match_path}date__date__gte': start})
+        if end is not None:
+            queryset = queryset.filter(**{f'{match_path}date__date__lte': end})
+    if team is not None:
+        which = Q()
+        for path in team_paths:
+            which |= Q(**{path: team})
+        queryset = queryset.filter(which)
+    names = [name for name, lookup in columns]
+    return names, queryset.order_by(*ordering).values_list(*(lookup for name, lookup in columns))
+
+
+class _Line:
+    """A file-like object that hands back what csv.writer writes to it"""
+    def write(self, value):
+        return value
+
+
+def lines(dataset, fmt, **filters):
+    """The export as text, in pieces of up to CHUNK_SIZE rows"""
+    names, queryset = rows(dataset, **filters)
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(names)
+        encode = writer.writerow
+    else:
+        encoder = DjangoJSONEncoder(separators=(',', ':'))
+
+        def encode(row):
+            return encoder.encode(dict(zip(names, row))) + '\n'
+
+    iterator = queryset.iterator(chunk_size=CHUNK_SIZE)
+    # The first row goes out alone, as soon as the cursor has it
+    for row in iterator:
+        yield encode(row)
+        break
+    for batch in chunks(iterator, CHUNK_SIZE):
+        yield ''.join(map(encode, batch))
+
+
+async def stream(pieces):
+    """Serve a synchronous generator from an async response, one piece per thread hop"""
+    try:
+        while (piece := await sync_to_async(next)(pieces, None)) is not None:
+            yield piece
+    finally:
+        await sync_to_async(pieces.close)()
@@ -0,0 +1,252 @@
+"""
+Bulk loading of a Cricsheet match archive.
+
+Files are parsed by a pool of worker processes (see tournament.cricsheet),
+no more than IN_FLIGHT_CHUNKS chunks ahead of the loader, and loaded a
+chunk at a time, each chunk in its own transaction with every row written
+by bulk_create. Team and player names are resolved through an
+in-memory identity map read once up front, so no row is looked up on its
+own. Scorecards, falls of wickets and over summaries are folded from the
+balls by the same reducer that scores live matches.
+
+Every imported match keeps its file name in Match.source_file, committed
+with the rest of its chunk, so a load that is stopped part way picks up
+after the last chunk that made it in. Once everything is in, the standings
+and career stats are rebuilt from the loaded rows.
+"""
+import os
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import career, cricsheet, scoring, standings
+from .models import Ball, Match, Player, Team
+
+CHUNK_SIZE = 50
+BATCH_SIZE = 2000
+# Chunks' worth of files being parsed ahead of the one being loaded
+IN_FLIGHT_CHUNKS = 2
+
+
+class IdentityMap:
+    """Team ids by name and player ids by (team id, name), creating whatever is missing in bulk"""
+
+    def __init__(self):
+        self.teams = dict(Team.objects.values_list('name', 'id'))
+        self.players = {
+            (team_id, name): player_id for player_id, team_id, name in Player.objects.values_list('id', 'team_id', 'name')
+        }
+
+    def add_teams(self, names, founded):
+        missing = {name for name in names if name not in self.teams}
+        created = Team.objects.bulk_create(
+            Team(name=name, short_name=name[:3].upper(), home_ground='', coach='', founded=founded)
+            for name in sorted(missing)
+        )
+        self.teams.update((team.name, team.id) for team in created)
+        return len(created)
+
+    def add_players(self, keys):
+        missing = {key for key in keys if key not in self.players}
+        created = Player.objects.bulk_create(
+            (
+                Player(name=name, team_id=team_id, age=0, nationality='', batting_style='Right',
+                       bowling_style='NA', role='', jersey_number=0)
+                for team_id, name in sorted(missing)
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        self.players.update(((player.team_id, player.name), player.id) for player in created)
+        return len(created)
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def parse_ahead(pool, paths, window):
+    """
+    Parsed files in order, with at most `window` of them submitted or parsed but not yet taken.
+
+    pool.map() would submit every file at once and hold every parsed match
+    until the loader got to it.
+    """
+    waiting = deque()
+    for path in paths:
+        waiting.append(pool.submit(cricsheet.parse, path))
+        if len(waiting) >= window:
+            yield waiting.popleft().result()
+    while waiting:
+        yield waiting.popleft().result()
+
+
+def pending_files(directory):
+    """Archive files not yet imported, in the order they are loaded"""
+    done = set(Match.objects.exclude(source_file='').values_list('source_file', flat=True))
+    return [os.path.join(directory, name) for name in cricsheet.match_files(directory) if name not in done]
+
+
+def load(directory, workers=None, chunk_size=CHUNK_SIZE, report=None):
+    """
+    Import every match file in directory that is not already in.
+
+    report, if given, is called after each committed chunk with the number
+    of files and rows written so far and the seconds taken. Returns the same
+    three figures for the whole load.
+    """
+    paths = pending_files(directory)
+    ids = IdentityMap()
+    next_number = (Match.objects.aggregate(Max('match_number'))['match_number__max'] or 0) + 1
+    files = rows = 0
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        for chunk in chunks(parse_ahead(pool, paths, IN_FLIGHT_CHUNKS * chunk_size), chunk_size):
+            with transaction.atomic():
+                rows += _load_chunk(chunk, ids, next_number)
+            next_number += len(chunk)
+            files += len(chunk)
+            if report is not None:
+                report(files, rows, time.perf_counter() - started)
+    if files:
+        # Imported results skip record_result() and the career feed, so both are worked out afresh
+        standings.rebuild()
+        career.rebuild()
+    return files, rows, time.perf_counter() - started
+
+
+def _load_chunk(chunk, ids, first_number):
+    rows = ids.add_teams(
+        {team for parsed in chunk for team in parsed['teams']},
+        founded=min(int(parsed['date'][:4]) for parsed in chunk),
+    )
+    rows += ids.add_players(_player_keys(chunk, ids))
+
+    matches, logs = [], []
+    for number, parsed in enumerate(chunk, start=first_number):
+        balls = _balls(parsed, ids)
+        boards = scoring.replay(balls)
+        matches.append(_match(parsed, ids, number, boards))
+        logs.append((balls, boards))
+    Match.objects.bulk_create(matches)
+
+    balls, derived = [], defaultdict(list)
+    for match, (log, boards) in zip(matches, logs):
+        for ball in log:
+            ball.match_id = match.pk
+        balls.extend(log)
+        for innings, board in boards.items():
+            # The last over was never completed by a scorer; only a full one can be a maiden
+            if board.current_ball == 6:
+                scoring.end_over(board)
+            else:
+                board.summarise_over()
+            for row in scoring.innings_rows(match.pk, innings, board):
+                derived[type(row)].append(row)
+    Ball.objects.bulk_create(balls, batch_size=BATCH_SIZE)
+    for model, batch in derived.items():
+        model.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+    return rows + len(matches) + len(balls) + sum(len(batch) for batch in derived.values())
+
+
+def _player_keys(chunk, ids):
+    """Everyone named in the chunk, against the team they played for"""
+    keys = set()
+    for parsed in chunk:
+        for team, names in parsed['players'].items():
+            keys.update((ids.teams[team], name) for name in names)
+        for team, log in parsed['innings']:
+            batting = ids.teams[team]
+            bowling = ids.teams[_other(parsed, team)]
+            for over, batter, bowler, runs, extra_runs, extras, wicket_type, player_out in log:
+                keys.add((batting, batter))
+                keys.add((bowling, bowler))
+                if player_out:
+                    keys.add((batting, player_out))
+    return keys
+
+
+def _other(parsed, team):
+    home, away = parsed['teams']
+    return away if team == home else home
+
+
+def _balls(parsed, ids):
+    """Unsaved Ball rows for a match, numbered as the scorer numbers them"""
+    balls = []
+    for number, (team, log) in enumerate(parsed['innings'][:2], start=1):
+        batting = ids.teams[team]
+        bowling = ids.teams[_other(parsed, team)]
+        current_over = legal = None
+        for over, batter, bowler, runs, extra_runs, extras, wicket_type, player_out in log:
+            if over != current_over:
+                current_over, legal = over, 0
+            if extras not in (scoring.WIDE, scoring.NO_BALL):
+                legal += 1
+            balls.append(Ball(
+                innings=number,
+                batsman_id=ids.players[batting, batter],
+                bowler_id=ids.players[bowling, bowler],
+                runs=runs,
+                extra_runs=extra_runs,
+                extras=extras,
+                is_wicket=bool(player_out),
+                wicket_type=wicket_type,
+                player_out_id=ids.players[batting, player_out] if player_out else None,
+                over=over,
+                ball_number=legal,
+            ))
+    return balls
+
+
+def _match(parsed, ids, number, boards):
+    home, away = (ids.teams[team] for team in parsed['teams'])
+    played = [ids.teams[team] for team, log in parsed['innings'][:2]]
+    match = Match(
+        match_number=number,
+        source_file=parsed['file'],
+        home_team_id=home,
+        away_team_id=away,
+        date=timezone.make_aware(datetime.fromisoformat(parsed['date'])),
+        venue=(parsed['venue'] or parsed['city'])[:100],
+        umpires=', '.join(parsed['umpires'])[:200],
+        toss_winner_id=ids.teams.get(parsed['toss_winner']),
+        toss_decision=parsed['toss_decision'],
+        innings=len(played),
+        is_live=False,
+    )
+    if parsed['overs']:
+        match.balls_remaining = parsed['overs'] * 6
+    for prefix, team_id, innings in zip(('first', 'second'), played, (1, 2)):
+        board = boards.get(innings) or scoring.Scoreboard()
+        setattr(match, f'{prefix}_team_id', team_id)
+        setattr(match, f'{prefix}_score', board.total_runs)
+        setattr(match, f'{prefix}_wickets', board.total_wickets)
+        setattr(match, f'{prefix}_balls', board.current_over * 6 + board.current_ball)
+
+    if parsed['winner']:
+        winner = ids.teams[parsed['winner']]
+        match.result = 'Home Win' if winner == home else 'Away Win'
+        if parsed['margin']:
+            kind, margin = parsed['margin']
+            match.win_margin = f"{parsed['winner']} won by {margin} {kind}"
+    elif parsed['result'] == 'tie':
+        match.result = 'Draw'
+        match.win_margin = "Match tied"
+    else:
+        match.result = 'No Result'
+
+    if parsed['player_of_match']:
+        match.man_of_the_match_id = next(
+            (ids.players[key] for key in ((home, parsed['player_of_match']), (away, parsed['player_of_match']))
+             if key in ids.players),
+            None,
+        )
+    return match
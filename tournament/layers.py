@@ -0,0 +1,25 @@
+"""
+Single-process channel layer.
+
+channels' InMemoryChannelLayer sweeps every channel and group membership
+for expired entries on each receive and group_send, so fanning one update
+out to N sockets costs O(N^2). LocalChannelLayer behaves the same but
+sweeps at most once every `sweep_interval` seconds, which keeps fan-out
+linear. Like its parent it only connects consumers within one process.
+"""
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+
+class LocalChannelLayer(InMemoryChannelLayer):
+    def __init__(self, sweep_interval=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.sweep_interval = sweep_interval
+        self._swept = 0.0
+
+    def _clean_expired(self):
+        now = time.monotonic()
+        if now - self._swept >= self.sweep_interval:
+            self._swept = now
+            super()._clean_expired()
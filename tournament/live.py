@@ -0,0 +1,232 @@
+"""
+In-process state for matches being scored.
+
+A LiveState holds the match row and its Scoreboard in memory, and scoring and
+live reads are served from it. Each delivery's Ball row is inserted straight
+away, so the log is the durable copy of everything the scorer has been told.
+The match, performance and career rows are written behind by scoring.write()
+once FLUSH_INTERVAL seconds pass or MAX_PENDING_BALLS balls pile up, and
+always before anything else touches the match. Every change is pushed to
+the match's viewers through broadcast.publish().
+
+A delivery that does not flush is two statements against the app's tables,
+the check below and the Ball insert, well inside the budget of four. A flush
+adds one UPDATE each for the match, batting, bowling and career rows, and
+an insert each for any falls of wickets and finished overs. Wickets and
+the end of an over always flush, so they go over four; the budget holds
+for the run of the mill deliveries between them.
+
+If the process dies between flushes, nothing is lost: load() replays the
+balls logged after the match's flushed_ball watermark onto the rows as they
+were last written. A match can be held by more than one process. Before a
+ball is logged, the match row is locked and checked against the state: if
+another process has logged a ball or written the match since, the state is
+reloaded first, so the new ball is built on the score as it stands. A flush
+likewise only lands while the watermark is where the state was loaded from,
+so the same balls are never counted twice.
+"""
+import atexit
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef, Q
+
+from . import broadcast, scoring
+from .models import Ball, Match
+
+FLUSH_INTERVAL = 2.0
+MAX_PENDING_BALLS = 6
+
+_states = {}
+# Guards the two dicts; a match is loaded or released under its own lock
+_registry_lock = threading.Lock()
+_match_locks = {}
+
+
+class LiveState:
+    __slots__ = ('match', 'board', 'before', 'last_ball_id', 'pending', 'dirty_since', 'timer', 'lock')
+
+    def __init__(self, match):
+        self.match = match
+        self.lock = threading.RLock()
+        self.timer = None
+        self._reset()
+
+    def _reset(self):
+        self.board = scoring.Scoreboard.from_match(self.match)
+        self.before = self.board.batting_snapshot()
+        self.last_ball_id = self.match.flushed_ball
+        self.pending = 0
+        self.dirty_since = None
+
+    @classmethod
+    def load(cls, match_id):
+        match = Match.objects.select_related(
+            'striker', 'non_striker', 'bowler', 'batting_team', 'bowling_team',
+        ).get(pk=match_id)
+        state = cls(match)
+        state._replay()
+        return state
+
+    def _replay(self):
+        unflushed = Ball.objects.filter(
+            match=self.match, innings=self.match.innings, id__gt=self.match.flushed_ball,
+        ).order_by('id')
+        for ball in unflushed:
+            scoring.apply_ball(self.board, ball)
+            self._mark(ball.id)
+        scoring.show(self.match, self.board)
+
+    def _reload(self):
+        """Start again from the rows as another process wrote them, replaying the balls logged since"""
+        self.match.refresh_from_db()
+        self._reset()
+        self._replay()
+
+    def _mark(self, ball_id):
+        self.last_ball_id = ball_id
+        self.pending += 1
+        if self.dirty_since is None:
+            self.dirty_since = time.monotonic()
+
+    def record(self, runs=0, extras='', wicket_type='', out_player='striker'):
+        """Log a delivery and fold it into the in-memory score; the rest is written behind"""
+        with self.lock:
+            with transaction.atomic():
+                if self._moved_on():
+                    self._reload()
+                ball = scoring.deliver(self.match, self.board, runs, extras, wicket_type, out_player)
+                ball.save()
+            self._mark(ball.id)
+            scoring.show(self.match, self.board)
+            if wicket_type or self.pending >= MAX_PENDING_BALLS or self._overdue():
+                self.flush()
+            else:
+                self._schedule()
+            broadcast.publish(self.match)
+            return ball
+
+    def _moved_on(self):
+        """Whether another process logged a ball or wrote the match since this state last saw it"""
+        # Locked until the ball is logged, where the database supports it
+        return Match.objects.select_for_update().filter(pk=self.match.pk).filter(
+            ~Q(data_version=self.match.data_version)
+            | Exists(Ball.objects.filter(match=OuterRef('pk'), id__gt=self.last_ball_id))
+        ).exists()
+
+    def complete_over(self):
+        with self.lock:
+            scoring.end_over(self.board)
+            self.dirty_since = self.dirty_since or time.monotonic()
+            # The end of an over is not in the log, so it is made again over a reload
+            self.flush(redo=lambda: scoring.end_over(self.board))
+            broadcast.publish(self.match)
+
+    def _overdue(self):
+        interval = _flush_interval()
+        return interval is not None and time.monotonic() - self.dirty_since >= interval
+
+    def _schedule(self):
+        interval = _flush_interval()
+        if interval is None or self.timer is not None:
+            return
+        self.timer = threading.Timer(interval, _flush_in_background, args=(self.match.pk,))
+        self.timer.daemon = True
+        self.timer.start()
+
+    def flush(self, redo=None):
+        """
+        Write the pending changes; returns whether there were any.
+
+        Two processes can load the same match and replay the same unflushed
+        balls. Only the first to write moves the watermark; the other is told
+        by scoring.StaleMatch, reloads from what was written, and writes
+        whatever is still pending after that.
+        """
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if self.dirty_since is None:
+                return False
+            try:
+                scoring.write(self.match, self.before, self.board, self.last_ball_id)
+            except scoring.StaleMatch:
+                self._reload()
+                if redo is not None:
+                    redo()
+                    self.dirty_since = self.dirty_since or time.monotonic()
+                if self.dirty_since is None:
+                    return True
+                scoring.write(self.match, self.before, self.board, self.last_ball_id)
+            self._reset()
+            return True
+
+
+def _flush_interval():
+    return getattr(settings, 'LIVE_FLUSH_INTERVAL', FLUSH_INTERVAL)
+
+
+def _match_lock(match_id):
+    with _registry_lock:
+        return _match_locks.setdefault(match_id, threading.Lock())
+
+
+def get(match_id):
+    """The live state for a match, loading it (and replaying unflushed balls) on first use"""
+    match_id = int(match_id)
+    state = _states.get(match_id)
+    if state is not None:
+        return state
+    # Only this match waits for the load
+    with _match_lock(match_id):
+        state = _states.get(match_id)
+        if state is None:
+            state = LiveState.load(match_id)
+            with _registry_lock:
+                _states[match_id] = state
+        return state
+
+
+def peek(match_id):
+    """The live state if this process is already scoring the match"""
+    return _states.get(int(match_id))
+
+
+def release(match_id):
+    """Write out and forget a match's live state before something else changes the match row"""
+    match_id = int(match_id)
+    with _match_lock(match_id):
+        with _registry_lock:
+            state = _states.pop(match_id, None)
+        if state is not None and state.flush():
+            broadcast.publish(state.match)
+
+
+def forget_all():
+    """Drop every live state without writing it, as a crash would"""
+    with _registry_lock:
+        for state in _states.values():
+            if state.timer is not None:
+                state.timer.cancel()
+        _states.clear()
+
+
+def _flush_in_background(match_id):
+    state = peek(match_id)
+    try:
+        if state is not None:
+            with state.lock:
+                state.timer = None
+                state.flush()
+                broadcast.publish(state.match)
+    finally:
+        connection.close()
+
+
+@atexit.register
+def flush_all():
+    for state in list(_states.values()):
+        state.flush()
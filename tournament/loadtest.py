@@ -0,0 +1,220 @@
+"""
+Local load tests for the match websocket, run on a single-process channel layer.
+
+simulate() connects many MatchConsumer instances, some of them behind a slow
+link, pushes score updates through broadcast.send and reports what the fast
+and slow viewers received alongside the consumers' outbound queue metrics
+(the feed_load_test command).
+
+benchmark() connects clients through the full ASGI application in
+UCL/asgi.py and reports delivery latency percentiles and memory per
+connection (the feed_benchmark command).
+
+poll_rates() times live_match_data polls with and without If-None-Match
+(the live_data_benchmark command).
+"""
+import asyncio
+import json
+import random
+import time
+import tracemalloc
+
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.conf import settings
+from django.test import RequestFactory, override_settings
+
+from . import broadcast, consumers
+
+MEMORY_LAYER = {'default': settings.CHANNEL_LAYER_PROFILES['memory']}
+
+
+class SlowLinkConsumer(consumers.MatchConsumer):
+    """A viewer whose socket takes `delay` seconds to accept each frame"""
+    delay = 1.0
+
+    async def send(self, *args, **kwargs):
+        await asyncio.sleep(self.delay)
+        await super().send(*args, **kwargs)
+
+
+def simulate(match_id, sockets=5000, slow=500, updates=30, delay=1.0, queue_size=8, timeout=600):
+    """
+    Push `updates` score changes to `sockets` viewers, the first `slow` of them slow.
+
+    Each viewer's outbox holds `queue_size` frames (LIVE_SEND_QUEUE_SIZE).
+
+    Returns the frames each viewer received (slow viewers first), the seconds
+    from the first update until every viewer had the last one, and the queue
+    metrics for the run.
+    """
+    consumers.reset_metrics()
+    slow_link = type('SlowLink', (SlowLinkConsumer,), {'delay': delay})
+    scope = {
+        'type': 'websocket', 'path': f'/ws/match/{match_id}/',
+        'url_route': {'args': (), 'kwargs': {'match_id': str(match_id)}},
+    }
+
+    async def run():
+        viewers = [
+            ApplicationCommunicator((slow_link if n < slow else consumers.MatchConsumer).as_asgi(), scope)
+            for n in range(sockets)
+        ]
+        for viewer in viewers:
+            await viewer.send_input({'type': 'websocket.connect'})
+        for viewer in viewers:
+            await viewer.receive_output(timeout)
+
+        started = time.perf_counter()
+        for runs in range(1, updates + 1):
+            await sync_to_async(broadcast.send)(match_id, {
+                'total_runs': runs,
+                'current_over': f'{runs // 6}.{runs % 6}',
+            })
+            await asyncio.sleep(0)
+
+        received = [[] for _ in viewers]
+        last = broadcast.journal(match_id).seq
+        waiting = set(range(sockets))
+        while waiting:
+            if time.perf_counter() - started > timeout:
+                raise TimeoutError(f"{len(waiting)} viewers never caught up")
+            await asyncio.sleep(0.01)
+            for n in list(waiting):
+                queue = viewers[n].output_queue
+                while not queue.empty():
+                    received[n].append(json.loads(queue.get_nowait()['text']))
+                if received[n] and received[n][-1]['seq'] == last:
+                    waiting.discard(n)
+        elapsed = time.perf_counter() - started
+
+        for viewer in viewers:
+            await viewer.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.gather(*(viewer.wait(timeout) for viewer in viewers))
+        return received, elapsed
+
+    with override_settings(CHANNEL_LAYERS=MEMORY_LAYER, LIVE_SEND_QUEUE_SIZE=queue_size):
+        received, elapsed = async_to_sync(run)()
+    return received, elapsed, consumers.metrics()
+
+
+class Client:
+    """One websocket connection to an ASGI application, noting when each frame arrives"""
+
+    def __init__(self, application, path):
+        self.inbox = asyncio.Queue()
+        self.accepted = asyncio.Event()
+        self.frames = []
+        scope = {
+            'type': 'websocket', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'headers': [], 'subprotocols': [], 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+        self.task = asyncio.ensure_future(application(scope, self.inbox.get, self.arrived))
+
+    async def arrived(self, message):
+        if message['type'] == 'websocket.accept':
+            self.accepted.set()
+        elif message['type'] == 'websocket.send':
+            self.frames.append((time.perf_counter(), message['text']))
+
+    async def connect(self):
+        await self.inbox.put({'type': 'websocket.connect'})
+        await self.accepted.wait()
+
+    async def close(self):
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await self.task
+
+
+def scores(updates, seed=0):
+    """A run of plausible scoreboard messages, one per delivery"""
+    rng = random.Random(seed)
+    message = {'total_runs': 0, 'total_wickets': 0, 'current_over': '0.0',
+               'striker_runs': 0, 'striker_balls': 0, 'bowler_runs': 0}
+    for ball in range(1, updates + 1):
+        runs = rng.choice((0, 0, 1, 1, 1, 2, 4, 6))
+        message = dict(
+            message,
+            total_runs=message['total_runs'] + runs,
+            current_over=f'{ball // 6}.{ball % 6}',
+            striker_runs=message['striker_runs'] + runs,
+            striker_balls=message['striker_balls'] + 1,
+            bowler_runs=message['bowler_runs'] + runs,
+        )
+        yield message
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def benchmark(match_id, connections=1000, updates=50, interval=0.1, layer='memory', timeout=600):
+    """
+    Fan `updates` score changes out to `connections` clients of UCL.asgi.application.
+
+    Returns the connection count, the frames delivered, latency percentiles in
+    milliseconds from broadcast.send to arrival at the client, and the bytes
+    of memory each connection holds once connected.
+    """
+    from UCL.asgi import application
+
+    async def run():
+        path = f'/ws/match/{match_id}/'
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        clients = [Client(application, path) for _ in range(connections)]
+        await asyncio.gather(*(client.connect() for client in clients))
+        per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / connections
+        tracemalloc.stop()
+
+        sent = {}
+        journal = broadcast.journal(match_id)
+        for message in scores(updates):
+            started = time.perf_counter()
+            await sync_to_async(broadcast.send)(match_id, message)
+            sent[journal.seq] = started
+            await asyncio.sleep(interval)
+
+        deadline = time.perf_counter() + timeout
+        while any(len(client.frames) < len(sent) for client in clients):
+            if time.perf_counter() > deadline:
+                raise TimeoutError("Not every client received every update")
+            await asyncio.sleep(0.01)
+
+        latencies = sorted(
+            (arrived - sent[json.loads(text)['seq']]) * 1000
+            for client in clients for arrived, text in client.frames
+        )
+        await asyncio.gather(*(client.close() for client in clients))
+        return latencies, per_connection
+
+    with override_settings(CHANNEL_LAYERS={'default': settings.CHANNEL_LAYER_PROFILES[layer]}):
+        latencies, per_connection = async_to_sync(run)()
+    return {
+        'connections': connections,
+        'frames': len(latencies),
+        'p50': percentile(latencies, 0.5),
+        'p90': percentile(latencies, 0.9),
+        'p99': percentile(latencies, 0.99),
+        'max': latencies[-1],
+        'bytes_per_connection': per_connection,
+    }
+
+
+def poll_rates(match_id, requests=1000):
+    """Requests per second to live_match_data for a full answer and for a 304 to a current ETag"""
+    from .models import Match
+    from .views import live_match_data
+
+    if broadcast.version(match_id) is None:
+        match = Match.objects.select_related('striker', 'non_striker', 'bowler').get(pk=match_id)
+        broadcast.send(match_id, broadcast.scoreboard(match))
+    factory = RequestFactory()
+    rates = {}
+    for label, headers in (('full', {}), ('conditional', {'if_none_match': broadcast.version(match_id)})):
+        request = factory.get(f'/match/{match_id}/live_data/', headers=headers)
+        started = time.perf_counter()
+        for _ in range(requests):
+            live_match_data(request, match_id)
+        rates[label] = requests / (time.perf_counter() - started)
+    return rates
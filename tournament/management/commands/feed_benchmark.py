@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tournament import loadtest
+
+
+class Command(BaseCommand):
+    help = "Connect many clients to the ASGI app's match websocket and time score updates reaching them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--updates', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=0.1, help="Seconds between updates")
+        parser.add_argument('--layer', default='memory', choices=sorted(settings.CHANNEL_LAYER_PROFILES),
+                            help="Channel layer profile from CHANNEL_LAYER_PROFILES")
+        parser.add_argument('--match-id', type=int, default=0, help="Match whose feed to use; nothing is written to it")
+
+    def handle(self, *args, **options):
+        result = loadtest.benchmark(
+            options['match_id'], connections=options['connections'], updates=options['updates'],
+            interval=options['interval'], layer=options['layer'],
+        )
+        self.stdout.write(
+            f"{result['connections']} connections, {result['frames']} frames delivered\n"
+            f"latency ms: p50 {result['p50']:.1f}, p90 {result['p90']:.1f}, "
+            f"p99 {result['p99']:.1f}, max {result['max']:.1f}\n"
+            f"memory per connection: {result['bytes_per_connection'] / 1024:.1f} KiB"
+        )
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from tournament import loadtest
+
+
+class Command(BaseCommand):
+    help = "Push score updates to many simulated match sockets, some slow, on an in-memory channel layer"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sockets', type=int, default=5000)
+        parser.add_argument('--slow', type=int, default=500, help="How many of the sockets are slow readers")
+        parser.add_argument('--updates', type=int, default=30)
+        parser.add_argument('--delay', type=float, default=1.0, help="Seconds a slow socket takes per frame")
+        parser.add_argument('--queue-size', type=int, default=8, help="Frames each socket may have waiting")
+        parser.add_argument('--match-id', type=int, default=0, help="Match whose feed to use; nothing is written to it")
+
+    def handle(self, *args, **options):
+        sockets, slow, updates = options['sockets'], options['slow'], options['updates']
+        received, elapsed, metrics = loadtest.simulate(
+            options['match_id'], sockets=sockets, slow=slow, updates=updates,
+            delay=options['delay'], queue_size=options['queue_size'],
+        )
+        fast_frames = sum(len(frames) for frames in received[slow:])
+        slow_frames = sum(len(frames) for frames in received[:slow])
+        complete = sum(
+            [frame['seq'] for frame in frames] == list(range(1, updates + 1)) for frames in received[slow:]
+        )
+        self.stdout.write(
+            f"{sockets} sockets ({slow} slow), {updates} updates, all delivered in {elapsed:.2f} s\n"
+            f"fast: {fast_frames} frames, {complete}/{sockets - slow} got every update in order\n"
+            f"slow: {slow_frames} frames\n"
+            f"queues: {metrics['queued']} queued, {metrics['sent']} sent, {metrics['dropped']} dropped, "
+            f"{metrics['resyncs']} resyncs, max depth {metrics['max_depth']}"
+        )
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from tournament import importer
+
+
+class Command(BaseCommand):
+    help = "Import a directory of Cricsheet ball-by-ball JSON files, resuming after the last imported chunk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory')
+        parser.add_argument('--workers', type=int, default=None, help="Parser processes; defaults to one per core")
+        parser.add_argument('--chunk-size', type=int, default=importer.CHUNK_SIZE,
+                            help="Files committed together in one transaction")
+
+    def handle(self, *args, **options):
+        def report(files, rows, elapsed):
+            self.stdout.write(f"{files} files, {rows} rows, {rows / elapsed:.0f} rows/s")
+
+        files, rows, elapsed = importer.load(
+            options['directory'], workers=options['workers'], chunk_size=options['chunk_size'], report=report,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {files} matches ({rows} rows) in {elapsed:.1f} s; standings and career stats rebuilt"
+        ))
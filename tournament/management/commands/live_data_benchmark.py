@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from tournament import loadtest
+
+
+class Command(BaseCommand):
+    help = "Time live_match_data polls for a match with and without a current If-None-Match"
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_id', type=int)
+        parser.add_argument('--requests', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        rates = loadtest.poll_rates(options['match_id'], options['requests'])
+        self.stdout.write(
+            f"live_match_data: {rates['full']:,.0f} req/s full, "
+            f"{rates['conditional']:,.0f} req/s with If-None-Match ({rates['conditional'] / rates['full']:.1f}x)"
+        )
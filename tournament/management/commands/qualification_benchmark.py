@@ -0,0 +1,29 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from tournament import qualification
+
+
+class Command(BaseCommand):
+    help = "Time the qualification simulator on the current table at 1, 2, 4... worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simulations', type=int, default=qualification.SIMULATIONS)
+        parser.add_argument('--max-workers', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        workers = [1]
+        while workers[-1] * 2 <= options['max_workers']:
+            workers.append(workers[-1] * 2)
+        if workers[-1] != options['max_workers']:
+            workers.append(options['max_workers'])
+
+        results = qualification.benchmark(options['simulations'], workers)
+        single = results[0]['rate']
+        self.stdout.write(f"{options['simulations']} simulations of the remaining fixtures")
+        for result in results:
+            self.stdout.write(
+                f"{result['workers']:>3} workers: {result['seconds']:.2f}s, "
+                f"{result['rate']:,.0f} simulations/s ({result['rate'] / single:.1f}x)"
+            )
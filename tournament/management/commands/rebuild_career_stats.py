@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tournament import career
+
+
+class Command(BaseCommand):
+    help = "Regenerate PlayerCareerStats from the batting and bowling performances"
+
+    def handle(self, *args, **options):
+        count = career.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt career stats for {count} players"))
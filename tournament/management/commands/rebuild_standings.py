@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tournament import standings
+
+
+class Command(BaseCommand):
+    help = "Recompute the points table from all finished matches"
+
+    def handle(self, *args, **options):
+        count = standings.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt standings for {count} teams"))
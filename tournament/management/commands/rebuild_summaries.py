@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from tournament import scoring
+from tournament.models import Match
+
+
+class Command(BaseCommand):
+    help = "Rewrite falls of wickets, partnerships and over summaries from the ball-by-ball log in a single pass"
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_ids', nargs='*', type=int, help="Only rebuild these matches")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        matches = Match.objects.all()
+        if options['match_ids']:
+            matches = matches.filter(pk__in=options['match_ids'])
+        falls, overs = scoring.rebuild_summaries(matches, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Wrote {falls} falls of wickets and {overs} over summaries"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from tournament import qualification
+
+
+class Command(BaseCommand):
+    help = "Work out every team's qualification chances from the current table and cache them"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--simulations', type=int)
+        parser.add_argument('--workers', type=int)
+
+    def handle(self, *args, **options):
+        result = qualification.refresh(simulations=options['simulations'], workers=options['workers'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Ran {result['simulations']} simulations for {len(result['teams'])} teams"
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from tournament import scoring
+from tournament.models import Match
+
+
+class Command(BaseCommand):
+    help = "Rewrite batting, bowling, fall of wicket and over rows from the ball-by-ball log"
+
+    def add_arguments(self, parser):
+        parser.add_argument('match_ids', nargs='*', type=int, help="Only replay these matches")
+
+    def handle(self, *args, **options):
+        matches = Match.objects.filter(ball__isnull=False).distinct()
+        if options['match_ids']:
+            matches = matches.filter(pk__in=options['match_ids'])
+        count = 0
+        for match in matches:
+            scoring.rebuild_performances(match)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {count} matches; run rebuild_career_stats to refresh career totals"
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0028_remove_partnership_batter1_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['-points', '-wins'], name='team_standings_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0029_team_standings_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='first_balls',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='second_balls',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 19:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0030_match_first_balls_match_second_balls'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlayerCareerStats',
+            fields=[
+                ('player', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='career_stats', serialize=False, to='tournament.player')),
+                ('batting_innings', models.PositiveIntegerField(default=0)),
+                ('runs', models.PositiveIntegerField(default=0)),
+                ('balls_faced', models.PositiveIntegerField(default=0)),
+                ('fours', models.PositiveIntegerField(default=0)),
+                ('sixes', models.PositiveIntegerField(default=0)),
+                ('fifties', models.PositiveIntegerField(default=0)),
+                ('hundreds', models.PositiveIntegerField(default=0)),
+                ('dismissals', models.PositiveIntegerField(default=0)),
+                ('bowling_innings', models.PositiveIntegerField(default=0)),
+                ('wickets', models.PositiveIntegerField(default=0)),
+                ('balls_bowled', models.PositiveIntegerField(default=0)),
+                ('runs_conceded', models.PositiveIntegerField(default=0)),
+                ('five_wicket_hauls', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-runs'], name='career_runs_idx'), models.Index(fields=['-wickets'], name='career_wickets_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 19:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0031_playercareerstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ball',
+            name='innings',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='ball',
+            name='player_out',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dismissal_balls', to='tournament.player'),
+        ),
+        migrations.AddIndex(
+            model_name='ball',
+            index=models.Index(fields=['match', 'innings', 'id'], name='ball_log_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0032_ball_innings_ball_player_out'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='flushed_ball',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
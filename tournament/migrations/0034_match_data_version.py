@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0033_match_flushed_ball'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='data_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-18 20:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0034_match_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='partnership_balls',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='partnership_runs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='FallOfWicket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('innings', models.PositiveIntegerField(default=1)),
+                ('wicket', models.PositiveIntegerField()),
+                ('runs', models.IntegerField(default=0)),
+                ('balls', models.IntegerField(default=0)),
+                ('partnership_runs', models.IntegerField(default=0)),
+                ('partnership_balls', models.IntegerField(default=0)),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='falls_of_wickets', to='tournament.match')),
+                ('partner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tournament.player')),
+                ('player', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='falls_of_wickets', to='tournament.player')),
+            ],
+            options={
+                'ordering': ['innings', 'wicket'],
+                'constraints': [models.UniqueConstraint(fields=('match', 'innings', 'wicket'), name='unique_fall_of_wicket')],
+            },
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-18 20:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0035_fall_of_wickets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='over_extras',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='over_runs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='match',
+            name='over_wickets',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='OverSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('innings', models.PositiveIntegerField(default=1)),
+                ('over', models.PositiveIntegerField()),
+                ('runs', models.IntegerField(default=0)),
+                ('wickets', models.IntegerField(default=0)),
+                ('extras', models.IntegerField(default=0)),
+                ('total_runs', models.IntegerField(default=0)),
+                ('total_wickets', models.IntegerField(default=0)),
+                ('bowler', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tournament.player')),
+                ('match', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='over_summaries', to='tournament.match')),
+            ],
+            options={
+                'ordering': ['innings', 'over'],
+                'constraints': [models.UniqueConstraint(fields=('match', 'innings', 'over'), name='unique_over_summary')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0036_over_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='match',
+            name='source_file',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0037_match_source_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='balls_against',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='balls_for',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='runs_against',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='runs_for',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2 on 2026-10-18 20:55
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def split_extra_runs(apps, schema_editor):
+    # Every run of a ball with extras was logged in runs, and none of them went to the batter
+    Ball = apps.get_model('tournament', 'Ball')
+    Ball.objects.exclude(extras='').update(extra_runs=F('runs'), runs=0)
+
+
+def merge_extra_runs(apps, schema_editor):
+    Ball = apps.get_model('tournament', 'Ball')
+    Ball.objects.exclude(extra_runs=0).update(runs=F('runs') + F('extra_runs'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0038_team_run_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ball',
+            name='extra_runs',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='ball',
+            name='wicket_type',
+            field=models.CharField(blank=True, choices=[('bowled', 'Bowled'), ('caught', 'Caught'), ('lbw', 'LBW'), ('run_out', 'Run Out'), ('stumped', 'Stumped'), ('hit_wicket', 'Hit Wicket'), ('retired_out', 'Retired Out'), ('obstructing_field', 'Obstructing the Field'), ('hit_ball_twice', 'Hit the Ball Twice'), ('handled_ball', 'Handled the Ball'), ('timed_out', 'Timed Out')], max_length=20),
+        ),
+        migrations.RunPython(split_extra_runs, merge_extra_runs),
+    ]
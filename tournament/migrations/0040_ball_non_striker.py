@@ -0,0 +1,19 @@
+# Generated by Django 5.2 on 2026-10-18 21:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0039_ball_extra_runs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ball',
+            name='non_striker',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='tournament.player'),
+        ),
+    ]
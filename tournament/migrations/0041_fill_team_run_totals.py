@@ -0,0 +1,28 @@
+from django.db import migrations
+
+from tournament.standings import totals_by_team
+
+RUN_TOTALS = ('runs_for', 'balls_for', 'runs_against', 'balls_against')
+
+
+def fill_run_totals(apps, schema_editor):
+    # 0038 added the columns at zero; work them out from the matches already finished
+    Match = apps.get_model('tournament', 'Match')
+    Team = apps.get_model('tournament', 'Team')
+    totals = totals_by_team(Match.objects)
+    teams = list(Team.objects.all())
+    for team in teams:
+        for name in RUN_TOTALS:
+            setattr(team, name, totals[team.id][name])
+    Team.objects.bulk_update(teams, RUN_TOTALS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tournament', '0040_ball_non_striker'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_run_totals, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models import Count, Q
+from django.db.models import Count, F, Q, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
 
 
 class Team(models.Model):
@@ -27,7 +28,17 @@ class Team(models.Model):
     losses = models.IntegerField(default=0)
     draws = models.IntegerField(default=0)
     points = models.IntegerField(default=0)
-    
+    # Runs and legal balls for and against in decided matches, for net run rate
+    runs_for = models.IntegerField(default=0)
+    balls_for = models.IntegerField(default=0)
+    runs_against = models.IntegerField(default=0)
+    balls_against = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-points', '-wins'], name='team_standings_idx'),
+        ]
+
     def update_stats(self):
         # Same calculation logic as in the view
         self.total_matches = Match.objects.filter(
@@ -53,6 +64,21 @@ class Team(models.Model):
         self.points = self.wins * 3 + self.draws * 1
         self.save()
 
+class PlayerQuerySet(models.QuerySet):
+    def with_totals(self):
+        """Attach career runs and wickets to every player in one query"""
+        runs = BattingPerformance.objects.filter(
+            player=OuterRef('pk')
+        ).values('player').annotate(total=Sum('runs')).values('total')
+        wickets = BowlingPerformance.objects.filter(
+            player=OuterRef('pk')
+        ).values('player').annotate(total=Sum('wickets')).values('total')
+        return self.annotate(
+            runs_total=Coalesce(Subquery(runs), 0),
+            wickets_total=Coalesce(Subquery(wickets), 0),
+        )
+
+
 class Player(models.Model):
     BATTING_STYLE = [
         ('Right', 'Right-handed'),
@@ -97,6 +123,8 @@ class Player(models.Model):
     total_run_outs = models.PositiveIntegerField(default=0)
     out = models.BooleanField(default=False)
     wicket_type = models.CharField(max_length=20, blank=True, null=True)
+
+    objects = PlayerQuerySet.as_manager()
     
     # Calculated properties
     @property
@@ -128,10 +156,14 @@ class Player(models.Model):
     
     @property
     def total_runs(self):
+        if hasattr(self, 'runs_total'):
+            return self.runs_total
         return sum(performance.runs for performance in self.batting_performances.all())
     
     @property
     def total_wickets(self):
+        if hasattr(self, 'wickets_total'):
+            return self.wickets_total
         return sum(performance.wickets for performance in self.bowling_performances.all())
 
 
@@ -214,6 +246,17 @@ class Match(models.Model):
     second_wickets = models.IntegerField(default=0)
     second_current_over = models.IntegerField(default=0)
     second_current_ball = models.IntegerField(default=0)
+
+    # Legal deliveries faced per innings, for net run rate
+    first_balls = models.IntegerField(default=0)
+    second_balls = models.IntegerField(default=0)
+
+    # Last Ball already folded into the score columns; later balls are replayed on load
+    flushed_ball = models.PositiveIntegerField(default=0)
+    # Bumped on every save; rendered scorecards are cached against it
+    data_version = models.PositiveIntegerField(default=0)
+    # The archive file an imported match came from
+    source_file = models.CharField(max_length=255, blank=True, default='', db_index=True)
     
     # Current players
     striker = models.ForeignKey(Player, on_delete=models.SET_NULL, related_name='striker_matches', null=True)
@@ -236,6 +279,14 @@ class Match(models.Model):
     bowler_wickets = models.IntegerField(default=0)
     bowler_wides = models.IntegerField(default=0)
     bowler_no_balls = models.IntegerField(default=0)
+
+    # The unbroken partnership of the innings in progress
+    partnership_runs = models.IntegerField(default=0)
+    partnership_balls = models.IntegerField(default=0)
+    # The over in progress
+    over_runs = models.IntegerField(default=0)
+    over_wickets = models.IntegerField(default=0)
+    over_extras = models.IntegerField(default=0)
     
     def __str__(self):
         return f"{self.home_team} vs {self.away_team} on {self.date}"
@@ -378,6 +429,41 @@ class Match(models.Model):
         if not self.is_completed or self.result == 'Draw':
             return ""
         return "X runs" if self.result == 'Home Win' else "Y wickets"
+
+    def record_innings_total(self):
+        """Copy the running score of the current innings into its first_/second_ columns"""
+        balls = self.current_over * 6 + self.current_ball
+        if self.innings == 1:
+            self.first_team = self.batting_team
+            self.first_score = self.total_runs
+            self.first_wickets = self.total_wickets
+            self.first_balls = balls
+        else:
+            self.second_team = self.batting_team
+            self.second_score = self.total_runs
+            self.second_wickets = self.total_wickets
+            self.second_balls = balls
+
+    def decide_result(self):
+        """Set result and win_margin from the innings totals once play has ended"""
+        if self.innings == 1:
+            self.result = 'No Result'
+            self.win_margin = "Match abandoned after first innings"
+            return
+
+        self.record_innings_total()
+        if self.first_score > self.second_score:
+            winning_team = self.first_team
+            self.win_margin = f"{winning_team.name} won by {self.first_score - self.second_score} runs"
+        elif self.second_score > self.first_score:
+            winning_team = self.second_team
+            self.win_margin = f"{winning_team.name} won by {10 - self.second_wickets} wickets"
+        else:
+            self.result = 'Draw'
+            self.win_margin = "Match tied"
+            return
+        self.result = 'Home Win' if winning_team.id == self.home_team_id else 'Away Win'
+
     @property
     def status(self):
         if self.is_live:
@@ -423,14 +509,23 @@ class Match(models.Model):
         return performance
     def save(self, *args, **kwargs):
         # Auto-set batting/bowling teams if not set
-        if self.toss_winner and not self.batting_team:
+        if self.toss_winner_id and not self.batting_team_id:
             if self.toss_decision == 'bat':
                 self.batting_team = self.toss_winner
                 self.bowling_team = self.get_opponent_team(self.toss_winner)
             else:
                 self.bowling_team = self.toss_winner
                 self.batting_team = self.get_opponent_team(self.toss_winner)
+        if self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        # Counted up in the database, so two saves racing never share a version
+        self.data_version = F('data_version') + 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'data_version'}
         super().save(*args, **kwargs)
+        # Left deferred, so only a caller that reads the new version pays for fetching it
+        del self.__dict__['data_version']
 
     def reset_match(self):
         """Reset all match statistics and performances"""
@@ -621,6 +716,58 @@ class BowlingPerformance(models.Model):
         self.save()
 
 
+class PlayerCareerStats(models.Model):
+    """Career totals kept up to date ball by ball from the performance rows"""
+    player = models.OneToOneField(Player, on_delete=models.CASCADE, primary_key=True, related_name='career_stats')
+
+    # Batting
+    batting_innings = models.PositiveIntegerField(default=0)
+    runs = models.PositiveIntegerField(default=0)
+    balls_faced = models.PositiveIntegerField(default=0)
+    fours = models.PositiveIntegerField(default=0)
+    sixes = models.PositiveIntegerField(default=0)
+    fifties = models.PositiveIntegerField(default=0)
+    hundreds = models.PositiveIntegerField(default=0)
+    dismissals = models.PositiveIntegerField(default=0)
+
+    # Bowling
+    bowling_innings = models.PositiveIntegerField(default=0)
+    wickets = models.PositiveIntegerField(default=0)
+    balls_bowled = models.PositiveIntegerField(default=0)
+    runs_conceded = models.PositiveIntegerField(default=0)
+    five_wicket_hauls = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-runs'], name='career_runs_idx'),
+            models.Index(fields=['-wickets'], name='career_wickets_idx'),
+        ]
+
+    @property
+    def batting_average(self):
+        if self.dismissals:
+            return self.runs / self.dismissals
+        return 0.0
+
+    @property
+    def strike_rate(self):
+        if self.balls_faced:
+            return self.runs * 100 / self.balls_faced
+        return 0.0
+
+    @property
+    def bowling_average(self):
+        if self.wickets:
+            return self.runs_conceded / self.wickets
+        return 0.0
+
+    @property
+    def economy(self):
+        if self.balls_bowled:
+            return self.runs_conceded * 6 / self.balls_bowled
+        return 0.0
+
+
 class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     recipient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
@@ -638,10 +785,15 @@ class Favorite(models.Model):
 
 class Ball(models.Model):
     match = models.ForeignKey(Match, on_delete=models.CASCADE)
+    innings = models.PositiveIntegerField(default=1)
     batsman = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='batted_balls')
     bowler = models.ForeignKey(Player, on_delete=models.CASCADE, related_name='bowled_balls')
-    runs = models.IntegerField(default=0)
+    # At the other end when the ball was bowled; not known for imported balls
+    non_striker = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    runs = models.IntegerField(default=0)         # off the bat
+    extra_runs = models.IntegerField(default=0)   # wides, no-balls, byes, leg-byes and penalties
     is_wicket = models.BooleanField(default=False)
+    player_out = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='dismissal_balls')
     over = models.IntegerField(default=1)         # e.g., 0 to 19 for a 20-over match
     ball_number = models.IntegerField(default=1)
     wicket_type = models.CharField(max_length=20, blank=True, choices=[
@@ -651,6 +803,11 @@ class Ball(models.Model):
         ('run_out', 'Run Out'),
         ('stumped', 'Stumped'),
         ('hit_wicket', 'Hit Wicket'),
+        ('retired_out', 'Retired Out'),
+        ('obstructing_field', 'Obstructing the Field'),
+        ('hit_ball_twice', 'Hit the Ball Twice'),
+        ('handled_ball', 'Handled the Ball'),
+        ('timed_out', 'Timed Out'),
     ])
     extras = models.CharField(max_length=20, blank=True, choices=[
         ('wide', 'Wide'),
@@ -659,4 +816,55 @@ class Ball(models.Model):
         ('leg_bye', 'Leg Bye'),
         ('penalty', 'Penalty'),
     ])
-    timestamp = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['match', 'innings', 'id'], name='ball_log_idx'),
+        ]
+
+class FallOfWicket(models.Model):
+    """A wicket as the score stood when it fell, with the partnership it ended"""
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='falls_of_wickets')
+    innings = models.PositiveIntegerField(default=1)
+    wicket = models.PositiveIntegerField()
+    player = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, related_name='falls_of_wickets')
+    partner = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Innings score and legal balls bowled when the wicket fell
+    runs = models.IntegerField(default=0)
+    balls = models.IntegerField(default=0)
+    partnership_runs = models.IntegerField(default=0)
+    partnership_balls = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['innings', 'wicket']
+        constraints = [
+            models.UniqueConstraint(fields=['match', 'innings', 'wicket'], name='unique_fall_of_wicket'),
+        ]
+
+    def __str__(self):
+        return f"{self.runs}-{self.wicket} ({self.overs})"
+
+    @property
+    def overs(self):
+        return f"{self.balls // 6}.{self.balls % 6}"
+
+
+class OverSummary(models.Model):
+    """A finished over, for the runs-per-over and running-score charts"""
+    match = models.ForeignKey(Match, on_delete=models.CASCADE, related_name='over_summaries')
+    innings = models.PositiveIntegerField(default=1)
+    over = models.PositiveIntegerField()
+    bowler = models.ForeignKey(Player, on_delete=models.SET_NULL, null=True, related_name='+')
+    runs = models.IntegerField(default=0)
+    wickets = models.IntegerField(default=0)
+    extras = models.IntegerField(default=0)
+    # The innings score at the end of the over
+    total_runs = models.IntegerField(default=0)
+    total_wickets = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['innings', 'over']
+        constraints = [
+            models.UniqueConstraint(fields=['match', 'innings', 'over'], name='unique_over_summary'),
+        ]
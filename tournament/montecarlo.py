@@ -0,0 +1,94 @@
+"""
+Monte Carlo runs of the rest of a league season.
+
+Nothing here touches Django, so run() can be sent to worker processes
+whatever their start method; tournament.qualification gathers the league
+and adds up what the workers send back.
+
+A league is a dict of NumPy arrays: per team, the points, wins and runs and
+balls for and against so far, and a rank by name for the last tie-break;
+per fixture, the home and away team indexes and the home side's chance of
+winning a match that is not drawn. Scores are drawn from the league's own
+history: a first innings total, a margin for a defended total and the balls
+a successful chase takes. A batch of simulations is a 2-d array over
+(simulation, fixture), and team totals are summed with a matrix product
+against the fixtures' one-hot home and away columns.
+"""
+import numpy as np
+
+BATCH_SIZE = 10_000
+INNINGS_BALLS = 120
+
+
+def run(league, simulations, seed):
+    """How often each team finished in each place, as a (team, place) array of counts"""
+    rng = np.random.default_rng(seed)
+    teams = len(league['points'])
+    counts = np.zeros((teams, teams), dtype=np.int64)
+    done = 0
+    while done < simulations:
+        size = min(BATCH_SIZE, simulations - done)
+        order = _table_order(league, _play(league, size, rng))
+        # order[s, place] is the team in that place, so team * teams + place counts each finish
+        counts += np.bincount(
+            (order * teams + np.arange(teams)).ravel(), minlength=teams * teams,
+        ).reshape(teams, teams)
+        done += size
+    return counts
+
+
+def _play(league, size, rng):
+    """Results and scores of every fixture in `size` simulations, added to the totals so far"""
+    fixtures = len(league['home'])
+    draw = league['draw']
+    roll = rng.random((size, fixtures))
+    home_win = roll < (1 - draw) * league['home_chance']
+    away_win = ~home_win & (roll < 1 - draw)
+    drawn = ~home_win & ~away_win
+
+    home_first = rng.random((size, fixtures)) < 0.5
+    first = rng.choice(league['first_scores'], (size, fixtures))
+    margin = rng.choice(league['margins'], (size, fixtures))
+    chase_balls = rng.choice(league['chase_balls'], (size, fixtures))
+    defended = np.where(home_first, home_win, away_win)
+    chased = np.where(home_first, away_win, home_win)
+    second = np.where(chased, first + 1, np.where(defended, np.maximum(first - margin, 0), first))
+    second_balls = np.where(chased, chase_balls, INNINGS_BALLS)
+
+    home_runs = np.where(home_first, first, second)
+    away_runs = np.where(home_first, second, first)
+    home_balls = np.where(home_first, INNINGS_BALLS, second_balls)
+    away_balls = np.where(home_first, second_balls, INNINGS_BALLS)
+
+    teams = len(league['points'])
+    at_home = np.zeros((fixtures, teams))
+    at_home[np.arange(fixtures), league['home']] = 1
+    away = np.zeros((fixtures, teams))
+    away[np.arange(fixtures), league['away']] = 1
+
+    def total(name, home_values, away_values):
+        return league[name] + home_values @ at_home + away_values @ away
+
+    win, draw_points = league['win_points'], league['draw_points']
+    return {
+        'points': total('points', home_win * win + drawn * draw_points, away_win * win + drawn * draw_points),
+        'won': total('won', home_win * 1.0, away_win * 1.0),
+        'runs_for': total('runs_for', home_runs, away_runs),
+        'balls_for': total('balls_for', home_balls, away_balls),
+        'runs_against': total('runs_against', away_runs, home_runs),
+        'balls_against': total('balls_against', away_balls, home_balls),
+    }
+
+
+def net_run_rate(runs_for, balls_for, runs_against, balls_against):
+    """Net run rate rounded as the standings table rounds it; 0 until a team has batted and bowled"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = runs_for * 6 / balls_for - runs_against * 6 / balls_against
+    return np.round(np.where((balls_for > 0) & (balls_against > 0), rate, 0.0), 3)
+
+
+def _table_order(league, totals):
+    """Teams in table order for each simulation: points, then net run rate, then wins, then name"""
+    nrr = net_run_rate(totals['runs_for'], totals['balls_for'], totals['runs_against'], totals['balls_against'])
+    name = np.broadcast_to(league['name_rank'], nrr.shape)
+    return np.lexsort((name, -totals['won'], -nrr, -totals['points']), axis=-1)
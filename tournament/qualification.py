@@ -0,0 +1,225 @@
+"""
+Each team's chances of finishing in the qualifying places.
+
+simulate() plays the remaining fixtures out QUALIFICATION_SIMULATIONS times
+from the table as it stands (see tournament.montecarlo). The runs are split
+into shards and spread over a pool of QUALIFICATION_WORKERS processes.
+Places are decided as the standings decide them: points, then net run
+rate, then wins, then name.
+
+Results are cached against the finished matches and worked out again only
+when a match is completed, by refresh_later() in a background thread, or by
+the refresh_qualification command. Reads never simulate: the standings
+pages show the last result worked out, stale or not, and nothing before
+the first one.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, Max
+
+from . import montecarlo
+from .models import Match
+from .standings import DRAW_POINTS, RESULT_OUTCOMES, WIN_POINTS, compute_standings, totals_by_team
+
+logger = logging.getLogger(__name__)
+
+SIMULATIONS = 1_000_000
+PLACES = 4
+SHARDS_PER_WORKER = 4
+CACHE_TIMEOUT = 24 * 60 * 60
+# The last result worked out, whichever matches it was worked out from; kept until replaced
+LATEST_KEY = 'qualification:latest'
+
+# Scores to draw from until the league has MIN_HISTORY matches of its own
+MIN_HISTORY = 20
+DEFAULT_FIRST_SCORES = np.arange(130, 191)
+DEFAULT_MARGINS = np.arange(1, 41)
+DEFAULT_CHASE_BALLS = np.arange(96, 121)
+# Share of matches drawn or washed out, and how many matches of history it counts as
+DRAW_PRIOR = 0.02
+PRIOR_MATCHES = 50
+
+_refreshing = threading.Lock()
+
+
+def league():
+    """The standings rows, in table order, and the league as montecarlo.run takes it"""
+    rows = compute_standings()
+    totals = totals_by_team()
+    index = {row.team.id: i for i, row in enumerate(rows)}
+    fixtures = np.array(
+        [(index[home], index[away]) for home, away in
+         # A match being played is not a fixture yet to be played out from scratch
+         Match.objects.filter(result='TBD', is_live=False).values_list('home_team_id', 'away_team_id')],
+        dtype=np.int64,
+    ).reshape(-1, 2)
+
+    # A team's strength is its win rate, with a win and a loss added so new teams start even
+    strength = np.array([(row.won + 1) / (row.played + 2) for row in rows])
+    home, away = fixtures.T
+
+    def column(name):
+        return np.array([totals[row.team.id][name] for row in rows], dtype=float)
+
+    return rows, {
+        'points': np.array([row.points for row in rows], dtype=float),
+        'won': np.array([row.won for row in rows], dtype=float),
+        'runs_for': column('runs_for'),
+        'balls_for': column('balls_for'),
+        'runs_against': column('runs_against'),
+        'balls_against': column('balls_against'),
+        'name_rank': np.argsort(np.argsort([row.team.name for row in rows])),
+        'home': home,
+        'away': away,
+        'home_chance': strength[home] / (strength[home] + strength[away]),
+        'win_points': WIN_POINTS,
+        'draw_points': DRAW_POINTS,
+        **history(),
+    }
+
+
+def history():
+    """Scores to draw the simulated matches from, and the chance of a draw, from the finished matches"""
+    finished = list(Match.objects.filter(is_live=False, result__in=RESULT_OUTCOMES).values_list(
+        'result', 'first_score', 'second_score', 'first_balls', 'second_balls',
+    ))
+    shared = sum(result in ('Draw', 'No Result') for result, *_ in finished)
+    scores = np.array(
+        [(first, second, balls) for result, first, second, first_balls, balls in finished
+         if first_balls and balls and balls <= montecarlo.INNINGS_BALLS],
+        dtype=np.int64,
+    ).reshape(-1, 3)
+    first, second, second_balls = scores.T
+    draw = (shared + DRAW_PRIOR * PRIOR_MATCHES) / (len(finished) + PRIOR_MATCHES)
+
+    def sample(values, default):
+        return values if len(values) >= MIN_HISTORY else default
+
+    return {
+        'draw': draw,
+        'first_scores': sample(first, DEFAULT_FIRST_SCORES),
+        'margins': sample((first - second)[first > second], DEFAULT_MARGINS),
+        'chase_balls': sample(second_balls[second > first], DEFAULT_CHASE_BALLS),
+    }
+
+
+def run(data, simulations, workers=1, seed=None):
+    """Finishing place counts over `simulations` runs, sharded over `workers` processes"""
+    shards = workers * SHARDS_PER_WORKER if workers > 1 else 1
+    sizes = [simulations // shards + (i < simulations % shards) for i in range(shards)]
+    seeds = np.random.SeedSequence(seed).spawn(shards)
+    if workers == 1:
+        return montecarlo.run(data, simulations, seeds[0])
+    # Spawned rather than forked, since refresh_later() starts the pool from a thread of the server
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return sum(pool.map(montecarlo.run, repeat(data), sizes, seeds))
+
+
+def simulate(simulations=None, workers=None, seed=None):
+    """Qualification and finishing place chances of every team, in table order"""
+    simulations = simulations or getattr(settings, 'QUALIFICATION_SIMULATIONS', SIMULATIONS)
+    workers = workers or getattr(settings, 'QUALIFICATION_WORKERS', None) or os.cpu_count()
+    places = getattr(settings, 'QUALIFICATION_PLACES', PLACES)
+    rows, data = league()
+    chances = run(data, simulations, workers, seed) / simulations
+    return {
+        'simulations': simulations,
+        'places': places,
+        'teams': [
+            {
+                'team_id': row.team.id,
+                'team': row.team.name,
+                'qualify': round(float(team[:places].sum()), 4),
+                'positions': [round(float(chance), 4) for chance in team],
+            }
+            for row, team in zip(rows, chances)
+        ],
+    }
+
+
+def stamp():
+    """Changes whenever a match is completed"""
+    finished = Match.objects.filter(is_live=False, result__in=RESULT_OUTCOMES).aggregate(
+        count=Count('id'), last=Max('id'),
+    )
+    return f"{finished['count']}-{finished['last']}"
+
+
+def cache_key(version):
+    return f'qualification:{version}'
+
+
+def current():
+    """The chances as of the last completed match, or None if they have not been worked out yet"""
+    return cache.get(cache_key(stamp()))
+
+
+def latest():
+    """The last chances worked out, even if a match has been completed since, or None"""
+    return cache.get(LATEST_KEY)
+
+
+def store(version, result):
+    cache.set(cache_key(version), result, CACHE_TIMEOUT)
+    cache.set(LATEST_KEY, result, None)
+
+
+def refresh(**options):
+    """Work the chances out again and cache them; options go to simulate()"""
+    version = stamp()
+    result = simulate(**options)
+    store(version, result)
+    return result
+
+
+def refresh_later():
+    """Refresh in a background thread, unless one is already running; returns whether one was started"""
+    if not _refreshing.acquire(blocking=False):
+        return False
+
+    def work():
+        try:
+            done = None
+            # Go again if another match was completed while the last run was going
+            while (version := stamp()) != done:
+                if cache.get(cache_key(version)) is None:
+                    store(version, simulate())
+                done = version
+        except Exception:
+            logger.exception("Could not work out qualification chances")
+        finally:
+            connection.close()
+            _refreshing.release()
+
+    threading.Thread(target=work, name='qualification', daemon=True).start()
+    return True
+
+
+def benchmark(simulations, workers):
+    """Seconds and simulations per second for each worker count, pool start-up included"""
+    rows, data = league()
+    results = []
+    for count in workers:
+        started = time.perf_counter()
+        run(data, simulations, count)
+        seconds = time.perf_counter() - started
+        results.append({'workers': count, 'seconds': seconds, 'rate': simulations / seconds})
+    return results
+
+
+def by_team():
+    """The last chances worked out, by team id; reads never start a refresh"""
+    result = latest()
+    if result is None:
+        return {}
+    return {team['team_id']: team for team in result['teams']}
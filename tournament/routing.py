@@ -3,4 +3,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/match/(?P<match_id>\w+)/$', consumers.MatchConsumer.as_asgi()),
+    re_path(r'ws/live/$', consumers.LiveTickerConsumer.as_asgi()),
 ]
\ No newline at end of file
@@ -0,0 +1,246 @@
+"""
+Scorecards.
+
+build() reads every batting, bowling and fall of wicket row of a match in
+one query each and groups them by innings in Python, returning light
+__slots__ rows with the innings totals and partnerships worked out in
+memory, for match_detail.
+
+over_series() gives the runs-per-over and running-score charts of both
+innings from the OverSummary rows, with the over being bowled taken from
+the match counters, so no chart request reads the Ball log.
+
+match_performances is polled by every open scoring page, so the batting and
+bowling tables are rendered once per (match, innings, data_version) and kept
+in an LRU cache. Match.data_version is counted up in the database on every
+save of the match and every write-behind flush, so no two versions of the
+rows share a number and a cached render is never served stale.
+"""
+import threading
+from functools import lru_cache
+
+from django.http import Http404
+from django.template.loader import render_to_string
+
+from . import live
+from .models import BattingPerformance, BowlingPerformance, FallOfWicket, Match, OverSummary
+
+CACHE_SIZE = 256
+
+TOTALS = ('runs__sum', 'balls_faced__sum', 'fours__sum', 'sixes__sum')
+
+# One render per version, however many viewers miss the cache at once; a
+# lock per match, so renders of different matches never wait on each other
+_render_locks = {}
+_locks_lock = threading.Lock()
+
+
+class PlayerName:
+    __slots__ = ('id', 'name')
+
+    def __init__(self, id, name):
+        self.id = id
+        self.name = name
+
+
+class BattingRow:
+    __slots__ = ('player', 'bowler', 'runs', 'balls_faced', 'fours', 'sixes', 'not_out')
+
+    def __init__(self, player, bowler, runs, balls_faced, fours, sixes, not_out):
+        self.player = player
+        self.bowler = bowler
+        self.runs = runs
+        self.balls_faced = balls_faced
+        self.fours = fours
+        self.sixes = sixes
+        self.not_out = not_out
+
+    @property
+    def strike_rate(self):
+        if self.balls_faced > 0:
+            return (self.runs / self.balls_faced) * 100
+        return 0
+
+
+class BowlingRow:
+    __slots__ = ('player', 'overs', 'maidens', 'runs_conceded', 'wickets', 'economy')
+
+    def __init__(self, player, overs, maidens, runs_conceded, wickets, economy):
+        self.player = player
+        self.overs = overs
+        self.maidens = maidens
+        self.runs_conceded = runs_conceded
+        self.wickets = wickets
+        self.economy = economy
+
+
+class FallRow:
+    __slots__ = ('wicket', 'player', 'runs', 'balls')
+
+    def __init__(self, wicket, player, runs, balls):
+        self.wicket = wicket
+        self.player = player
+        self.runs = runs
+        self.balls = balls
+
+    @property
+    def overs(self):
+        return f"{self.balls // 6}.{self.balls % 6}"
+
+
+class PartnershipRow:
+    __slots__ = ('wicket', 'batters', 'runs', 'balls', 'unbroken')
+
+    def __init__(self, wicket, batters, runs, balls, unbroken=False):
+        self.wicket = wicket
+        self.batters = batters
+        self.runs = runs
+        self.balls = balls
+        self.unbroken = unbroken
+
+
+class Innings:
+    """One innings of a scorecard; total is shaped like the Sum() aggregate it replaces"""
+    __slots__ = ('batting', 'bowling', 'total', 'wickets', 'falls', 'partnerships')
+
+    def __init__(self):
+        self.batting = []
+        self.bowling = []
+        self.total = dict.fromkeys(TOTALS)
+        self.wickets = 0
+        self.falls = []
+        self.partnerships = []
+
+    def close(self, runs, balls):
+        """Add the unbroken partnership, the score since the last wicket"""
+        if self.falls:
+            runs -= self.falls[-1].runs
+            balls -= self.falls[-1].balls
+        batters = [row.player.name for row in self.batting if row.not_out]
+        if batters or runs or balls:
+            self.partnerships.append(PartnershipRow(len(self.falls) + 1, batters, runs, balls, unbroken=True))
+
+
+def build(match):
+    """Both innings of a match's scorecard, batting by runs and bowling by wickets"""
+    match_id = match.pk
+    innings = {1: Innings(), 2: Innings()}
+    batting = BattingPerformance.objects.filter(match_id=match_id).order_by('innings', '-runs').values_list(
+        'innings', 'player_id', 'player__name', 'bowler_id', 'bowler__name',
+        'runs', 'balls_faced', 'fours', 'sixes', 'not_out',
+    )
+    for number, player_id, name, bowler_id, bowler, runs, balls, fours, sixes, not_out in batting:
+        card = innings.setdefault(number, Innings())
+        card.batting.append(BattingRow(
+            PlayerName(player_id, name), PlayerName(bowler_id, bowler) if bowler_id else None,
+            runs, balls, fours, sixes, not_out,
+        ))
+        for key, value in zip(TOTALS, (runs, balls, fours, sixes)):
+            card.total[key] = (card.total[key] or 0) + value
+        card.wickets += not not_out
+
+    bowling = BowlingPerformance.objects.filter(match_id=match_id).order_by('innings', '-wickets').values_list(
+        'innings', 'player_id', 'player__name', 'overs', 'maidens', 'runs_conceded', 'wickets', 'economy',
+    )
+    for number, player_id, name, *figures in bowling:
+        innings.setdefault(number, Innings()).bowling.append(BowlingRow(PlayerName(player_id, name), *figures))
+
+    falls = FallOfWicket.objects.filter(match_id=match_id).values_list(
+        'innings', 'wicket', 'player__name', 'partner__name', 'runs', 'balls', 'partnership_runs', 'partnership_balls',
+    )
+    for number, wicket, name, partner, runs, balls, partnership_runs, partnership_balls in falls:
+        card = innings.setdefault(number, Innings())
+        card.falls.append(FallRow(wicket, PlayerName(None, name), runs, balls))
+        card.partnerships.append(PartnershipRow(
+            wicket, [name for name in (name, partner) if name], partnership_runs, partnership_balls,
+        ))
+
+    # The innings being played is on the match counters; a finished first innings was copied out of them
+    current = match.total_runs, match.current_over * 6 + match.current_ball
+    if match.innings == 1:
+        innings[1].close(*current)
+    else:
+        innings[1].close(match.first_score, match.first_balls)
+        innings[2].close(*current)
+    return innings
+
+
+def over_in_progress(match):
+    """The over being bowled as an OverSummary-like tuple, or None between overs"""
+    if not match.is_live or not (match.current_ball or match.over_runs or match.over_wickets):
+        return None
+    return (
+        match.innings, match.current_over, match.over_runs, match.over_wickets, match.over_extras,
+        match.total_runs, match.total_wickets,
+    )
+
+
+def over_series(match_id, current=None):
+    """
+    Both innings over by over, as parallel lists ready for charting.
+
+    current is the over_in_progress() of the match; it is added as the last
+    over of its innings with partial set.
+    """
+    series = {
+        number: {'overs': [], 'runs': [], 'wickets': [], 'extras': [], 'score': [], 'fallen': [], 'partial': False}
+        for number in (1, 2)
+    }
+    rows = list(OverSummary.objects.filter(match_id=match_id).values_list(
+        'innings', 'over', 'runs', 'wickets', 'extras', 'total_runs', 'total_wickets',
+    ))
+    if current is not None:
+        rows.append(current)
+    for innings, over, runs, wickets, extras, total_runs, total_wickets in rows:
+        chart = series[innings]
+        chart['overs'].append(over + 1)
+        chart['runs'].append(runs)
+        chart['wickets'].append(wickets)
+        chart['extras'].append(extras)
+        chart['score'].append(total_runs)
+        chart['fallen'].append(total_wickets)
+    if current is not None:
+        series[current[0]]['partial'] = True
+    return {'innings': series}
+
+
+def version(match_id):
+    """(innings, data_version) of a match, from memory if this process is scoring it"""
+    state = live.peek(match_id)
+    if state is not None:
+        with state.lock:
+            return state.match.innings, state.match.data_version
+    try:
+        return Match.objects.values_list('innings', 'data_version').get(pk=match_id)
+    except Match.DoesNotExist:
+        raise Http404("No Match matches the given query.")
+
+
+def etag(match_id, innings, data_version):
+    return f'"{match_id}-{innings}-{data_version}"'
+
+
+def fragments(match_id, innings, data_version):
+    """Batting and bowling table HTML for a match as of data_version"""
+    with _locks_lock:
+        lock = _render_locks.setdefault(match_id, threading.Lock())
+    with lock:
+        return _render(match_id, innings, data_version)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _render(match_id, innings, data_version):
+    batting_performances = BattingPerformance.objects.filter(match_id=match_id).select_related('player', 'bowler')
+    bowling_performances = BowlingPerformance.objects.filter(match_id=match_id).select_related('player')
+
+    batting_html = render_to_string('tournament/_batting_table.html', {
+        'batting_performances': batting_performances
+    })
+    bowling_html = render_to_string('tournament/_bowling_table.html', {
+        'bowling_performances': bowling_performances
+    })
+    return batting_html, bowling_html
+
+
+def clear():
+    _render.cache_clear()
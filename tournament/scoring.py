@@ -0,0 +1,673 @@
+"""
+Ball-by-ball scoring.
+
+Every delivery is appended to the Ball log and folded into the scoreboard by
+apply_ball(), a plain-Python reducer that never touches the database.
+write() persists what a scoreboard gained since it was loaded from the match
+row as F() increments in one transaction; record_ball() does that for a single
+delivery. replay()
+folds a stored log through the same reducer, so any scoreboard can be rebuilt
+from its balls.
+
+The reducer also keeps the running partnership and the over in progress, and
+notes each fall of wicket and finished over as it happens, so none of them
+need the log read back; write() inserts the new FallOfWicket and OverSummary
+rows and rebuild_summaries() regenerates them from the log.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Exists, F, Value, When
+from django.db.models.functions import Floor, Mod, Round
+from django.db.models.lookups import GreaterThan
+
+from . import career
+from .models import (
+    Ball, BattingPerformance, BowlingPerformance, FallOfWicket, Match, OverSummary, PlayerCareerStats,
+)
+
+WIDE = 'wide'
+NO_BALL = 'no_ball'
+PENALTY = 'penalty'
+RUN_OUT = 'run_out'
+
+# Dismissals credited to the bowler; run outs, retirements and the rest are not
+BOWLER_WICKETS = ('bowled', 'caught', 'lbw', 'stumped', 'hit_wicket')
+
+SEATS = ('striker', 'non_striker', 'bowler')
+
+# Match columns that mirror Scoreboard attributes one to one
+MATCH_COUNTERS = (
+    'total_runs', 'total_wickets', 'current_over', 'current_ball',
+    'striker_id', 'non_striker_id', 'bowler_id',
+    'bowler_runs', 'bowler_wickets', 'bowler_balls', 'bowler_wides', 'bowler_no_balls',
+    'partnership_runs', 'partnership_balls', 'over_runs', 'over_wickets', 'over_extras',
+)
+
+BATTING_COUNTERS = ('runs', 'balls', 'fours', 'sixes')
+
+MATCH_UPDATE_FIELDS = [
+    *MATCH_COUNTERS,
+    *(f'{seat}_{counter}' for seat in ('striker', 'non_striker') for counter in BATTING_COUNTERS),
+    'current_run_rate', 'flushed_ball',
+]
+
+
+class BattingLine:
+    __slots__ = ('runs', 'balls', 'fours', 'sixes', 'out', 'bowler_id')
+
+    def __init__(self, runs=0, balls=0, fours=0, sixes=0, out=False, bowler_id=None):
+        self.runs = runs
+        self.balls = balls
+        self.fours = fours
+        self.sixes = sixes
+        self.out = out
+        self.bowler_id = bowler_id
+
+    def copy(self):
+        return BattingLine(self.runs, self.balls, self.fours, self.sixes, self.out, self.bowler_id)
+
+
+class BowlingLine:
+    __slots__ = ('balls', 'runs', 'wickets', 'wides', 'no_balls', 'maidens')
+
+    def __init__(self, balls=0, runs=0, wickets=0, wides=0, no_balls=0, maidens=0):
+        self.balls = balls
+        self.runs = runs
+        self.wickets = wickets
+        self.wides = wides
+        self.no_balls = no_balls
+        self.maidens = maidens
+
+    @property
+    def overs(self):
+        return self.balls // 6 + (self.balls % 6) / 10
+
+    @property
+    def economy(self):
+        if self.balls:
+            return round(self.runs * 6 / self.balls, 2)
+        return 0
+
+
+class Fall:
+    __slots__ = ('wicket', 'player_id', 'partner_id', 'runs', 'balls', 'partnership_runs', 'partnership_balls')
+
+    def __init__(self, wicket, player_id, partner_id, runs, balls, partnership_runs, partnership_balls):
+        self.wicket = wicket
+        self.player_id = player_id
+        self.partner_id = partner_id
+        self.runs = runs
+        self.balls = balls
+        self.partnership_runs = partnership_runs
+        self.partnership_balls = partnership_balls
+
+
+class OverLine:
+    __slots__ = ('over', 'bowler_id', 'runs', 'wickets', 'extras', 'total_runs', 'total_wickets')
+
+    def __init__(self, over, bowler_id, runs, wickets, extras, total_runs, total_wickets):
+        self.over = over
+        self.bowler_id = bowler_id
+        self.runs = runs
+        self.wickets = wickets
+        self.extras = extras
+        self.total_runs = total_runs
+        self.total_wickets = total_wickets
+
+
+class Scoreboard:
+    """
+    One innings in progress: the match counters plus every batting and bowling line.
+
+    pair holds the batsmen seen in the current partnership; falls and overs
+    the wickets taken and overs finished since the board was loaded.
+    """
+    __slots__ = MATCH_COUNTERS + ('batting', 'bowling', 'pair', 'falls', 'overs')
+
+    def __init__(self):
+        for name in MATCH_COUNTERS:
+            setattr(self, name, 0)
+        self.striker_id = self.non_striker_id = self.bowler_id = None
+        self.batting = {}
+        self.bowling = {}
+        self.pair = []
+        self.falls = []
+        self.overs = []
+
+    @classmethod
+    def from_match(cls, match):
+        """
+        The live innings as the match row sees it.
+
+        The batsmen's lines are complete because the match mirrors them; the
+        bowler's line starts empty, so after a delivery it holds only the change.
+        """
+        board = cls()
+        for name in MATCH_COUNTERS:
+            setattr(board, name, getattr(match, name))
+        for seat in ('striker', 'non_striker'):
+            player_id = getattr(match, f'{seat}_id')
+            if player_id is not None:
+                board.batting[player_id] = BattingLine(
+                    *(getattr(match, f'{seat}_{counter}') for counter in BATTING_COUNTERS)
+                )
+        return board
+
+    def batting_line(self, player_id):
+        line = self.batting.get(player_id)
+        if line is None:
+            line = self.batting[player_id] = BattingLine()
+        return line
+
+    def bowling_line(self, player_id):
+        line = self.bowling.get(player_id)
+        if line is None:
+            line = self.bowling[player_id] = BowlingLine()
+        return line
+
+    @property
+    def run_rate(self):
+        balls = self.current_over * 6 + self.current_ball
+        if balls:
+            return round(self.total_runs * 6 / balls, 2)
+        return 0
+
+    def batting_snapshot(self):
+        return {player_id: line.copy() for player_id, line in self.batting.items()}
+
+    def swap_strike(self):
+        self.striker_id, self.non_striker_id = self.non_striker_id, self.striker_id
+
+    def join_partnership(self, player_id):
+        if player_id is None or player_id in self.pair:
+            return
+        if len(self.pair) == 2:
+            # Someone left without a wicket, so the earlier of the two retired
+            del self.pair[0]
+        self.pair.append(player_id)
+
+    def fall(self, out_id):
+        """Close the partnership on a wicket that has just been counted"""
+        self.join_partnership(out_id)
+        partner_id = next((player_id for player_id in self.pair if player_id != out_id), None)
+        self.falls.append(Fall(
+            self.total_wickets, out_id, partner_id,
+            self.total_runs, self.current_over * 6 + self.current_ball,
+            self.partnership_runs, self.partnership_balls,
+        ))
+        self.pair = [partner_id] if partner_id is not None else []
+        self.partnership_runs = 0
+        self.partnership_balls = 0
+
+    def summarise_over(self):
+        """Note the over in progress as finished, if anything happened in it"""
+        if self.current_ball or self.over_runs or self.over_wickets:
+            self.overs.append(OverLine(
+                self.current_over, self.bowler_id, self.over_runs, self.over_wickets, self.over_extras,
+                self.total_runs, self.total_wickets,
+            ))
+
+
+def apply_ball(board, ball):
+    """
+    Fold one delivery into the scoreboard.
+
+    Runs off the bat go to the striker, extras to the team alone. The bowler
+    is charged with the runs off the bat, wides and no-balls, but not byes,
+    leg-byes or penalties. Wides and no-balls are not legal balls, and odd
+    runs taken (beyond the one run a wide or no-ball is worth) change the
+    strike. Only BOWLER_WICKETS count for the bowler. Everything the ball is
+    worth goes to the partnership it was bowled in, even if it ends it.
+    """
+    bowling = board.bowling_line(ball.bowler_id)
+    batting = board.batting_line(ball.batsman_id)
+    # Both batsmen at the crease are in the partnership, the one facing or not
+    board.join_partnership(ball.non_striker_id)
+    board.join_partnership(ball.batsman_id)
+
+    total = ball.runs + ball.extra_runs
+    board.total_runs += total
+    board.partnership_runs += total
+    board.over_runs += total
+    board.over_extras += ball.extra_runs
+    conceded = ball.runs + (ball.extra_runs if ball.extras in (WIDE, NO_BALL) else 0)
+    bowling.runs += conceded
+    board.bowler_runs += conceded
+
+    if ball.extras == WIDE:
+        bowling.wides += 1
+        board.bowler_wides += 1
+    elif ball.extras == NO_BALL:
+        bowling.no_balls += 1
+        board.bowler_no_balls += 1
+    else:
+        board.current_ball += 1
+        board.partnership_balls += 1
+        board.bowler_balls += 1
+        bowling.balls += 1
+        batting.balls += 1
+
+    batting.runs += ball.runs
+    if ball.runs == 4:
+        batting.fours += 1
+    elif ball.runs == 6:
+        batting.sixes += 1
+
+    if ball.is_wicket:
+        out_id = ball.player_out_id or ball.batsman_id
+        dismissed = board.batting_line(out_id)
+        dismissed.out = True
+        board.total_wickets += 1
+        board.over_wickets += 1
+        if ball.wicket_type in BOWLER_WICKETS:
+            dismissed.bowler_id = ball.bowler_id
+            bowling.wickets += 1
+            board.bowler_wickets += 1
+        board.fall(out_id)
+        if out_id == board.striker_id:
+            board.striker_id = None
+        elif out_id == board.non_striker_id:
+            board.non_striker_id = None
+    elif _runs_taken(ball) % 2:
+        board.swap_strike()
+
+
+def _runs_taken(ball):
+    """Runs the batsmen ran or hit: all but the one run a wide or no-ball is worth, and penalties"""
+    if ball.extras in (WIDE, NO_BALL):
+        return ball.runs + ball.extra_runs - 1
+    if ball.extras == PENALTY:
+        return ball.runs
+    return ball.runs + ball.extra_runs
+
+
+def end_over(board):
+    """Close the current over: credit a maiden, summarise it, reset the bowler's over and change ends"""
+    if board.bowler_id is not None and board.bowler_runs == 0:
+        board.bowling_line(board.bowler_id).maidens += 1
+    board.summarise_over()
+    board.over_runs = 0
+    board.over_wickets = 0
+    board.over_extras = 0
+    board.bowler_runs = 0
+    board.bowler_wickets = 0
+    board.bowler_balls = 0
+    board.bowler_wides = 0
+    board.bowler_no_balls = 0
+    if board.striker_id and board.non_striker_id:
+        board.swap_strike()
+    board.current_ball = 0
+    board.current_over += 1
+
+
+def fold(board, ball):
+    """Apply a logged ball, closing the overs the log has moved past"""
+    while board.current_over < ball.over:
+        end_over(board)
+    board.striker_id = ball.batsman_id
+    if ball.non_striker_id is not None:
+        board.non_striker_id = ball.non_striker_id
+    board.bowler_id = ball.bowler_id
+    apply_ball(board, ball)
+
+
+def replay(balls):
+    """Rebuild the scoreboard of each innings from Ball rows in the order they were bowled"""
+    boards = {}
+    for ball in balls:
+        board = boards.get(ball.innings)
+        if board is None:
+            board = boards[ball.innings] = Scoreboard()
+        fold(board, ball)
+    return boards
+
+
+def _increments(**deltas):
+    return {field: F(field) + value for field, value in deltas.items() if value}
+
+
+def _update_rows(queryset, changes):
+    """Apply {player_id: {field: expression}} to each player's row in a single UPDATE"""
+    changes = {player_id: fields for player_id, fields in changes.items() if fields}
+    if not changes:
+        return 0
+    columns = defaultdict(dict)
+    for player_id, fields in changes.items():
+        for field, value in fields.items():
+            columns[field][player_id] = value
+    updates = {}
+    for field, values in columns.items():
+        if len(changes) == 1:
+            updates[field] = values.popitem()[1]
+        else:
+            whens = [When(player_id=player_id, then=value) for player_id, value in values.items()]
+            output_field = queryset.model._meta.get_field(field)
+            updates[field] = Case(*whens, default=F(field), output_field=output_field)
+    return queryset.filter(player_id__in=changes).update(**updates)
+
+
+def _batting_changes(before, after):
+    changes = _increments(
+        runs=after.runs - before.runs,
+        balls_faced=after.balls - before.balls,
+        fours=after.fours - before.fours,
+        sixes=after.sixes - before.sixes,
+    )
+    if after.out and not before.out:
+        changes['not_out'] = Value(False)
+        changes['bowler_id'] = Value(after.bowler_id)
+    return changes
+
+
+def _bowling_changes(delta):
+    """
+    Add a bowler's change to their row.
+
+    overs is stored as overs.balls, so it and the economy are recomputed in SQL
+    from the row's ball count instead of reading the row first.
+    """
+    changes = _increments(runs_conceded=delta.runs, wickets=delta.wickets, maidens=delta.maidens)
+    if delta.balls or delta.runs:
+        whole = Floor('overs')
+        balls = whole * 6 + Round((F('overs') - whole) * 10) + delta.balls
+        changes['overs'] = Round(Floor(balls / 6) + Mod(balls, 6) / 10, 1)
+        changes['economy'] = Case(
+            When(GreaterThan(balls, 0), then=Round((F('runs_conceded') + delta.runs) * 6.0 / balls, 2)),
+            default=F('economy'),
+        )
+    return changes
+
+
+def _career_changes(match, before, board):
+    changes = defaultdict(dict)
+    for player_id, old in before.items():
+        line = board.batting[player_id]
+        changes[player_id].update(_increments(**career.batting_deltas(
+            old.runs,
+            runs=line.runs - old.runs,
+            balls=line.balls - old.balls,
+            fours=line.fours - old.fours,
+            sixes=line.sixes - old.sixes,
+            dismissed=line.out and not old.out,
+        )))
+    for player_id, delta in board.bowling.items():
+        changes[player_id].update(_increments(**career.bowling_deltas(
+            0, runs=delta.runs, balls=delta.balls, wickets=delta.wickets,
+        )))
+        if delta.wickets:
+            # The bowling row has already been updated, so the haul is new if these wickets reached it
+            fifth = BowlingPerformance.objects.filter(
+                match=match, innings=match.innings, player_id=player_id,
+                wickets__gte=career.FIVE_WICKETS, wickets__lt=career.FIVE_WICKETS + delta.wickets,
+            )
+            changes[player_id]['five_wicket_hauls'] = Case(
+                When(Exists(fifth), then=F('five_wicket_hauls') + 1),
+                default=F('five_wicket_hauls'),
+                output_field=PlayerCareerStats._meta.get_field('five_wicket_hauls'),
+            )
+    return {player_id: fields for player_id, fields in changes.items() if fields}
+
+
+def _falls(match_id, innings, board):
+    return [
+        FallOfWicket(
+            match_id=match_id, innings=innings, wicket=fall.wicket,
+            player_id=fall.player_id, partner_id=fall.partner_id, runs=fall.runs, balls=fall.balls,
+            partnership_runs=fall.partnership_runs, partnership_balls=fall.partnership_balls,
+        )
+        for fall in board.falls
+    ]
+
+
+def _overs(match_id, innings, board):
+    return [
+        OverSummary(
+            match_id=match_id, innings=innings, over=line.over, bowler_id=line.bowler_id,
+            runs=line.runs, wickets=line.wickets, extras=line.extras,
+            total_runs=line.total_runs, total_wickets=line.total_wickets,
+        )
+        for line in board.overs
+    ]
+
+
+def innings_rows(match_id, innings, board):
+    """Unsaved batting, bowling, fall of wicket and over rows for a finished innings"""
+    return [
+        *(
+            BattingPerformance(
+                match_id=match_id, innings=innings, player_id=player_id,
+                runs=line.runs, balls_faced=line.balls, fours=line.fours, sixes=line.sixes,
+                not_out=not line.out, bowler_id=line.bowler_id,
+            )
+            for player_id, line in board.batting.items()
+        ),
+        *(
+            BowlingPerformance(
+                match_id=match_id, innings=innings, player_id=player_id,
+                overs=line.overs, runs_conceded=line.runs, wickets=line.wickets,
+                maidens=line.maidens, economy=line.economy,
+            )
+            for player_id, line in board.bowling.items()
+        ),
+        *_falls(match_id, innings, board),
+        *_overs(match_id, innings, board),
+    ]
+
+
+def _record_careers(changes):
+    careers = PlayerCareerStats.objects.all()
+    if _update_rows(careers, changes) < len(changes):
+        # Careers normally exist from the start of the innings; create any that do not
+        existing = set(careers.filter(player_id__in=changes).values_list('player_id', flat=True))
+        missing = {player_id: fields for player_id, fields in changes.items() if player_id not in existing}
+        PlayerCareerStats.objects.bulk_create(PlayerCareerStats(player_id=player_id) for player_id in missing)
+        _update_rows(careers, missing)
+
+
+def show(match, board):
+    """Copy the scoreboard onto a match instance without saving it"""
+    seated = {
+        getattr(match, f'{seat}_id'): getattr(match, seat)
+        for seat in SEATS if getattr(Match, seat).is_cached(match)
+    }
+    for name in MATCH_COUNTERS:
+        setattr(match, name, getattr(board, name))
+    # Hand already loaded players to their new seats so nobody is fetched again
+    for seat in SEATS:
+        player_id = getattr(board, f'{seat}_id')
+        if player_id in seated:
+            setattr(match, seat, seated[player_id])
+    for seat in ('striker', 'non_striker'):
+        line = board.batting.get(getattr(board, f'{seat}_id')) or BattingLine()
+        for counter in BATTING_COUNTERS:
+            setattr(match, f'{seat}_{counter}', getattr(line, counter))
+    match.current_run_rate = board.run_rate
+
+
+def deliver(match, board, runs=0, extras='', wicket_type='', out_player='striker'):
+    """Fold a new delivery into the board and return its unsaved Ball row"""
+    player_out_id = None
+    if wicket_type:
+        player_out_id = board.non_striker_id if out_player == 'non_striker' else board.striker_id
+
+    ball = Ball(
+        match=match,
+        innings=match.innings,
+        batsman_id=board.striker_id,
+        non_striker_id=board.non_striker_id,
+        bowler_id=board.bowler_id,
+        # The scorer's runs are off the bat, or all extras when the ball is an extra
+        runs=0 if extras else runs,
+        extra_runs=runs if extras else 0,
+        extras=extras,
+        is_wicket=bool(wicket_type),
+        wicket_type=wicket_type,
+        player_out_id=player_out_id,
+        over=board.current_over,
+    )
+    apply_ball(board, ball)
+    ball.ball_number = board.current_ball
+    return ball
+
+
+class StaleMatch(Exception):
+    """The match row was written by someone else since the board was loaded from it"""
+
+
+@transaction.atomic
+def write(match, before, board, last_ball_id=None):
+    """
+    Persist everything the board gained since it was loaded from the match.
+
+    before holds the batting lines as they were then, and last_ball_id is the
+    last logged ball the board holds, which becomes the new flushed_ball.
+    Nothing is read, so this is one UPDATE each for the match, batting,
+    bowling and career rows.
+
+    The match UPDATE only applies while flushed_ball and data_version are
+    still what the board was loaded with. If another process wrote the match
+    in between, its increments may already hold the same balls, so
+    StaleMatch is raised before anything else is written. Holding
+    data_version too means the one this sets is never handed out twice.
+    """
+    show(match, board)
+    loaded_at = match.flushed_ball
+    if last_ball_id is not None:
+        match.flushed_ball = last_ball_id
+    written = Match.objects.filter(pk=match.pk, flushed_ball=loaded_at, data_version=match.data_version).update(
+        **{name: getattr(match, name) for name in MATCH_UPDATE_FIELDS},
+        data_version=match.data_version + 1,
+    )
+    if not written:
+        match.flushed_ball = loaded_at
+        raise StaleMatch(match.pk)
+    match.data_version += 1
+
+    innings = dict(match=match, innings=match.innings)
+    _update_rows(BattingPerformance.objects.filter(**innings), {
+        player_id: _batting_changes(old, board.batting[player_id]) for player_id, old in before.items()
+    })
+    _update_rows(BowlingPerformance.objects.filter(**innings), {
+        player_id: _bowling_changes(delta) for player_id, delta in board.bowling.items()
+    })
+    _record_careers(_career_changes(match, before, board))
+    FallOfWicket.objects.bulk_create(_falls(match.pk, match.innings, board))
+    OverSummary.objects.bulk_create(_overs(match.pk, match.innings, board))
+
+
+@transaction.atomic
+def record_ball(match, runs=0, extras='', wicket_type='', out_player='striker'):
+    """Append one delivery to the log and apply it to the match and performance rows"""
+    board = Scoreboard.from_match(match)
+    before = board.batting_snapshot()
+    ball = deliver(match, board, runs, extras, wicket_type, out_player)
+    ball.save()
+    write(match, before, board, ball.id)
+    return ball
+
+
+def complete_over(match):
+    board = Scoreboard.from_match(match)
+    before = board.batting_snapshot()
+    end_over(board)
+    write(match, before, board)
+
+
+def finish_innings(match):
+    """Summarise the over an innings ends in when it ends before the over does"""
+    board = Scoreboard.from_match(match)
+    board.summarise_over()
+    # Ending a match twice must not fail on the over it already summarised
+    OverSummary.objects.bulk_create(_overs(match.pk, match.innings, board), ignore_conflicts=True)
+
+
+@transaction.atomic
+def rebuild_performances(match):
+    """Rewrite a match's batting, bowling, fall of wicket and over rows from its Ball log"""
+    balls = Ball.objects.filter(match=match).order_by('innings', 'id')
+    boards = replay(balls.iterator())
+    FallOfWicket.objects.filter(match=match).delete()
+    OverSummary.objects.filter(match=match).delete()
+    for innings, board in boards.items():
+        if not (match.is_live and innings == match.innings):
+            board.summarise_over()
+        FallOfWicket.objects.bulk_create(_falls(match.pk, innings, board))
+        OverSummary.objects.bulk_create(_overs(match.pk, innings, board))
+    for innings, board in boards.items():
+        for player_id, line in board.batting.items():
+            BattingPerformance.objects.update_or_create(
+                match=match, innings=innings, player_id=player_id,
+                defaults={
+                    'runs': line.runs,
+                    'balls_faced': line.balls,
+                    'fours': line.fours,
+                    'sixes': line.sixes,
+                    'not_out': not line.out,
+                    'bowler_id': line.bowler_id,
+                },
+            )
+        for player_id, line in board.bowling.items():
+            BowlingPerformance.objects.update_or_create(
+                match=match, innings=innings, player_id=player_id,
+                defaults={
+                    'overs': line.overs,
+                    'runs_conceded': line.runs,
+                    'wickets': line.wickets,
+                    'maidens': line.maidens,
+                    'economy': line.economy,
+                },
+            )
+    Match.objects.filter(pk=match.pk).update(data_version=F('data_version') + 1)
+
+
+def rebuild_summaries(matches, batch_size=1000):
+    """
+    Rewrite the falls of wickets, partnerships and over summaries of many
+    matches from their Ball logs, in one pass over the balls.
+
+    Each innings is folded while its balls stream past and written out in
+    batches, so memory stays flat however long the log is. The innings a
+    live match is playing keeps its unfinished over and partnership on the
+    match counters. Returns how many falls and overs were written.
+    """
+    match_ids = list(matches.values_list('pk', flat=True))
+    balls = Ball.objects.filter(match__in=match_ids).order_by('match', 'innings', 'id')
+    live = dict(Match.objects.filter(pk__in=match_ids, is_live=True).values_list('pk', 'innings'))
+    batches = {FallOfWicket: [], OverSummary: []}
+    written = dict.fromkeys(batches, 0)
+
+    def write_batch(model):
+        written[model] += len(model.objects.bulk_create(batches[model]))
+        batches[model].clear()
+
+    def finish(key, board):
+        match_id, innings = key
+        if live.get(match_id) == innings:
+            Match.objects.filter(pk=match_id).update(**{
+                name: getattr(board, name)
+                for name in ('partnership_runs', 'partnership_balls', 'over_runs', 'over_wickets', 'over_extras')
+            })
+        else:
+            board.summarise_over()
+        batches[FallOfWicket].extend(_falls(match_id, innings, board))
+        batches[OverSummary].extend(_overs(match_id, innings, board))
+        for model, batch in batches.items():
+            if len(batch) >= batch_size:
+                write_batch(model)
+
+    with transaction.atomic():
+        FallOfWicket.objects.filter(match__in=match_ids).delete()
+        OverSummary.objects.filter(match__in=match_ids).delete()
+        key = board = None
+        for ball in balls.iterator(chunk_size=batch_size):
+            if (ball.match_id, ball.innings) != key:
+                if board is not None:
+                    finish(key, board)
+                key, board = (ball.match_id, ball.innings), Scoreboard()
+            fold(board, ball)
+        if board is not None:
+            finish(key, board)
+        for model in batches:
+            write_batch(model)
+    return written[FallOfWicket], written[OverSummary]
@@ -1,27 +1,112 @@
-from django.db import models
-from django.db.models.signals import post_save
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_init, post_save
 from django.dispatch import receiver
+from . import broadcast
 from .models import Match, Team
+from .scoring import MATCH_UPDATE_FIELDS
 from django.db.models import Q
 
+# Only these columns can change which matches count towards a team's record
+RESULT_FIELDS = ('is_live', 'result', 'home_team_id', 'away_team_id')
+# The columns broadcast.scoreboard() is built from
+SCORE_FIELDS = (*MATCH_UPDATE_FIELDS, 'innings', 'is_live', 'first_score')
+
+
+def _fields(match, names):
+    # Read from __dict__ so deferred fields are not fetched just to be tracked
+    return tuple(match.__dict__.get(field) for field in names)
+
+
+def _result_fields(match):
+    return _fields(match, RESULT_FIELDS)
+
+
+def _is_finished(fields):
+    is_live, result = fields[0], fields[1]
+    return is_live is False and result not in (None, 'TBD')
+
+
+@receiver(post_init, sender=Match)
+def remember_result_fields(sender, instance, **kwargs):
+    instance._result_fields = _result_fields(instance)
+    instance._score_fields = _fields(instance, SCORE_FIELDS)
+
+
+@receiver(post_save, sender=Match)
+def forget_live_version(sender, instance, **kwargs):
+    # A save that changes the live score outdates the version pollers hold;
+    # the next push records the new one
+    after = _fields(instance, SCORE_FIELDS)
+    if after != instance._score_fields:
+        instance._score_fields = after
+        broadcast.forget_version(instance.pk)
+
+
 @receiver(post_save, sender=Match)
 def update_team_stats(sender, instance, **kwargs):
     """
-    Update team statistics when a match is saved
+    Queue a team stats refresh when a save changes a match's result.
+
+    Scoring saves the match several times per delivery without touching any
+    result field, so those saves cost nothing here.
     """
-    if instance.status == 'COMPLETED':
-        # Update home team stats
-        home_team = instance.home_team
-        home_team.matches_played = Match.objects.filter(
-            Q(home_team=home_team) | Q(away_team=home_team),
-            status='COMPLETED'
-        ).count()
-        home_team.save()
-        
-        # Update away team stats
-        away_team = instance.away_team
-        away_team.matches_played = Match.objects.filter(
-            Q(home_team=away_team) | Q(away_team=away_team),
-            status='COMPLETED'
-        ).count()
-        away_team.save()
\ No newline at end of file
+    before = instance._result_fields
+    after = _result_fields(instance)
+    instance._result_fields = after
+    if before == after or not (_is_finished(before) or _is_finished(after)):
+        return
+    schedule_team_refresh({before[2], before[3], after[2], after[3]} - {None})
+
+
+def schedule_team_refresh(team_ids, using='default'):
+    """
+    Refresh the given teams once the current transaction commits, or now outside one.
+
+    The teams wait in one set per connection, and whichever on_commit callback
+    runs first refreshes and clears it, so each team is recomputed at most once
+    however many saves touched it. Every call registers a callback, so ids
+    still count when an earlier callback was discarded with a rolled back
+    savepoint.
+    """
+    if not transaction.get_connection(using).in_atomic_block:
+        refresh_matches_played(set(team_ids))
+        return
+    _pending(using).update(team_ids)
+    transaction.on_commit(lambda: refresh_matches_played(_take(using)), using=using)
+
+
+def _pending(using):
+    # Connections are per thread, so the sets are too and need no lock
+    if not hasattr(_local, using):
+        setattr(_local, using, set())
+    return getattr(_local, using)
+
+
+def _take(using):
+    team_ids = set(_pending(using))
+    _pending(using).clear()
+    return team_ids
+
+
+_local = threading.local()
+
+
+def refresh_matches_played(team_ids):
+    if not team_ids:
+        return
+    played = dict.fromkeys(team_ids, 0)
+    finished = Match.objects.filter(
+        Q(home_team_id__in=team_ids) | Q(away_team_id__in=team_ids),
+        is_live=False,
+    ).exclude(
+        result='TBD'
+    ).values_list('home_team_id', 'away_team_id')
+    for home_id, away_id in finished:
+        for team_id in (home_id, away_id):
+            if team_id in played:
+                played[team_id] += 1
+
+    for team_id, count in played.items():
+        Team.objects.filter(pk=team_id).update(matches_played=count)
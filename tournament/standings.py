@@ -0,0 +1,242 @@
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, When
+
+from .models import Match, Team
+
+WIN_POINTS = 3
+DRAW_POINTS = 1
+
+# Result -> (home wins, away wins, draws); a washed-out match is shared like a draw
+RESULT_OUTCOMES = {
+    'Home Win': (1, 0, 0),
+    'Away Win': (0, 1, 0),
+    'Draw': (0, 0, 1),
+    'No Result': (0, 0, 1),
+}
+
+
+# Results whose innings count towards net run rate
+DECIDED = ('Home Win', 'Away Win', 'Draw')
+
+TABLE_FIELDS = [
+    'total_matches', 'wins', 'losses', 'draws', 'points',
+    'runs_for', 'balls_for', 'runs_against', 'balls_against',
+]
+
+
+def _team_increments(wins, losses, draws, runs_for=0, balls_for=0, runs_against=0, balls_against=0):
+    return {
+        'total_matches': F('total_matches') + 1,
+        'wins': F('wins') + wins,
+        'losses': F('losses') + losses,
+        'draws': F('draws') + draws,
+        'points': F('points') + wins * WIN_POINTS + draws * DRAW_POINTS,
+        'runs_for': F('runs_for') + runs_for,
+        'balls_for': F('balls_for') + balls_for,
+        'runs_against': F('runs_against') + runs_against,
+        'balls_against': F('balls_against') + balls_against,
+    }
+
+
+def _innings_totals(match, team_id):
+    """Runs and balls for and against one side of a decided match"""
+    if match.result not in DECIDED:
+        return {}
+    batted = (match.first_score, match.first_balls)
+    bowled = (match.second_score, match.second_balls)
+    if match.first_team_id != team_id:
+        batted, bowled = bowled, batted
+    return {
+        'runs_for': batted[0], 'balls_for': batted[1],
+        'runs_against': bowled[0], 'balls_against': bowled[1],
+    }
+
+
+def record_result(match):
+    """
+    Apply a finished match to the points table.
+
+    Only the two teams that played are touched, with in-place increments. The
+    live -> finished flip of the match row doubles as the guard, so calling this
+    twice for the same match (e.g. complete_innings then complete_match) counts
+    it once. Returns True if the table was updated.
+    """
+    outcome = RESULT_OUTCOMES.get(match.result)
+    if outcome is None:
+        return False
+
+    home_wins, away_wins, draws = outcome
+    with transaction.atomic():
+        if not Match.objects.filter(pk=match.pk, is_live=True).update(is_live=False):
+            return False
+        Team.objects.filter(pk=match.home_team_id).update(
+            **_team_increments(home_wins, away_wins, draws, **_innings_totals(match, match.home_team_id))
+        )
+        Team.objects.filter(pk=match.away_team_id).update(
+            **_team_increments(away_wins, home_wins, draws, **_innings_totals(match, match.away_team_id))
+        )
+    return True
+
+
+@dataclass(frozen=True)
+class StandingRow:
+    team: Team
+    played: int
+    won: int
+    lost: int
+    drawn: int
+    points: int
+    net_run_rate: float
+
+    def as_dict(self):
+        return {
+            'team_id': self.team.id,
+            'team': self.team.name,
+            'short_name': self.team.short_name,
+            'played': self.played,
+            'won': self.won,
+            'lost': self.lost,
+            'drawn': self.drawn,
+            'points': self.points,
+            'net_run_rate': self.net_run_rate,
+        }
+
+
+def _side_totals(matches, side):
+    """
+    Per-team aggregates for one side (home or away) of every finished match.
+
+    Each innings pair is read straight off the match row, so runs/balls for and
+    against come from conditional sums over Match with no joins.
+    """
+    win_result, loss_result = ('Home Win', 'Away Win') if side == 'home' else ('Away Win', 'Home Win')
+    batted_first = Q(first_team_id=F(f'{side}_team_id'))
+    decided = Q(result__in=DECIDED)
+
+    def innings_sum(own_column_if_first, own_column_if_second):
+        return Sum(
+            Case(
+                When(batted_first, then=F(own_column_if_first)),
+                default=F(own_column_if_second),
+                output_field=IntegerField(),
+            ),
+            filter=decided,
+        )
+
+    return matches.filter(
+        is_live=False,
+        result__in=RESULT_OUTCOMES,
+    ).values(
+        team_id=F(f'{side}_team_id'),
+    ).annotate(
+        played=Count('id'),
+        won=Count('id', filter=Q(result=win_result)),
+        lost=Count('id', filter=Q(result=loss_result)),
+        drawn=Count('id', filter=Q(result__in=['Draw', 'No Result'])),
+        runs_for=innings_sum('first_score', 'second_score'),
+        balls_for=innings_sum('first_balls', 'second_balls'),
+        runs_against=innings_sum('second_score', 'first_score'),
+        balls_against=innings_sum('second_balls', 'first_balls'),
+    ).order_by()
+
+
+def _net_run_rate(runs_for, balls_for, runs_against, balls_against):
+    if not balls_for or not balls_against:
+        return 0.0
+    return round(runs_for * 6 / balls_for - runs_against * 6 / balls_against, 3)
+
+
+def totals_by_team(matches=None):
+    """
+    Played, won, lost and drawn, and runs and balls for and against, by team id.
+
+    The home and away sides of all finished matches are grouped in one UNION ALL
+    query and folded per team here. Teams yet to finish a match have all zeros.
+    matches is Match's manager unless given, e.g. a migration's historical one.
+    """
+    if matches is None:
+        matches = Match.objects
+    totals = defaultdict(lambda: defaultdict(int))
+    for row in _side_totals(matches, 'home').union(_side_totals(matches, 'away'), all=True):
+        team_totals = totals[row['team_id']]
+        for key, value in row.items():
+            if key != 'team_id':
+                team_totals[key] += value or 0
+    return totals
+
+
+def compute_standings(totals=None):
+    """
+    Build the league table for every team in a fixed number of queries.
+
+    The totals come from totals_by_team(), unless they are passed in, so the
+    cost does not grow with the number of teams or matches. Returns an
+    ordered tuple of immutable StandingRow.
+    """
+    if totals is None:
+        totals = totals_by_team()
+
+    rows = []
+    for team in Team.objects.all():
+        team_totals = totals[team.id]
+        rows.append(StandingRow(
+            team=team,
+            played=team_totals['played'],
+            won=team_totals['won'],
+            lost=team_totals['lost'],
+            drawn=team_totals['drawn'],
+            points=team_totals['won'] * WIN_POINTS + team_totals['drawn'] * DRAW_POINTS,
+            net_run_rate=_net_run_rate(
+                team_totals['runs_for'], team_totals['balls_for'],
+                team_totals['runs_against'], team_totals['balls_against'],
+            ),
+        ))
+
+    rows.sort(key=lambda row: (-row.points, -row.net_run_rate, -row.won, row.team.name))
+    return tuple(rows)
+
+
+def table():
+    """
+    The league table as maintained on the Team rows by record_result().
+
+    One read in team_standings_idx order; the few teams level on points are
+    then put in net run rate order here. Returns the same ordered tuple of
+    StandingRow as compute_standings().
+    """
+    rows = [
+        StandingRow(
+            team=team,
+            played=team.total_matches,
+            won=team.wins,
+            lost=team.losses,
+            drawn=team.draws,
+            points=team.points,
+            net_run_rate=_net_run_rate(team.runs_for, team.balls_for, team.runs_against, team.balls_against),
+        )
+        for team in Team.objects.order_by('-points', '-wins')
+    ]
+    rows.sort(key=lambda row: (-row.points, -row.net_run_rate, -row.won, row.team.name))
+    return tuple(rows)
+
+
+def rebuild():
+    """Recompute every team's row from scratch from the finished matches"""
+    totals = totals_by_team()
+    teams = []
+    for row in compute_standings(totals):
+        team = row.team
+        team.total_matches = row.played
+        team.wins = row.won
+        team.losses = row.lost
+        team.draws = row.drawn
+        team.points = row.points
+        for name in ('runs_for', 'balls_for', 'runs_against', 'balls_against'):
+            setattr(team, name, totals[team.id][name])
+        teams.append(team)
+
+    Team.objects.bulk_update(teams, TABLE_FIELDS)
+    return len(teams)
@@ -0,0 +1,216 @@
+// Live score feed for a match page.
+// Updates are pushed over /ws/match/<id>/ as numbered deltas. On every
+// (re)connect, and whenever a sequence number is skipped, the client sends the
+// last one it applied and the server replays what was missed or sends a full
+// snapshot. If the socket never manages to open (some proxies strip the
+// upgrade), the same events are read from streamUrl (match_stream) with
+// EventSource instead. pollUrl (live_match_data) is only polled while neither
+// is connected, and the push connection keeps retrying with backoff.
+// token (the viewer_token template tag) lets the socket skip the session lookup.
+function connectMatchFeed(matchId, pollUrl, onUpdate, streamUrl, token) {
+    const protocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+    const socketUrl = protocol + window.location.host + '/ws/match/' + matchId + '/' + tokenQuery(token);
+    const pollInterval = 3000;
+    // How long to wait for the answer to a resume before asking again
+    const resumeTimeout = 5000;
+    let retryDelay = 1000;
+    let pollTimer = null;
+    let epoch = null;
+    let seq = null;
+    let score = {};
+    let resuming = false;
+    let resumedAt = 0;
+    let failedOpens = 0;
+
+    function poll() {
+        fetch(pollUrl, {credentials: 'same-origin'})
+            .then(function(response) { return response.json(); })
+            .then(function(data) {
+                score = data;
+                onUpdate(score);
+            })
+            .catch(function(error) {
+                console.error('Error polling live score:', error);
+            });
+    }
+
+    function startPolling() {
+        if (pollTimer === null) {
+            poll();
+            pollTimer = setInterval(poll, pollInterval);
+        }
+    }
+
+    function stopPolling() {
+        if (pollTimer !== null) {
+            clearInterval(pollTimer);
+            pollTimer = null;
+        }
+    }
+
+    function resumeSocket(socket) {
+        resuming = true;
+        resumedAt = Date.now();
+        socket.send(JSON.stringify({type: 'resume', epoch: epoch, seq: seq}));
+    }
+
+    // resume() asks the server for everything after the last applied event
+    function apply(event, resume) {
+        if (event.type === 'snapshot') {
+            resuming = false;
+            if (event.epoch === epoch && event.seq < seq) {
+                // Older than what is shown already
+                return;
+            }
+            // A new epoch means the journal was started afresh; the snapshot replaces everything
+            epoch = event.epoch;
+            seq = event.seq;
+            score = Object.assign({}, event.data);
+            onUpdate(score);
+            return;
+        }
+        if (event.epoch !== epoch || event.seq > seq + 1) {
+            // Missed something (or the journal was started afresh); ask once and
+            // wait, asking again if no answer puts the feed back in order
+            if (!resuming || Date.now() - resumedAt > resumeTimeout) {
+                resuming = true;
+                resumedAt = Date.now();
+                resume();
+            }
+            return;
+        }
+        if (event.seq <= seq) {
+            return;
+        }
+        seq = event.seq;
+        Object.assign(score, event.data);
+        resuming = false;
+        onUpdate(score);
+    }
+
+    function retry(reconnect) {
+        resuming = false;
+        startPolling();
+        // Jittered so a server restart is not met by every viewer at once
+        setTimeout(reconnect, retryDelay * (0.5 + Math.random()));
+        retryDelay = Math.min(retryDelay * 2, 30000);
+    }
+
+    function canStream() {
+        return Boolean(streamUrl) && typeof EventSource !== 'undefined';
+    }
+
+    function connect() {
+        const socket = new WebSocket(socketUrl);
+        let opened = false;
+
+        socket.onopen = function() {
+            opened = true;
+            failedOpens = 0;
+            stopPolling();
+            retryDelay = 1000;
+            resumeSocket(socket);
+        };
+
+        socket.onmessage = function(e) {
+            try {
+                apply(JSON.parse(e.data), function() { resumeSocket(socket); });
+            } catch (error) {
+                console.error('Error processing live score update:', error);
+            }
+        };
+
+        socket.onclose = function() {
+            failedOpens = opened ? 0 : failedOpens + 1;
+            if (failedOpens >= 2 && canStream()) {
+                resuming = false;
+                openStream();
+            } else {
+                retry(connect);
+            }
+        };
+    }
+
+    function openStream() {
+        // EventSource resends the last event id by itself when it reconnects;
+        // the query string covers a fresh connection and resumes after a gap
+        const query = seq === null ? '' : '?last_event_id=' + encodeURIComponent(epoch + ':' + seq);
+        const source = new EventSource(streamUrl + query);
+
+        source.onopen = function() {
+            stopPolling();
+            retryDelay = 1000;
+        };
+
+        source.onmessage = function(e) {
+            try {
+                apply(JSON.parse(e.data), function() {
+                    source.close();
+                    openStream();
+                });
+            } catch (error) {
+                console.error('Error processing live score update:', error);
+            }
+        };
+
+        source.onerror = function() {
+            if (source.readyState === EventSource.CLOSED) {
+                retry(openStream);
+            } else {
+                startPolling();
+            }
+        };
+    }
+
+    if (typeof WebSocket !== 'undefined') {
+        connect();
+    } else if (canStream()) {
+        openStream();
+    } else {
+        startPolling();
+    }
+}
+
+// Score lines of every live match over one socket (/ws/live/). onSnapshot gets
+// the full list on every (re)connect, onItem each changed line after that.
+// matchIds, if given, narrows the ticker to those matches.
+function connectLiveTicker(onSnapshot, onItem, matchIds, token) {
+    const protocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
+    const socketUrl = protocol + window.location.host + '/ws/live/' + tokenQuery(token);
+    let retryDelay = 1000;
+
+    function connect() {
+        const socket = new WebSocket(socketUrl);
+
+        socket.onopen = function() {
+            retryDelay = 1000;
+            if (matchIds) {
+                socket.send(JSON.stringify({type: 'subscribe', match_ids: matchIds}));
+            }
+        };
+
+        socket.onmessage = function(e) {
+            try {
+                const data = JSON.parse(e.data);
+                if (data.type === 'snapshot') {
+                    onSnapshot(data.items);
+                } else if (data.type === 'update') {
+                    onItem(data.item);
+                }
+            } catch (error) {
+                console.error('Error processing live ticker update:', error);
+            }
+        };
+
+        socket.onclose = function() {
+            setTimeout(connect, retryDelay * (0.5 + Math.random()));
+            retryDelay = Math.min(retryDelay * 2, 30000);
+        };
+    }
+
+    connect();
+}
+
+function tokenQuery(token) {
+    return token ? '?token=' + encodeURIComponent(token) : '';
+}
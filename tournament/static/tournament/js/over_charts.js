@@ -0,0 +1,48 @@
+// Runs-per-over (Manhattan) and running-score (worm) charts of a match.
+// The series come from url (match_overs), which serves the finished overs
+// from their summaries and the over being bowled from the live score, so
+// redrawing after every update is cheap. Bars are plain divs and the worm
+// an inline SVG, so no chart library is needed.
+function drawOverCharts(container, url) {
+    const colours = {1: '#0d6efd', 2: '#dc3545'};
+
+    function manhattan(innings, chart) {
+        const most = Math.max(1, ...chart.runs);
+        const bars = chart.overs.map(function(over, i) {
+            const partial = chart.partial && i === chart.overs.length - 1;
+            const title = 'Over ' + over + ': ' + chart.runs[i] + ' runs, ' + chart.wickets[i] + ' wkts'
+                + (partial ? ' (in progress)' : '');
+            return '<div title="' + title + '" style="flex:1;margin:0 1px;height:' + (100 * chart.runs[i] / most)
+                + '%;background:' + colours[innings] + ';opacity:' + (partial ? 0.5 : 1) + '">'
+                + (chart.wickets[i] ? '<small class="text-white">' + 'W'.repeat(chart.wickets[i]) + '</small>' : '')
+                + '</div>';
+        }).join('');
+        return '<h6>Innings ' + innings + ' - runs per over</h6>'
+            + '<div class="d-flex align-items-end border-bottom mb-3" style="height:120px">' + bars + '</div>';
+    }
+
+    function worm(series) {
+        const overs = Math.max(1, ...[1, 2].map(function(n) { return series[n].overs.length; }));
+        const most = Math.max(1, ...[1, 2].map(function(n) { return Math.max(0, ...series[n].score); }));
+        const lines = [1, 2].map(function(n) {
+            const points = ['0,100'].concat(series[n].score.map(function(score, i) {
+                return ((i + 1) * 100 / overs) + ',' + (100 - 100 * score / most);
+            }));
+            return '<polyline fill="none" stroke-width="1" stroke="' + colours[n] + '" points="' + points.join(' ') + '"/>';
+        }).join('');
+        return '<h6>Running score</h6>'
+            + '<svg viewBox="0 0 100 100" preserveAspectRatio="none" style="width:100%;height:160px" class="border">'
+            + lines + '</svg>';
+    }
+
+    return fetch(url, {credentials: 'same-origin'})
+        .then(function(response) { return response.json(); })
+        .then(function(data) {
+            const series = data.innings;
+            container.innerHTML = [1, 2].filter(function(n) { return series[n].overs.length; })
+                .map(function(n) { return manhattan(n, series[n]); }).join('') + worm(series);
+        })
+        .catch(function(error) {
+            console.error('Error loading over charts:', error);
+        });
+}
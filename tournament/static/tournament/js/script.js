@@ -44,71 +44,5 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
-    // WebSocket connection for live matches
-    if (typeof WebSocket !== 'undefined' && document.getElementById('home-score')) {
-        const matchId = document.currentScript.getAttribute('data-match-id') || 
-                       (window.location.pathname.match(/match\/(\d+)/) ? window.location.pathname.match(/match\/(\d+)/)[1] : null);
-        
-        if (matchId) {
-            const protocol = window.location.protocol === 'https:' ? 'wss://' : 'ws://';
-            const matchSocket = new WebSocket(
-                protocol + window.location.host +
-                '/ws/match/' + matchId + '/'
-            );
-
-            matchSocket.onmessage = function(e) {
-                try {
-                    const data = JSON.parse(e.data);
-                    if (data.home_score !== undefined) $('#home-score').text(data.home_score);
-                    if (data.away_score !== undefined) $('#away-score').text(data.away_score);
-                    if (data.current_batsman !== undefined) $('#current-batsman').text(data.current_batsman);
-                    if (data.current_bowler !== undefined) $('#current-bowler').text(data.current_bowler);
-                    if (data.balls_remaining !== undefined) $('#balls-remaining').text(data.balls_remaining);
-                    if (data.innings !== undefined) $('#innings').text(data.innings);
-                } catch (error) {
-                    console.error('Error processing WebSocket message:', error);
-                }
-            };
-
-            matchSocket.onclose = function(e) {
-                if (!e.wasClean) {
-                    console.error('Match socket closed unexpectedly:', e.reason);
-                    // Attempt to reconnect after 5 seconds
-                    setTimeout(function() {
-                        initializeWebSocket(matchId);
-                    }, 5000);
-                }
-            };
-
-            matchSocket.onerror = function(error) {
-                console.error('WebSocket error:', error);
-            };
-
-            // When admin submits score update form
-            $('#score-update-form').off('submit').on('submit', function(e) {
-                e.preventDefault();
-                if (matchSocket.readyState === WebSocket.OPEN) {
-                    const formData = $(this).serializeArray();
-                    const updateData = {};
-                    
-                    $.each(formData, function(_, field) {
-                        updateData[field.name] = field.value;
-                    });
-                    
-                    try {
-                        matchSocket.send(JSON.stringify({
-                            'message': updateData
-                        }));
-                    } catch (error) {
-                        console.error('Error sending WebSocket message:', error);
-                        // Fallback to AJAX if WebSocket fails
-                        $.post(window.location.pathname + '/update', $(this).serialize());
-                    }
-                } else {
-                    // Fallback to AJAX if WebSocket is not open
-                    $.post(window.location.pathname + '/update', $(this).serialize());
-                }
-            });
-        }
-    }
+    // Live scores are pushed by live_feed.js (connectMatchFeed) on the pages that show them
 });
\ No newline at end of file
@@ -0,0 +1,82 @@
+"""
+Server-sent events feed of a match's live score.
+
+For viewers whose proxies strip websocket upgrades. The stream carries the
+same numbered events as MatchConsumer, each with id "<epoch>:<seq>", so a
+browser reconnecting with Last-Event-ID is sent only what it missed. Any
+gap seen on the group is filled from the journal before it reaches the
+client, and a comment line goes out every HEARTBEAT seconds to keep idle
+proxies from closing the connection. Without a channel layer the journal
+is polled on each of those beats instead.
+"""
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from . import broadcast
+
+HEARTBEAT = 15.0
+# How long browsers wait before reconnecting a dropped stream, in milliseconds
+RETRY = 3000
+
+
+def _heartbeat():
+    return getattr(settings, 'LIVE_STREAM_HEARTBEAT', HEARTBEAT)
+
+
+def parse_event_id(value):
+    """(epoch, seq) from an event id, or (None, None) if it is not one of ours"""
+    epoch, _, seq = (value or '').partition(':')
+    if not epoch or not seq.isdigit():
+        return None, None
+    return epoch, int(seq)
+
+
+def format_event(event):
+    data = json.dumps(event, separators=(',', ':'))
+    return f"id: {event['epoch']}:{event['seq']}\ndata: {data}\n\n"
+
+
+async def events(match_id, last_event_id=None):
+    """The text/event-stream body for one viewer of a match"""
+    epoch, seq = parse_event_id(last_event_id)
+    layer = get_channel_layer()
+    channel = None
+    if layer is not None:
+        # Join before catching up so nothing published in between is missed
+        channel = await layer.new_channel()
+        await layer.group_add(broadcast.group_name(match_id), channel)
+    try:
+        yield f"retry: {RETRY}\n\n"
+        pending = await sync_to_async(broadcast.resume)(match_id, epoch, seq)
+        while True:
+            for event in pending:
+                if event['epoch'] == epoch and event['seq'] <= seq:
+                    continue
+                epoch, seq = event['epoch'], event['seq']
+                yield format_event(event)
+
+            if channel is None:
+                # Nothing is pushed without a channel layer, so the journal is read on every beat
+                await asyncio.sleep(_heartbeat())
+                pending = await sync_to_async(broadcast.resume)(match_id, epoch, seq)
+                if not pending:
+                    yield ": heartbeat\n\n"
+                continue
+            try:
+                message = await asyncio.wait_for(layer.receive(channel), _heartbeat())
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+                pending = []
+                continue
+            event = message['event']
+            if event['epoch'] == epoch and event['seq'] == seq + 1:
+                pending = [event]
+            else:
+                pending = await sync_to_async(broadcast.resume)(match_id, epoch, seq)
+    finally:
+        if channel is not None:
+            await layer.group_discard(broadcast.group_name(match_id), channel)
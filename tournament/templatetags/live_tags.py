@@ -0,0 +1,11 @@
+from django import template
+
+from tournament import broadcast, ticker, viewers
+
+register = template.Library()
+
+
+@register.simple_tag
+def viewer_token(match_id=None):
+    """Signed token for following a match's websocket, or the live ticker without a match"""
+    return viewers.token_for(ticker.GROUP if match_id is None else broadcast.group_name(match_id))
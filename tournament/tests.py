@@ -1,3 +1,1503 @@
-from django.test import TestCase
+import json
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from channels.layers import get_channel_layer
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.signals import request_started
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .models import (
+    Team, Player, Match, Ball, BattingPerformance, BowlingPerformance, FallOfWicket, OverSummary, PlayerCareerStats,
+)
+from . import apps as tournament_apps
+from . import broadcast, career, consumers, cricsheet, exports, importer, live, loadtest, qualification, scorecard, scoring, signals, standings, stream, viewers, winprob
+
+
+# Timed runs at full scale, left out of the normal suite
+benchmark = skipUnless(os.environ.get('UCL_BENCHMARKS'), "set UCL_BENCHMARKS=1 to run benchmarks")
+
+
+def make_teams(count, start=0):
+    return Team.objects.bulk_create(
+        Team(name=f"Team {i}", short_name=f"T{i}", home_ground="Ground", coach="Coach", founded=2000)
+        for i in range(start, start + count)
+    )
+
+
+def make_players(team, count, start=0):
+    return Player.objects.bulk_create(
+        Player(name=f"{team.name} Player {i}", team=team, age=25, nationality="Nepal",
+               batting_style='Right', bowling_style='Medium', role="Allrounder", jersey_number=i + 1)
+        for i in range(start, start + count)
+    )
+
+
+def make_finished_matches(teams, count, start_number=1):
+    played_at = timezone.now() - timedelta(days=1)
+    results = ['Home Win', 'Away Win', 'Draw']
+    matches = []
+    for i in range(count):
+        home = teams[i % len(teams)]
+        away = teams[(i + 1 + i // len(teams)) % len(teams)]
+        if away == home:
+            away = teams[(i + 1) % len(teams)]
+        matches.append(Match(
+            match_number=start_number + i,
+            home_team=home,
+            away_team=away,
+            date=played_at,
+            venue="Ground",
+            umpires="Umpires",
+            result=results[i % 3],
+            first_team=home,
+            second_team=away,
+            first_score=150 + i % 40,
+            first_balls=120,
+            second_score=140 + i % 50,
+            second_balls=114,
+        ))
+    return Match.objects.bulk_create(matches, batch_size=500)
+
+
+class StandingsEngineTests(TestCase):
+    def test_points_and_net_run_rate(self):
+        home, away = make_teams(2)
+        Match.objects.create(
+            match_number=1, home_team=home, away_team=away, date=timezone.now(),
+            venue="Ground", umpires="Umpires", result='Home Win',
+            first_team=home, second_team=away,
+            first_score=180, first_balls=120, second_score=150, second_balls=120,
+        )
+
+        table = standings.compute_standings()
+
+        self.assertEqual([row.team for row in table], [home, away])
+        self.assertEqual((table[0].played, table[0].won, table[0].points), (1, 1, 3))
+        self.assertEqual((table[1].played, table[1].lost, table[1].points), (1, 1, 0))
+        self.assertEqual(table[0].net_run_rate, 1.5)
+        self.assertEqual(table[1].net_run_rate, -1.5)
+
+    def test_record_result_counts_a_match_once(self):
+        home, away = make_teams(2)
+        Team.objects.filter(pk=home.pk).update(total_matches=2, wins=1, losses=1, points=3)
+        match = Match.objects.create(
+            match_number=1, home_team=home, away_team=away, date=timezone.now(),
+            venue="Ground", umpires="Umpires", is_live=True, result='Home Win',
+        )
+
+        self.assertTrue(standings.record_result(match))
+        # complete_innings then complete_match: the live flag is already down the second time
+        self.assertFalse(standings.record_result(match))
+
+        home.refresh_from_db()
+        away.refresh_from_db()
+        self.assertEqual((home.total_matches, home.wins, home.losses, home.points), (3, 2, 1, 6))
+        self.assertEqual((away.total_matches, away.wins, away.losses, away.points), (1, 0, 1, 0))
+
+    def test_record_result_ignores_an_undecided_match(self):
+        home, away = make_teams(2)
+        match = Match.objects.create(
+            match_number=1, home_team=home, away_team=away, date=timezone.now(),
+            venue="Ground", umpires="Umpires", is_live=True,
+        )
+        self.assertFalse(standings.record_result(match))
+        self.assertTrue(Match.objects.get(pk=match.pk).is_live)
+
+    def test_rebuild_matches_the_computed_table(self):
+        teams = make_teams(4)
+        make_finished_matches(teams, 12)
+        Team.objects.update(total_matches=99, wins=99, points=99)
+
+        self.assertEqual(standings.rebuild(), 4)
+
+        rows = {row.team.id: row for row in standings.compute_standings()}
+        for team in Team.objects.all():
+            row = rows[team.id]
+            self.assertEqual(
+                (team.total_matches, team.wins, team.losses, team.draws, team.points),
+                (row.played, row.won, row.lost, row.drawn, row.points),
+            )
+
+    def test_migration_fills_the_run_totals(self):
+        teams = make_teams(4)
+        make_finished_matches(teams, 12)
+        standings.rebuild()
+        filled = list(Team.objects.order_by('id').values_list(*standings.TABLE_FIELDS[5:]))
+        Team.objects.update(runs_for=0, balls_for=0, runs_against=0, balls_against=0)
+
+        migration = import_module('tournament.migrations.0041_fill_team_run_totals')
+        migration.fill_run_totals(apps, None)
+        self.assertEqual(list(Team.objects.order_by('id').values_list(*standings.TABLE_FIELDS[5:])), filled)
+        self.assertTrue(any(runs for runs, *_ in filled))
+
+    def assert_query_count_is_constant(self, teams, matches):
+        few = make_teams(4)
+        make_finished_matches(few, 10)
+        with CaptureQueriesContext(connection) as small:
+            standings.compute_standings()
+
+        many = few + make_teams(teams - 4, start=4)
+        make_finished_matches(many, matches - 10, start_number=11)
+        with CaptureQueriesContext(connection) as large:
+            table = standings.compute_standings()
+
+        self.assertEqual(len(table), teams)
+        self.assertEqual(sum(row.played for row in table), 2 * matches)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_query_count_is_constant(self):
+        self.assert_query_count_is_constant(teams=12, matches=100)
+
+    @benchmark
+    def test_query_count_is_constant_at_scale(self):
+        self.assert_query_count_is_constant(teams=50, matches=5000)
+
+    def test_table_reads_the_maintained_rows(self):
+        teams = make_teams(4)
+        for match in make_finished_matches(teams, 9):
+            Match.objects.filter(pk=match.pk).update(is_live=True)
+            standings.record_result(match)
+        # A wash-out is shared but leaves net run rate alone
+        washed_out = Match.objects.create(
+            match_number=10, home_team=teams[0], away_team=teams[1], date=timezone.now(),
+            venue="Ground", umpires="Umpires", is_live=True, result='No Result',
+        )
+        standings.record_result(washed_out)
+
+        with self.assertNumQueries(1):
+            table = standings.table()
+        self.assertEqual(table, standings.compute_standings())
+
+
+class PlayerTotalsTests(TestCase):
+    def setUp(self):
+        self.team = make_teams(1)[0]
+        self.team.logo = 'team_logos/logo.jpg'
+        self.team.save()
+        self.opponent = make_teams(1, start=1)[0]
+        self.match = Match.objects.create(
+            match_number=1, home_team=self.team, away_team=self.opponent, date=timezone.now(),
+            venue="Ground", umpires="Umpires",
+        )
+        user = User.objects.create_user('viewer', password='password')
+        self.client.force_login(user)
+
+    def add_players(self, count, start=0):
+        for player in make_players(self.team, count, start=start):
+            BattingPerformance.objects.create(player=player, match=self.match, runs=30)
+            BowlingPerformance.objects.create(player=player, match=self.match, wickets=2)
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries.captured_queries)
+
+    def test_with_totals_matches_properties(self):
+        self.add_players(2)
+        BattingPerformance.objects.create(player=Player.objects.first(), match=self.match, runs=12)
+
+        for player in Player.objects.with_totals():
+            fresh = Player.objects.get(pk=player.pk)
+            self.assertEqual(player.total_runs, fresh.total_runs)
+            self.assertEqual(player.total_wickets, fresh.total_wickets)
+
+    def test_players_page_query_count_is_fixed(self):
+        self.add_players(2)
+        small = self.count_queries('/players/')
+        self.add_players(20, start=2)
+        self.assertEqual(self.count_queries('/players/'), small)
+
+    def test_team_detail_query_count_is_fixed(self):
+        url = f'/teams/{self.team.id}/'
+        self.add_players(2)
+        small = self.count_queries(url)
+        self.add_players(20, start=2)
+        self.assertEqual(self.count_queries(url), small)
+
+
+def delivery(runs=0, extras='', wicket_type='', batsman=1, bowler=9, over=0, innings=1, player_out=None, extra_runs=0,
+             non_striker=None):
+    return SimpleNamespace(
+        batsman_id=batsman, non_striker_id=non_striker, bowler_id=bowler, runs=runs, extras=extras, extra_runs=extra_runs, over=over, innings=innings,
+        is_wicket=bool(wicket_type), wicket_type=wicket_type,
+        player_out_id=player_out or (batsman if wicket_type else None),
+    )
+
+
+class ScoringReducerTests(SimpleTestCase):
+    def new_board(self):
+        board = scoring.Scoreboard()
+        board.striker_id, board.non_striker_id, board.bowler_id = 1, 2, 9
+        return board
+
+    def test_runs_extras_and_strike_rotation(self):
+        board = self.new_board()
+        for ball in (delivery(4), delivery(extras=scoring.WIDE, extra_runs=1), delivery(1), delivery(6, batsman=2)):
+            scoring.apply_ball(board, ball)
+
+        self.assertEqual((board.total_runs, board.current_ball), (12, 3))
+        self.assertEqual((board.striker_id, board.non_striker_id), (2, 1))
+        self.assertEqual((board.batting[1].runs, board.batting[1].balls, board.batting[1].fours), (5, 2, 1))
+        self.assertEqual(board.batting[2].sixes, 1)
+        bowling = board.bowling[9]
+        self.assertEqual((bowling.balls, bowling.runs, bowling.wides), (3, 12, 1))
+
+    def test_wickets_and_maiden(self):
+        board = self.new_board()
+        scoring.apply_ball(board, delivery(wicket_type='bowled'))
+        scoring.apply_ball(board, delivery(wicket_type=scoring.RUN_OUT, batsman=3, player_out=2))
+        scoring.end_over(board)
+
+        self.assertEqual(board.total_wickets, 2)
+        self.assertEqual((board.striker_id, board.non_striker_id), (None, None))
+        self.assertEqual(board.batting[1].bowler_id, 9)
+        self.assertIsNone(board.batting[2].bowler_id)
+        self.assertEqual((board.bowling[9].wickets, board.bowling[9].maidens), (1, 1))
+        self.assertEqual((board.current_over, board.current_ball), (1, 0))
+
+    def test_partnerships_and_falls(self):
+        board = self.new_board()
+        for ball in (delivery(4), delivery(extras=scoring.WIDE, extra_runs=1), delivery(1, wicket_type=scoring.RUN_OUT),
+                     delivery(2, batsman=2), delivery(wicket_type='bowled', batsman=3)):
+            board.join_partnership(board.non_striker_id)
+            scoring.apply_ball(board, ball)
+
+        first, second = board.falls
+        self.assertEqual((first.wicket, first.player_id, first.partner_id), (1, 1, 2))
+        self.assertEqual((first.runs, first.balls, first.partnership_runs, first.partnership_balls), (6, 2, 6, 2))
+        self.assertEqual((second.wicket, second.player_id, second.partner_id), (2, 3, 2))
+        self.assertEqual((second.runs, second.balls, second.partnership_runs, second.partnership_balls), (8, 4, 2, 2))
+        self.assertEqual((board.partnership_runs, board.partnership_balls, board.pair), (0, 0, [2]))
+
+    def test_over_summaries(self):
+        board = self.new_board()
+        for ball in (delivery(4), delivery(extras=scoring.NO_BALL, extra_runs=1), delivery(wicket_type=scoring.RUN_OUT)):
+            scoring.apply_ball(board, ball)
+        scoring.end_over(board)
+        scoring.end_over(board)
+
+        [over] = board.overs
+        self.assertEqual((over.over, over.bowler_id, over.runs, over.wickets, over.extras), (0, 9, 5, 1, 1))
+        self.assertEqual((over.total_runs, over.total_wickets), (5, 1))
+        self.assertEqual((board.over_runs, board.over_wickets, board.over_extras), (0, 0, 0))
+
+    def test_bowler_is_charged_for_bat_runs_wides_and_no_balls_only(self):
+        board = self.new_board()
+        for ball in (delivery(extras='leg_bye', extra_runs=1), delivery(4, extras=scoring.NO_BALL, extra_runs=1, batsman=2),
+                     delivery(extras=scoring.WIDE, extra_runs=2, batsman=2), delivery(extras='bye', extra_runs=4)):
+            scoring.apply_ball(board, ball)
+
+        self.assertEqual((board.total_runs, board.over_extras, board.current_ball), (12, 8, 2))
+        # The leg-bye and the run taken off the wide changed ends; the four off the no-ball did not
+        self.assertEqual((board.striker_id, board.non_striker_id), (1, 2))
+        self.assertEqual((board.batting[2].runs, board.batting[2].fours, board.batting[2].balls), (4, 1, 0))
+        self.assertEqual(board.batting[1].runs, 0)
+        self.assertEqual((board.bowling[9].runs, board.bowler_runs), (7, 7))
+
+    def test_only_bowler_dismissals_count_for_the_bowler(self):
+        board = self.new_board()
+        scoring.apply_ball(board, delivery(wicket_type='obstructing_field'))
+        scoring.apply_ball(board, delivery(wicket_type='caught', batsman=2))
+
+        self.assertEqual(board.total_wickets, 2)
+        self.assertIsNone(board.batting[1].bowler_id)
+        self.assertEqual(board.batting[2].bowler_id, 9)
+        self.assertEqual(board.bowling[9].wickets, 1)
+
+    def test_replay_splits_overs_and_innings(self):
+        log = [delivery(1), delivery(2, batsman=2), delivery(4, over=1, bowler=8), delivery(innings=2, batsman=5)]
+        boards = scoring.replay(log)
+
+        self.assertEqual(sorted(boards), [1, 2])
+        self.assertEqual((boards[1].total_runs, boards[1].current_over, boards[1].current_ball), (7, 1, 1))
+        self.assertEqual(boards[1].bowling[9].overs, 0.2)
+        self.assertEqual(boards[1].bowling[8].runs, 4)
+        self.assertEqual(boards[2].batting[5].balls, 1)
+
+
+@override_settings(
+    LIVE_FLUSH_INTERVAL=None, LIVE_BROADCAST_WINDOW=None,
+    CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+)
+class LiveMatchTestCase(TestCase):
+    """A live match with both openers and a bowler in, scored through update_score"""
+    def setUp(self):
+        home, away = make_teams(2)
+        self.batsmen = make_players(home, 11)
+        self.bowlers = make_players(away, 11)
+        self.match = Match.objects.create(
+            match_number=1, home_team=home, away_team=away, date=timezone.now(),
+            venue="Ground", umpires="Umpires", is_live=True,
+            toss_winner=home, toss_decision='bat', batting_team=home, bowling_team=away,
+        )
+        user = User.objects.create_superuser('scorer', 'scorer@example.com', 'password')
+        self.client.force_login(user)
+        self.client.post(f'/match/{self.match.id}/initialize/', {
+            'striker': self.batsmen[0].id,
+            'non_striker': self.batsmen[1].id,
+            'bowler': self.bowlers[0].id,
+        })
+        # Load the live state so the counts below are for warm deliveries
+        live.get(self.match.id)
+        self.addCleanup(live.forget_all)
+        self.addCleanup(broadcast.forget_all)
+        self.addCleanup(scorecard.clear)
+        self.addCleanup(cache.clear)
+
+    def count_queries(self, **data):
+        """Statements against the app's tables, leaving out the session and user lookups"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(f'/match/{self.match.id}/update_score/', data)
+        self.assertEqual(response.json()['status'], 'success')
+        return len([query for query in queries.captured_queries if 'tournament_' in query['sql']])
+
+    def assert_delivery_queries(self, count, **data):
+        """Every statement update_score runs, the session and user lookups included"""
+        with self.assertNumQueries(count):
+            response = self.client.post(f'/match/{self.match.id}/update_score/', data)
+        self.assertEqual(response.json()['status'], 'success')
+
+
+class DeliveryQueryCountTests(LiveMatchTestCase):
+    """
+    Every statement of each scoring action, savepoints and the session and
+    user lookups included. At most four reach the app's tables on a delivery
+    that does not flush; wickets, overs and every MAX_PENDING_BALLS-th ball
+    flush, and their counts are pinned here instead.
+    """
+    def test_add_runs(self):
+        self.assertLessEqual(self.count_queries(action='add_runs', runs=0), 4)
+        # The session and user lookups, then the check that no other process moved the match on
+        # and the Ball insert, in a savepoint; nothing else until the write-behind flush
+        self.assert_delivery_queries(6, action='add_runs', runs=1)
+        self.assert_delivery_queries(6, action='add_runs', runs=4)
+
+    def test_add_wide(self):
+        self.assert_delivery_queries(6, action='add_wide')
+
+    def test_add_noball(self):
+        self.assert_delivery_queries(6, action='add_noball')
+
+    def test_flush_after_pending_balls(self):
+        for _ in range(live.MAX_PENDING_BALLS - 1):
+            self.count_queries(action='add_runs', runs=1)
+        # Ball insert, then one UPDATE each for the match, batting, bowling and career rows in a savepoint
+        self.assert_delivery_queries(12, action='add_runs', runs=1)
+        self.assertEqual(Match.objects.get(pk=self.match.pk).total_runs, live.MAX_PENDING_BALLS)
+
+    def test_add_wicket_needs_a_type(self):
+        response = self.client.post(f'/match/{self.match.id}/update_score/', {'action': 'add_wicket', 'wicket_type': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Ball.objects.exists())
+
+    def test_add_wicket(self):
+        # A wicket is flushed at once with its fall of wicket, plus the list of batsmen still to come in
+        self.assert_delivery_queries(14, action='add_wicket', wicket_type='bowled')
+        self.count_queries(action='set_next_batsman', batsman_id=self.batsmen[2].id)
+        live.get(self.match.id)
+        self.assert_delivery_queries(14, action='add_wicket', wicket_type='run_out', out_player='non_striker')
+
+    def test_complete_over(self):
+        self.count_queries(action='add_runs', runs=2)
+        # The flush with the over's summary, plus the list of bowlers to choose from
+        self.assert_delivery_queries(10, action='complete_over')
+
+    def scorecard(self):
+        return (
+            Match.objects.values_list('total_runs', 'total_wickets', 'current_over', 'current_ball').get(),
+            sorted(BattingPerformance.objects.values_list(
+                'player_id', 'runs', 'balls_faced', 'fours', 'sixes', 'not_out', 'bowler_id',
+            )),
+            sorted(BowlingPerformance.objects.values_list(
+                'player_id', 'overs', 'runs_conceded', 'wickets', 'maidens', 'economy',
+            )),
+            list(FallOfWicket.objects.values_list(
+                'wicket', 'player_id', 'partner_id', 'runs', 'balls', 'partnership_runs', 'partnership_balls',
+            )),
+        )
+
+    def test_rows_match_a_replay_of_the_log(self):
+        for runs in (4, 1, 0, 6):
+            self.count_queries(action='add_runs', runs=runs)
+        self.count_queries(action='add_wide')
+        self.count_queries(action='add_wicket', wicket_type='caught')
+        self.count_queries(action='complete_over')
+
+        live_card = self.scorecard()
+        scoring.rebuild_performances(self.match)
+        self.assertEqual(self.scorecard(), live_card)
+        self.assertEqual(live_card[2], [(self.bowlers[0].id, 0.5, 12, 1, 0, 14.4)])
+        self.assertEqual(live_card[3], [(1, self.batsmen[1].id, self.batsmen[0].id, 12, 5, 12, 5)])
+
+    def test_rebuild_summaries_in_one_pass(self):
+        self.count_queries(action='add_runs', runs=3)
+        self.count_queries(action='add_wicket', wicket_type='caught')
+        self.count_queries(action='set_next_batsman', batsman_id=self.batsmen[2].id)
+        live.get(self.match.id)
+        self.count_queries(action='add_runs', runs=2)
+        live.release(self.match.id)
+        self.count_queries(action='complete_over')
+        self.count_queries(action='add_runs', runs=1)
+        live.release(self.match.id)
+        falls = list(FallOfWicket.objects.values_list('wicket', 'runs', 'balls', 'partnership_runs'))
+        overs = list(OverSummary.objects.values_list('over', 'runs', 'wickets', 'total_runs'))
+        counters = ('partnership_runs', 'partnership_balls', 'over_runs', 'over_wickets', 'over_extras')
+        FallOfWicket.objects.all().delete()
+        OverSummary.objects.all().delete()
+        Match.objects.update(**dict.fromkeys(counters, 0))
+
+        self.assertEqual(scoring.rebuild_summaries(Match.objects.all(), batch_size=1), (1, 1))
+        self.assertEqual(list(FallOfWicket.objects.values_list('wicket', 'runs', 'balls', 'partnership_runs')), falls)
+        self.assertEqual(list(OverSummary.objects.values_list('over', 'runs', 'wickets', 'total_runs')), overs)
+        self.assertEqual(overs, [(0, 5, 1, 5)])
+        self.assertEqual(Match.objects.values_list(*counters).get(), (3, 2, 1, 0, 0))
+
+    def test_rebuilt_falls_match_the_live_ones(self):
+        # The non-striker never faces, but is the partner when the striker is out
+        for _ in range(2):
+            self.count_queries(action='add_runs', runs=0)
+        self.count_queries(action='add_wicket', wicket_type='bowled')
+        fields = ('wicket', 'player_id', 'partner_id', 'runs', 'balls', 'partnership_runs', 'partnership_balls')
+        falls = list(FallOfWicket.objects.values_list(*fields))
+        self.assertEqual(falls[0][1:3], (self.batsmen[0].id, self.batsmen[1].id))
+
+        scoring.rebuild_summaries(Match.objects.all())
+        self.assertEqual(list(FallOfWicket.objects.values_list(*fields)), falls)
+
+    def test_unflushed_balls_survive_a_crash(self):
+        for runs in (1, 2, 4):
+            self.count_queries(action='add_runs', runs=runs)
+        served = self.client.get(f'/match/{self.match.id}/live_data/').json()
+        self.assertEqual(Match.objects.get(pk=self.match.pk).total_runs, 0)
+
+        live.forget_all()
+        live.release(self.match.id)
+        self.assertEqual(Match.objects.get(pk=self.match.pk).total_runs, 0)
+        state = live.get(self.match.id)
+        self.assertEqual(state.match.total_runs, served['total_runs'])
+        self.assertEqual(state.match.striker_id, self.batsmen[1].id)
+
+        live.release(self.match.id)
+        self.assertEqual(self.scorecard()[0], (7, 0, 0, 3))
+        self.assertEqual([row[1:3] for row in self.scorecard()[1]], [(1, 1), (6, 2)])
+
+    def test_a_ball_is_built_on_balls_logged_elsewhere(self):
+        # Another process loads the match, then this one scores a single and the strike changes
+        other = live.LiveState.load(self.match.id)
+        self.count_queries(action='add_runs', runs=1)
+        ball = other.record(runs=4)
+        self.assertEqual((ball.batsman_id, ball.ball_number), (self.batsmen[1].id, 2))
+        self.assertEqual(other.match.total_runs, 5)
+
+        live.release(self.match.id)
+        other.flush()
+        self.assertEqual(Match.objects.get(pk=self.match.pk).total_runs, 5)
+        self.assertEqual([row[1:3] for row in self.scorecard()[1]], [(1, 1), (4, 1)])
+
+    def test_a_match_loaded_twice_is_written_once(self):
+        for runs in (1, 4):
+            self.count_queries(action='add_runs', runs=runs)
+        # Another process loads the match and replays the same unflushed balls
+        other = live.LiveState.load(self.match.id)
+        live.release(self.match.id)
+        other.flush()
+        self.assertEqual(Match.objects.get(pk=self.match.pk).total_runs, 5)
+
+        other.record(runs=2)
+        self.assertTrue(other.flush())
+        other.complete_over()
+        self.assertEqual(self.scorecard()[0], (7, 0, 1, 0))
+        self.assertEqual(sorted(row[1] for row in self.scorecard()[1]), [1, 6])
+        self.assertEqual([row[2] for row in self.scorecard()[2]], [7])
+        self.assertEqual(PlayerCareerStats.objects.get(player=self.bowlers[0]).runs_conceded, 7)
+
+
+class TeamRefreshTests(LiveMatchTestCase):
+    def test_a_delivery_writes_no_team_rows(self):
+        # Session and user lookups, then the check and the Ball insert in a savepoint
+        with self.assertNumQueries(6):
+            self.client.post(f'/match/{self.match.id}/update_score/', {'action': 'add_runs', 'runs': 1})
+        # Nor once the balls are flushed and the commit callbacks have run
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            for _ in range(live.MAX_PENDING_BALLS):
+                self.client.post(f'/match/{self.match.id}/update_score/', {'action': 'add_runs', 'runs': 1})
+            live.release(self.match.id)
+        self.assertFalse([query for query in queries.captured_queries if 'tournament_team' in query['sql']])
+
+    def test_a_completed_match_refreshes_its_teams_once(self):
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            Match.objects.filter(pk=self.match.pk).update(is_live=False)
+            match = Match.objects.get(pk=self.match.pk)
+            match.result = 'Home Win'
+            match.save()
+            match.result = 'Away Win'
+            match.save()
+        updates = [query for query in queries.captured_queries if query['sql'].startswith('UPDATE "tournament_team"')]
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(list(Team.objects.values_list('matches_played', flat=True)), [1, 1])
+
+    def test_a_rolled_back_callback_does_not_lose_the_teams(self):
+        home, away = self.match.home_team_id, self.match.away_team_id
+        Match.objects.filter(pk=self.match.pk).update(is_live=False, result='Home Win')
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    signals.schedule_team_refresh({home})
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            signals.schedule_team_refresh({away})
+        self.assertEqual(Team.objects.get(pk=away).matches_played, 1)
+
+
+class TeamRefreshAutocommitTests(TransactionTestCase):
+    def test_a_match_saved_outside_a_transaction_refreshes_its_teams(self):
+        home, away = make_teams(2)
+        match = Match.objects.create(
+            match_number=1, home_team=home, away_team=away, date=timezone.now(),
+            venue="Ground", umpires="Umpires",
+        )
+        match.result = 'Home Win'
+        match.save()
+        self.assertEqual(list(Team.objects.order_by('id').values_list('matches_played', flat=True)), [1, 1])
+
+
+class CareerFeedTests(LiveMatchTestCase):
+    FIELDS = (
+        'player_id', 'batting_innings', 'runs', 'balls_faced', 'fours', 'sixes', 'fifties', 'hundreds',
+        'dismissals', 'bowling_innings', 'wickets', 'balls_bowled', 'runs_conceded', 'five_wicket_hauls',
+    )
+
+    def careers(self):
+        return sorted(PlayerCareerStats.objects.values_list(*self.FIELDS))
+
+    def test_milestones_are_counted_when_crossed(self):
+        self.assertEqual(career.batting_deltas(45, runs=6, balls=1, sixes=1)['fifties'], 1)
+        self.assertEqual(career.batting_deltas(51, runs=4)['fifties'], 0)
+        hundred = career.batting_deltas(98, runs=4)
+        self.assertEqual((hundred['fifties'], hundred['hundreds']), (-1, 1))
+        self.assertEqual(career.bowling_deltas(4, runs=0, balls=1, wickets=1)['five_wicket_hauls'], 1)
+        self.assertEqual(career.bowling_deltas(5, runs=0, balls=1, wickets=1)['five_wicket_hauls'], 0)
+
+    def test_incremental_totals_match_a_rebuild(self):
+        # A fifty in sixes, then five wickets for the same bowler with extras in between
+        for _ in range(9):
+            self.count_queries(action='add_runs', runs=6)
+        self.count_queries(action='add_wide')
+        self.count_queries(action='add_noball')
+        self.count_queries(action='add_runs', runs=4)
+        for n in range(2, 7):
+            self.count_queries(action='add_wicket', wicket_type='bowled')
+            self.count_queries(action='set_next_batsman', batsman_id=self.batsmen[n].id)
+            self.count_queries(action='add_runs', runs=1)
+        live.release(self.match.id)
+
+        fed = self.careers()
+        opener = next(row for row in fed if row[0] == self.batsmen[0].id)
+        bowler = next(row for row in fed if row[0] == self.bowlers[0].id)
+        self.assertEqual(opener[2:8], (58, 11, 1, 9, 1, 0))
+        self.assertEqual(bowler[10:], (5, 20, 65, 1))
+
+        career.rebuild()
+        self.assertEqual(self.careers(), fed)
+
+
+class OverSeriesTests(LiveMatchTestCase):
+    def fetch(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/match/{self.match.id}/overs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries.captured_queries if 'tournament_ball' in query['sql']])
+        return response.json()['innings']
+
+    def test_finished_and_current_overs(self):
+        for runs in (1, 4, 0):
+            self.count_queries(action='add_runs', runs=runs)
+        self.count_queries(action='complete_over')
+        self.count_queries(action='add_wide')
+        self.count_queries(action='add_runs', runs=6)
+
+        innings = self.fetch()['1']
+        self.assertEqual(innings['overs'], [1, 2])
+        self.assertEqual(innings['runs'], [5, 7])
+        self.assertEqual(innings['extras'], [0, 1])
+        self.assertEqual(innings['score'], [5, 12])
+        self.assertTrue(innings['partial'])
+
+        # Served the same from the rows once the live state is written out
+        live.release(self.match.id)
+        self.assertEqual(self.fetch()['1'], innings)
+
+    def test_innings_end_closes_its_last_over(self):
+        self.count_queries(action='add_runs', runs=2)
+        self.client.post(f'/match/{self.match.id}/update_score/', {'action': 'complete_innings'})
+
+        series = self.fetch()
+        self.assertEqual((series['1']['runs'], series['1']['partial']), ([2], False))
+        self.assertEqual(series['2']['overs'], [])
+
+
+class ScorecardFragmentTests(LiveMatchTestCase):
+    def fetch(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/match/{self.match.id}/performances/', headers=headers)
+        return response, len([query for query in queries.captured_queries if 'tournament_' in query['sql']])
+
+    def test_unchanged_scorecard_is_not_sent_again(self):
+        first, _ = self.fetch()
+        self.assertEqual(first.status_code, 200)
+        self.assertIn(self.batsmen[0].name, first.json()['batting_html'])
+
+        again, queries = self.fetch(if_none_match=first['ETag'])
+        self.assertEqual((again.status_code, queries), (304, 0))
+
+    def test_render_is_shared_until_the_rows_are_written(self):
+        first, _ = self.fetch()
+        self.count_queries(action='add_runs', runs=4)
+        # The delivery is not written behind yet, so the cached tables still hold
+        cached, queries = self.fetch()
+        self.assertEqual((cached['ETag'], queries), (first['ETag'], 0))
+
+        live.release(self.match.id)
+        fresh, _ = self.fetch(if_none_match=first['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], first['ETag'])
+        self.assertIn('<td>4</td>', fresh.json()['batting_html'])
+
+    def test_renders_of_other_matches_do_not_wait(self):
+        innings, version = scorecard.version(self.match.id)
+        # Another match is being rendered
+        with scorecard._render_locks.setdefault(self.match.id + 1, threading.Lock()):
+            batting_html, _ = scorecard.fragments(self.match.id, innings, version)
+        self.assertIn(self.batsmen[0].name, batting_html)
+
+    def test_racing_saves_get_their_own_versions(self):
+        live.release(self.match.id)
+        first, second = Match.objects.get(pk=self.match.pk), Match.objects.get(pk=self.match.pk)
+        # One UPDATE; the new version is only read back when asked for
+        with self.assertNumQueries(1):
+            first.save()
+        version = first.data_version
+        second.save()
+        self.assertEqual(second.data_version, version + 1)
+        self.assertEqual(Match.objects.get(pk=self.match.pk).data_version, second.data_version)
+
+
+class MatchDetailTests(TestCase):
+    def setUp(self):
+        self.home, self.away = make_teams(2)
+        self.match = Match.objects.create(
+            match_number=1, home_team=self.home, away_team=self.away, date=timezone.now(),
+            venue="Ground", umpires="Umpires", innings=2,
+            toss_winner=self.home, toss_decision='bat', batting_team=self.away, bowling_team=self.home,
+        )
+        user = User.objects.create_user('viewer', password='password')
+        self.client.force_login(user)
+
+    def add_innings(self, innings, batting, bowling, count, start=0):
+        batsmen = make_players(batting, count, start=start)
+        bowlers = make_players(bowling, count, start=start + 100)
+        for i, (batsman, bowler) in enumerate(zip(batsmen, bowlers)):
+            BattingPerformance.objects.create(
+                player=batsman, match=self.match, innings=innings, runs=10 + i, balls_faced=8,
+                fours=1, not_out=i % 2 == 0, bowler=None if i % 2 == 0 else bowler,
+            )
+            BowlingPerformance.objects.create(player=bowler, match=self.match, innings=innings, wickets=i % 3)
+
+    def fetch(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/matches/{self.match.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response, len([query for query in queries.captured_queries if 'tournament_' in query['sql']])
+
+    def test_totals_and_wickets(self):
+        self.add_innings(1, self.home, self.away, 4)
+        self.add_innings(2, self.away, self.home, 3, start=10)
+        response, _ = self.fetch()
+
+        context = response.context
+        self.assertEqual(context['first_innings_total']['runs__sum'], 10 + 11 + 12 + 13)
+        self.assertEqual(context['first_innings_total']['fours__sum'], 4)
+        self.assertEqual(context['first_innings_wickets'], 2)
+        self.assertEqual(context['second_innings_wickets'], 1)
+        self.assertEqual(context['target'], 47)
+        self.assertEqual([row.runs for row in context['first_innings_batting']], [13, 12, 11, 10])
+        self.assertEqual([row.wickets for row in context['second_innings_bowling']], [2, 1, 0])
+        self.assertContains(response, self.away.name + " Player 101")
+
+    def test_falls_and_partnerships(self):
+        self.add_innings(1, self.home, self.away, 3)
+        batsmen = list(Player.objects.filter(team=self.home).order_by('id'))
+        self.match.first_score, self.match.first_balls = 40, 30
+        self.match.save()
+        FallOfWicket.objects.create(
+            match=self.match, innings=1, wicket=1, player=batsmen[1], partner=batsmen[0],
+            runs=25, balls=14, partnership_runs=25, partnership_balls=14,
+        )
+        response, _ = self.fetch()
+
+        partnerships = response.context['first_innings_partnerships']
+        self.assertEqual([(row.wicket, row.runs, row.balls, row.unbroken) for row in partnerships],
+                         [(1, 25, 14, False), (2, 15, 16, True)])
+        self.assertEqual(partnerships[1].batters, [batsmen[2].name, batsmen[0].name])
+        self.assertContains(response, f"25-1 ({batsmen[1].name}, 2.2 ov)")
+
+    def test_query_count_is_fixed(self):
+        self.add_innings(1, self.home, self.away, 2)
+        _, small = self.fetch()
+        self.add_innings(1, self.home, self.away, 9, start=2)
+        self.add_innings(2, self.away, self.home, 11, start=20)
+        _, large = self.fetch()
+        self.assertEqual(large, small)
+        # The match with its teams and players, then the batting, bowling and fall of wicket rows
+        self.assertEqual(large, 4)
+
+
+class LiveDataConditionalTests(LiveMatchTestCase):
+    def poll(self, **headers):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/match/{self.match.id}/live_data/', headers=headers)
+        return response, len([query for query in queries.captured_queries if 'tournament_' in query['sql']])
+
+    def test_unchanged_score_is_answered_without_the_match(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=2)
+            live.release(self.match.id)
+
+        first, _ = self.poll()
+        self.assertEqual(first.json()['total_runs'], 2)
+        again, queries = self.poll(if_none_match=first['ETag'])
+        self.assertEqual((again.status_code, queries), (304, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=1)
+        changed, _ = self.poll(if_none_match=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual(changed.json()['total_runs'], 3)
+
+    def test_save_without_a_push_drops_the_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=2)
+            live.release(self.match.id)
+        etag = self.poll()[0]['ETag']
+
+        # Saves that leave the score alone keep it
+        match = Match.objects.get(pk=self.match.id)
+        match.umpires = "Other umpires"
+        match.save()
+        self.assertEqual(self.poll(if_none_match=etag)[0].status_code, 304)
+
+        match.total_runs = 10
+        match.save()
+        response, _ = self.poll(if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('ETag'))
+
+    def test_poll_rates(self):
+        rates = loadtest.poll_rates(self.match.id, requests=3)
+        self.assertEqual(set(rates), {'full', 'conditional'})
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class LiveBroadcastTests(LiveMatchTestCase):
+    def setUp(self):
+        super().setUp()
+        self.layer = get_channel_layer()
+        self.channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)(f'match_{self.match.id}', self.channel)
+
+    def receive(self):
+        return async_to_sync(self.layer.receive)(self.channel)
+
+    def test_delivery_is_pushed_to_the_match_group(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=4)
+
+        event = self.receive()
+        self.assertEqual(event['type'], 'match_update')
+        delta = event['event']
+        self.assertEqual((delta['type'], delta['seq']), ('delta', 1))
+        self.assertEqual(delta['data']['total_runs'], 4)
+        self.assertEqual(delta['data']['striker'], self.batsmen[0].name)
+        self.assertEqual(delta['data']['striker_fours'], 1)
+
+    def test_only_changed_fields_are_pushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=1)
+            self.count_queries(action='add_wide')
+
+        self.receive()
+        delta = self.receive()['event']
+        self.assertEqual(delta['seq'], 2)
+        self.assertEqual(delta['data'], {
+            'total_runs': 2, 'bowler_runs': 2, 'current_run_rate': 12.0, 'partnership_runs': 2,
+        })
+
+    def test_push_matches_the_polling_fallback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=1)
+            self.count_queries(action='set_next_bowler', bowler_id=self.bowlers[1].id)
+
+        # The delivery, the write-behind flush ahead of the bowler change, and the change
+        pushed = {}
+        for _ in range(3):
+            pushed.update(self.receive()['event']['data'])
+        polled = self.client.get(f'/match/{self.match.id}/live_data/').json()
+        self.assertEqual(pushed, polled)
+        self.assertEqual(pushed['bowler'], self.bowlers[1].name)
+
+    @override_settings(LIVE_BROADCAST_WINDOW=60)
+    def test_burst_of_actions_is_sent_as_one_frame(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_wicket', wicket_type='bowled')
+            self.count_queries(action='set_next_batsman', batsman_id=self.batsmen[2].id)
+            self.count_queries(action='complete_over')
+        self.assertEqual(broadcast.counters()['frames_out'], 0)
+
+        broadcast.flush(self.match.id)
+        frame = self.receive()['event']
+        self.assertEqual(frame['seq'], 1)
+        self.assertEqual((frame['data']['total_wickets'], frame['data']['current_over']), (1, '1.0'))
+        # The new batsman took strike and then swapped ends at the end of the over
+        self.assertEqual(frame['data']['non_striker'], self.batsmen[2].name)
+        counters = broadcast.counters()
+        self.assertEqual(counters['frames_out'], 1)
+        self.assertGreaterEqual(counters['messages_in'], 3)
+
+    def test_reconnecting_viewer_is_sent_what_it_missed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for runs in (1, 2, 3):
+                self.count_queries(action='add_runs', runs=runs)
+        epoch = broadcast.journal(self.match.id).epoch
+
+        missed = broadcast.resume(self.match.id, epoch, 1)
+        self.assertEqual([event['seq'] for event in missed], [2, 3])
+        self.assertEqual(broadcast.resume(self.match.id, epoch, 3), [])
+
+        snapshot, = broadcast.resume(self.match.id, 'restarted', 3)
+        self.assertEqual((snapshot['type'], snapshot['seq']), ('snapshot', 3))
+        self.assertEqual(snapshot['data']['total_runs'], 6)
+
+    def test_processes_share_one_journal(self):
+        message = broadcast.scoreboard(Match.objects.get(pk=self.match.pk))
+        # What two processes each build for the match; only the cache holds its history
+        first, second = broadcast.Journal(self.match.id), broadcast.Journal(self.match.id)
+        recorded = first.record(dict(message, total_runs=1))
+        self.assertEqual(second.snapshot()['data']['total_runs'], 1)
+
+        broadcast.send(self.match.id, dict(message, total_runs=2))
+        pushed = self.receive()['event']
+        self.assertEqual((pushed['epoch'], pushed['seq']), (recorded['epoch'], 2))
+        self.assertEqual(second.since(recorded['epoch'], 0), [recorded, pushed])
+        self.assertEqual(first.since(recorded['epoch'], 2), [])
+        self.assertEqual(broadcast.version(self.match.id), f'"{recorded["epoch"]}-2"')
+
+    def test_consumer_replays_missed_events_and_ignores_client_pushes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=4)
+        epoch = broadcast.journal(self.match.id).epoch
+
+        socket = ApplicationCommunicator(consumers.MatchConsumer.as_asgi(), {
+            'type': 'websocket', 'path': f'/ws/match/{self.match.id}/',
+            'url_route': {'args': (), 'kwargs': {'match_id': str(self.match.id)}},
+        })
+
+        async def session():
+            await socket.send_input({'type': 'websocket.connect'})
+            self.assertEqual((await socket.receive_output())['type'], 'websocket.accept')
+            await socket.send_input({'type': 'websocket.receive', 'text': '{"message": {"total_runs": 999}}'})
+            await socket.send_input({'type': 'websocket.receive',
+                                     'text': json.dumps({'type': 'resume', 'epoch': epoch, 'seq': 0})})
+            replayed = json.loads((await socket.receive_output())['text'])
+            self.assertTrue(await socket.receive_nothing())
+            await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await socket.wait()
+            return replayed
+
+        replayed = async_to_sync(session)()
+        self.assertEqual((replayed['type'], replayed['seq']), ('delta', 1))
+        self.assertEqual(replayed['data']['total_runs'], 4)
+
+    def test_ticker_gets_one_line_per_update(self):
+        ticker_channel = async_to_sync(self.layer.new_channel)()
+        async_to_sync(self.layer.group_add)('live_ticker', ticker_channel)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=4)
+
+        update = async_to_sync(self.layer.receive)(ticker_channel)
+        self.assertEqual(update['type'], 'ticker_update')
+        self.assertEqual(update['item'], {
+            'id': self.match.id, 'live': True, 'batting': 'T0', 'runs': 4, 'wickets': 0,
+            'overs': '0.1', 'status': 'T0 batting first',
+        })
+
+    def test_ticker_consumer_sends_only_subscribed_matches(self):
+        socket = ApplicationCommunicator(consumers.LiveTickerConsumer.as_asgi(), {'type': 'websocket', 'path': '/ws/live/'})
+        item = {'id': self.match.id + 1, 'live': True}
+
+        async def session():
+            await socket.send_input({'type': 'websocket.connect'})
+            await socket.receive_output()
+            frames = [json.loads((await socket.receive_output())['text'])]
+            await socket.send_input({'type': 'websocket.receive',
+                                     'text': json.dumps({'type': 'subscribe', 'match_ids': [self.match.id]})})
+            frames.append(json.loads((await socket.receive_output())['text']))
+            await self.layer.group_send('live_ticker', {'type': 'ticker_update', 'item': item})
+            nothing = await socket.receive_nothing()
+            await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await socket.wait()
+            return frames, nothing
+
+        (everything, subscribed), nothing = async_to_sync(session)()
+        self.assertEqual(everything['type'], 'snapshot')
+        self.assertEqual([line['id'] for line in everything['items']], [self.match.id])
+        self.assertEqual(subscribed['items'][0]['runs'], 0)
+        self.assertTrue(nothing)
+
+    @override_settings(LIVE_STREAM_HEARTBEAT=0.05)
+    def test_event_stream_resumes_pushes_and_keeps_alive(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for runs in (1, 2, 3):
+                self.count_queries(action='add_runs', runs=runs)
+        epoch = broadcast.journal(self.match.id).epoch
+        message = dict(broadcast.journal(self.match.id).state, total_runs=10)
+
+        async def read():
+            body = stream.events(self.match.id, f'{epoch}:1')
+            chunks = [await anext(body) for _ in range(3)]
+            await sync_to_async(broadcast.send)(self.match.id, message)
+            chunks += [await anext(body) for _ in range(2)]
+            await body.aclose()
+            return chunks
+
+        retry, second, third, pushed, heartbeat = async_to_sync(read)()
+        self.assertEqual(retry, f'retry: {stream.RETRY}\n\n')
+        self.assertTrue(second.startswith(f'id: {epoch}:2\ndata: '))
+        self.assertTrue(third.startswith(f'id: {epoch}:3\n'))
+        self.assertEqual(json.loads(pushed.split('data: ')[1])['data'], {'total_runs': 10})
+        self.assertEqual(heartbeat, ': heartbeat\n\n')
+
+    @override_settings(LIVE_STREAM_HEARTBEAT=0.05)
+    def test_event_stream_polls_the_journal_without_a_channel_layer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.count_queries(action='add_runs', runs=1)
+        epoch = broadcast.journal(self.match.id).epoch
+        message = dict(broadcast.journal(self.match.id).state, total_runs=10)
+
+        async def read():
+            body = stream.events(self.match.id, f'{epoch}:1')
+            chunks = [await anext(body) for _ in range(2)]
+            await sync_to_async(broadcast.send)(self.match.id, message)
+            chunks.append(await anext(body))
+            await body.aclose()
+            return chunks
+
+        with mock.patch.object(stream, 'get_channel_layer', return_value=None):
+            _, heartbeat, polled = async_to_sync(read)()
+        self.assertEqual(heartbeat, ': heartbeat\n\n')
+        self.assertTrue(polled.startswith(f'id: {epoch}:2\n'))
+        self.assertEqual(json.loads(polled.split('data: ')[1])['data'], {'total_runs': 10})
+
+    def test_event_stream_of_unknown_match(self):
+        self.assertEqual(self.client.get('/match/999/stream/').status_code, 404)
+
+
+def cricsheet_match(day, teams=("Lions", "Tigers")):
+    """A short Cricsheet file: two balls each innings, one a wide, and a catch in the first"""
+    def innings(batting, bowling, wicket):
+        batter, partner, bowler = f"{batting} A", f"{batting} B", f"{bowling} C"
+        deliveries = [
+            {"batter": batter, "bowler": bowler, "non_striker": partner, "runs": {"batter": 4, "extras": 0, "total": 4}},
+            {"batter": batter, "bowler": bowler, "non_striker": partner, "runs": {"batter": 0, "extras": 1, "total": 1},
+             "extras": {"wides": 1}},
+            {"batter": batter, "bowler": bowler, "non_striker": partner, "runs": {"batter": 0, "extras": 0, "total": 0},
+             **({"wickets": [{"player_out": batter, "kind": "caught", "fielders": [{"name": f"{bowling} D"}]}]}
+                if wicket else {})},
+        ]
+        return {"team": batting, "overs": [{"over": 0, "deliveries": deliveries}]}
+
+    home, away = teams
+    return {
+        "meta": {"data_version": "1.1.0"},
+        "info": {
+            "dates": [f"2024-05-{day:02d}"], "venue": "Ground", "teams": [home, away], "overs": 10,
+            "officials": {"umpires": ["U One", "U Two"]},
+            "toss": {"winner": home, "decision": "bat"},
+            "outcome": {"winner": home, "by": {"runs": 1}},
+            "players": {home: [f"{home} A", f"{home} B", f"{home} C"], away: [f"{away} A", f"{away} B", f"{away} C"]},
+            "player_of_match": [f"{home} A"],
+        },
+        "innings": [innings(home, away, True), innings(away, home, False)],
+    }
+
+
+class CricsheetImportTests(TestCase):
+    def setUp(self):
+        self.directory = self.enterContext(tempfile.TemporaryDirectory())
+        self.write(1)
+        self.write(2)
+
+    def write(self, day):
+        with open(os.path.join(self.directory, f"{day}.json"), 'w') as f:
+            json.dump(cricsheet_match(day), f)
+
+    def test_import_and_resume(self):
+        files, rows, _ = importer.load(self.directory, workers=2, chunk_size=1)
+
+        self.assertEqual(files, 2)
+        self.assertEqual(Team.objects.count(), 2)
+        self.assertEqual(Player.objects.count(), 6)
+        self.assertEqual(Ball.objects.count(), 12)
+        match = Match.objects.get(source_file='1.json')
+        self.assertEqual((match.first_score, match.first_wickets, match.first_balls), (5, 1, 2))
+        self.assertEqual(match.balls_remaining, 60)
+        self.assertEqual((match.result, match.win_margin), ('Home Win', "Lions won by 1 runs"))
+        self.assertEqual(match.man_of_the_match.name, "Lions A")
+        # Career stats are rebuilt from the imported scorecards
+        self.assertEqual(PlayerCareerStats.objects.get(player__name="Lions A").runs,
+                         sum(BattingPerformance.objects.filter(player__name="Lions A").values_list('runs', flat=True)))
+        self.assertEqual(rows, 2 + 6 + Match.objects.count() + Ball.objects.count() + BattingPerformance.objects.count()
+                         + BowlingPerformance.objects.count() + FallOfWicket.objects.count() + OverSummary.objects.count())
+
+        # The imported scorecard is the one a replay of the balls gives
+        imported = sorted(BattingPerformance.objects.filter(match=match).values_list('player_id', 'runs', 'not_out'))
+        scoring.rebuild_performances(match)
+        self.assertEqual(
+            sorted(BattingPerformance.objects.filter(match=match).values_list('player_id', 'runs', 'not_out')), imported,
+        )
+
+        # Only new files are loaded the next time, onto the same teams and players
+        self.write(3)
+        files, _, _ = importer.load(self.directory, workers=1)
+        self.assertEqual((files, Match.objects.count(), Player.objects.count()), (1, 3, 6))
+
+    def test_bat_runs_off_a_no_ball_and_every_dismissal_are_kept(self):
+        no_ball = {"batter": "A", "bowler": "C", "runs": {"batter": 4, "extras": 1, "total": 5},
+                   "extras": {"byes": 0, "noballs": 1}}
+        self.assertEqual(cricsheet._ball(3, no_ball), (3, "A", "C", 4, 1, scoring.NO_BALL, '', ''))
+
+        def out(kind):
+            return cricsheet._ball(0, {"batter": "A", "bowler": "C", "runs": {"batter": 0, "extras": 0, "total": 0},
+                                       "wickets": [{"player_out": "A", "kind": kind}]})[5:]
+
+        self.assertEqual(out("obstructing the field"), ('', 'obstructing_field', 'A'))
+        self.assertEqual(out("retired out"), ('', 'retired_out', 'A'))
+        self.assertEqual(out("retired hurt"), ('', '', ''))
+
+
+class FeedLoadTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(broadcast.forget_all)
+        # The journals are kept in the cache
+        self.addCleanup(cache.clear)
+        self.addCleanup(consumers.reset_metrics)
+
+    def test_slow_viewers_are_resynced_instead_of_holding_up_fast_ones(self):
+        received, _, totals = loadtest.simulate(4242, sockets=60, slow=10, updates=20, delay=0.05, queue_size=4)
+
+        for frames in received[10:]:
+            self.assertEqual([frame['seq'] for frame in frames], list(range(1, 21)))
+        for frames in received[:10]:
+            state = {}
+            for frame in frames:
+                state.update(frame['data'])
+            self.assertEqual(state['total_runs'], 20)
+            self.assertIn('snapshot', [frame['type'] for frame in frames])
+            self.assertLess(len(frames), 20)
+        self.assertGreaterEqual(totals['resyncs'], 10)
+        self.assertLessEqual(totals['max_depth'], 4)
+        self.assertEqual(totals['depth'], 0)
+
+    def test_benchmark_through_the_asgi_application(self):
+        result = loadtest.benchmark(4242, connections=20, updates=5, interval=0)
+
+        self.assertEqual(result['frames'], 20 * 5)
+        self.assertLessEqual(result['p50'], result['p99'])
+        self.assertGreater(result['bytes_per_connection'], 0)
+
+
+class ViewerTokenTests(TestCase):
+    def setUp(self):
+        user = User.objects.create_user('viewer', 'viewer@example.com', 'password')
+        self.client.force_login(user)
+        self.cookie = f"sessionid={self.client.cookies['sessionid'].value}".encode()
+
+    def connect(self, query=b''):
+        """The scope a websocket connection reaches the router with, and the queries spent getting there"""
+        seen = {}
+
+        async def router(scope, receive, send):
+            seen.update(scope)
+
+        async def receive():
+            return {'type': 'websocket.connect'}
+
+        async def send(message):
+            pass
+
+        scope = {'type': 'websocket', 'path': '/ws/match/7/', 'query_string': query, 'headers': [(b'cookie', self.cookie)]}
+        with CaptureQueriesContext(connection) as queries:
+            async_to_sync(viewers.ViewerAuthMiddlewareStack(router))(scope, receive, send)
+        return seen, len(queries.captured_queries)
+
+    def test_token_skips_the_session(self):
+        token = viewers.token_for('match_7')
+        scope, queries = self.connect(f'token={token}'.encode())
+
+        self.assertEqual((scope['viewer'], queries), ('match_7', 0))
+        self.assertFalse(scope['user'].is_authenticated)
+
+    def test_scorer_without_a_token_still_gets_the_session_user(self):
+        scope, queries = self.connect()
+
+        self.assertNotIn('viewer', scope)
+        self.assertGreater(queries, 0)
+        self.assertEqual(scope['user'].username, 'viewer')
+
+    def test_forged_or_expired_tokens_are_not_trusted(self):
+        self.assertIsNone(viewers.verify(viewers.token_for('match_7') + 'x'))
+        with override_settings(LIVE_VIEWER_TOKEN_MAX_AGE=-1):
+            self.assertIsNone(viewers.verify(viewers.token_for('match_7')))
+
+    def match_socket(self, viewer):
+        """A match socket for the given viewer scope, and the consumers it creates"""
+        created = []
+
+        class Consumer(consumers.MatchConsumer):
+            async def connect(self):
+                created.append(self)
+                await super().connect()
+
+        socket = ApplicationCommunicator(Consumer.as_asgi(), {
+            'type': 'websocket', 'path': '/ws/match/7/', 'viewer': viewer,
+            'url_route': {'args': (), 'kwargs': {'match_id': '7'}},
+        })
+        return socket, created
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+    def test_token_for_another_match_is_turned_away(self):
+        socket, created = self.match_socket('match_8')
+
+        async def session():
+            await socket.send_input({'type': 'websocket.connect'})
+            return await socket.receive_output()
+
+        self.assertEqual(async_to_sync(session)()['type'], 'websocket.close')
+        # Nothing is left running for a socket that was never accepted
+        self.assertIsNone(created[0].writer)
+
+    @override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+    def test_writer_runs_only_while_connected(self):
+        socket, created = self.match_socket('match_7')
+
+        async def session():
+            await socket.send_input({'type': 'websocket.connect'})
+            accepted = await socket.receive_output()
+            writer = created[0].writer
+            running = not writer.done()
+            await socket.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await socket.wait()
+            return accepted, running, writer
+
+        accepted, running, writer = async_to_sync(session)()
+        self.assertEqual(accepted['type'], 'websocket.accept')
+        self.assertTrue(running)
+        self.assertTrue(writer.cancelled())
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.teams = make_teams(3)
+        self.matches = make_finished_matches(self.teams, 4)
+        for match, date in zip(self.matches, ('2023-04-01', '2024-04-01', '2024-05-01', '2024-06-01')):
+            Match.objects.filter(pk=match.pk).update(date=timezone.make_aware(datetime.fromisoformat(date)))
+        self.client.force_login(User.objects.create_user('analyst', password='password'))
+
+    def download(self, url):
+        response = self.client.get(url)
+
+        async def read():
+            return [piece async for piece in response.streaming_content]
+
+        return response, [piece.decode() for piece in async_to_sync(read)()]
+
+    def test_csv_starts_with_the_header_and_then_the_first_row_alone(self):
+        with mock.patch.object(exports, 'CHUNK_SIZE', 2):
+            response, pieces = self.download('/exports/matches.csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="matches.csv"')
+        self.assertTrue(pieces[0].startswith('id,match_number,date,'))
+        self.assertEqual([piece.count('\r\n') for piece in pieces], [1, 1, 2, 1])
+
+    def test_filters_are_applied_in_the_query(self):
+        def ids(query):
+            _, pieces = self.download(f'/exports/matches.jsonl?{query}')
+            return [json.loads(line)['id'] for line in ''.join(pieces).splitlines()]
+
+        first, second, third, fourth = (match.pk for match in self.matches)
+        self.assertEqual(ids('season=2024'), [second, third, fourth])
+        self.assertEqual(ids('from=2024-04-15&to=2024-05-31'), [third])
+        team = self.teams[0].pk
+        self.assertEqual(ids(f'team={team}'), [match.pk for match in self.matches
+                                               if team in (match.home_team_id, match.away_team_id)])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.download('/exports/matches.jsonl?season=2023')
+        export = next(query['sql'] for query in queries.captured_queries if 'tournament_match' in query['sql'])
+        self.assertIn('WHERE', export)
+
+    def test_performances_and_leaderboard(self):
+        players = make_players(self.teams[0], 2) + make_players(self.teams[1], 1)
+        for player, runs in zip(players, (30, 50, 70)):
+            BattingPerformance.objects.create(player=player, match=self.matches[1], innings=1, runs=runs)
+        career.rebuild()
+
+        _, pieces = self.download(f'/exports/batting.csv?season=2024&team={self.teams[0].pk}')
+        self.assertEqual(len(''.join(pieces).splitlines()), 3)
+        _, pieces = self.download('/exports/leaderboard.jsonl')
+        self.assertEqual([json.loads(line)['runs'] for line in ''.join(pieces).splitlines()], [70, 50, 30])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get('/exports/matches.csv?from=yesterday').status_code, 400)
+        self.assertEqual(self.client.get('/exports/matches.csv?season=last').status_code, 400)
+        self.assertEqual(self.client.get('/exports/umpires.csv').status_code, 404)
+        self.assertEqual(self.client.get('/exports/matches.xml').status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get('/exports/matches.csv').status_code, 302)
+
+
+class WinProbabilityTests(TestCase):
+    def setUp(self):
+        self.home, self.away = make_teams(2)
+        self.batsman, = make_players(self.home, 1)
+        self.bowler, = make_players(self.away, 1, start=1)
+        self.addCleanup(winprob.forget)
+
+    def chase(self, number, first_score, second_score, balls, **fields):
+        match = Match.objects.create(
+            match_number=number, home_team=self.away, away_team=self.home, date=timezone.now(),
+            venue="Ground", umpires="Umpires", innings=2, first_score=first_score, second_score=second_score,
+            result='Away Win' if second_score > first_score else 'Home Win', **fields,
+        )
+        Ball.objects.bulk_create(
+            Ball(match=match, innings=2, batsman=self.batsman, bowler=self.bowler,
+                 runs=runs, extras=extras, is_wicket=wicket)
+            for runs, extras, wicket in balls
+        )
+        return match
+
+    def test_history_is_the_state_before_each_delivery(self):
+        self.chase(1, 5, 6, [(4, '', False), (1, 'wide', False), (0, '', True), (2, '', False)])
+        self.chase(2, 10, 3, [(3, '', False), (0, '', True)])
+        # Neither a match still being played nor a first innings counts
+        self.chase(3, 10, 0, [(6, '', False)], is_live=True)
+        Ball.objects.create(match_id=1, innings=1, batsman=self.batsman, bowler=self.bowler, runs=6)
+
+        needed, left, in_hand, result = winprob.history()
+        self.assertEqual(needed.tolist(), [6, 2, 1, 1, 11, 8])
+        self.assertEqual(left.tolist(), [120, 119, 119, 118, 120, 119])
+        self.assertEqual(in_hand.tolist(), [10, 10, 10, 9, 10, 10])
+        self.assertEqual(result.tolist(), [1, 1, 1, 1, 0, 0])
+
+    def test_history_starts_from_each_innings_length(self):
+        self.chase(1, 5, 6, [(4, '', False), (2, '', False)], balls_remaining=60)
+        # Longer than the table covers
+        self.chase(2, 5, 6, [(6, '', False)], balls_remaining=300)
+
+        needed, left, in_hand, result = winprob.history()
+        self.assertEqual(left.tolist(), [60, 59])
+
+    def test_servers_fit_the_table_on_their_first_request(self):
+        for argv, environ, serving in ((['daphne', 'UCL.asgi:application'], {}, True),
+                                       (['manage.py', 'runserver'], {'RUN_MAIN': 'true'}, True),
+                                       (['manage.py', 'runserver'], {}, False),
+                                       (['manage.py', 'migrate'], {}, False)):
+            with mock.patch.object(sys, 'argv', argv), mock.patch.dict(os.environ, environ):
+                self.assertEqual(tournament_apps.serving(), serving)
+
+        request_started.connect(tournament_apps.prewarm, dispatch_uid='winprob_prewarm')
+        with mock.patch.object(winprob, 'fit_later') as fit_later:
+            request_started.send(sender=None)
+            request_started.send(sender=None)
+        fit_later.assert_called_once_with()
+
+    def test_table_lookups(self):
+        for number in range(1, 21):
+            # Chases of a small target won, of a big one lost
+            self.chase(number, 8 if number % 2 else 80, 9 if number % 2 else 20,
+                       [(1, '', False)] * 6 + [(0, '', True)])
+
+        self.assertEqual(winprob.table().shape, (winprob.MAX_BALLS + 1, winprob.MAX_RUNS + 1, winprob.WICKETS + 1))
+        self.assertGreater(winprob.chance(9, 120, 10), winprob.chance(81, 120, 10))
+        self.assertGreater(winprob.chance(60, 60, 8), winprob.chance(90, 60, 8))
+        self.assertGreater(winprob.chance(60, 60, 8), winprob.chance(60, 60, 2))
+        self.assertEqual(winprob.chance(0, 30, 4), 1.0)
+        self.assertEqual(winprob.chance(5, 0, 4), 0.0)
+        self.assertEqual(winprob.chance(5, 30, 0), 0.0)
+        self.assertEqual(winprob.chance(5000, 30, 4), winprob.chance(winprob.MAX_RUNS, 30, 4))
+
+    def test_only_a_live_chase_has_a_probability(self):
+        match = self.chase(1, 150, 0, [], is_live=True, total_runs=100, total_wickets=3, current_over=15)
+        # Nothing is fitted under the caller; the score goes out without it until the table is ready
+        self.assertIsNone(winprob.for_match(match))
+
+        winprob.table()
+        self.assertEqual(winprob.for_match(match), round(100 * winprob.chance(51, 30, 7)))
+        self.assertEqual(broadcast.scoreboard(match)['win_probability'], winprob.for_match(match))
+        match.innings = 1
+        self.assertIsNone(broadcast.scoreboard(match)['win_probability'])
+
+    def test_balls_left_come_from_the_match(self):
+        match = self.chase(1, 150, 0, [], is_live=True, total_runs=100, total_wickets=3, current_over=5,
+                           balls_remaining=60)
+        winprob.table()
+        self.assertEqual(winprob.for_match(match), round(100 * winprob.chance(51, 30, 7)))
+        # Past the last over of a shorter match, and for innings longer than the table covers
+        match.current_over = 11
+        self.assertEqual(winprob.for_match(match), 0)
+        match.balls_remaining = 300
+        self.assertIsNone(winprob.for_match(match))
+
+    def test_a_fit_started_before_a_forget_is_dropped(self):
+        fits = []
+
+        def fit(*arrays):
+            if not fits:
+                # A match is completed while the first fit is running
+                winprob.forget()
+            fits.append(arrays)
+            return len(fits)
+
+        with mock.patch.object(winprob, 'history', return_value=()), mock.patch.object(winprob, 'fit', fit), \
+                mock.patch.object(winprob, 'connection'), \
+                mock.patch.object(winprob.threading, 'Thread', lambda target, **kwargs: SimpleNamespace(start=target)):
+            self.assertTrue(winprob.fit_later())
+        self.assertEqual((len(fits), winprob.table()), (2, 2))
+
+
+class WinProbabilityRefreshTests(LiveMatchTestCase):
+    def test_completing_a_match_refits_the_table(self):
+        with mock.patch.object(winprob, 'refresh_later') as refresh_later, \
+                mock.patch.object(qualification, 'refresh_later'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(f'/match/{self.match.id}/update_score/', {'action': 'complete_match'})
+                refresh_later.assert_not_called()
+        refresh_later.assert_called_once_with()
+
+
+@override_settings(QUALIFICATION_PLACES=2, QUALIFICATION_WORKERS=1)
+class QualificationTests(TestCase):
+    def setUp(self):
+        self.teams = make_teams(4)
+        self.addCleanup(cache.clear)
+
+    def result(self, number, home, away, first_score, second_score, result='Home Win', second_balls=120):
+        return Match.objects.create(
+            match_number=number, home_team=home, away_team=away, date=timezone.now(), venue="Ground",
+            umpires="Umpires", innings=2, first_team=home, second_team=away, result=result,
+            first_score=first_score, first_balls=120, second_score=second_score, second_balls=second_balls,
+        )
+
+    def fixture(self, number, home, away):
+        return Match.objects.create(match_number=number, home_team=home, away_team=away,
+                                    date=timezone.now(), venue="Ground", umpires="Umpires")
+
+    def chances(self, **options):
+        return {team['team']: team for team in qualification.simulate(seed=1, **options)['teams']}
+
+    def test_remaining_fixture_decides_the_second_place(self):
+        first, second, third, fourth = self.teams
+        self.result(1, first, second, 150, 140)
+        self.fixture(2, third, fourth)
+
+        chances = self.chances(simulations=20_000)
+        self.assertEqual(chances[first.name]['qualify'], 1.0)
+        self.assertEqual(chances[second.name]['qualify'], 0.0)
+        self.assertAlmostEqual(chances[third.name]['qualify'] + chances[fourth.name]['qualify'], 1.0, places=3)
+        self.assertAlmostEqual(chances[third.name]['qualify'], 0.5, delta=0.02)
+        for team in chances.values():
+            self.assertAlmostEqual(sum(team['positions']), 1.0, places=3)
+
+    def test_level_points_are_split_on_net_run_rate(self):
+        first, second, third, fourth = self.teams
+        self.result(1, first, second, 150, 140)
+        self.result(2, third, fourth, 200, 100)
+
+        chances = self.chances(simulations=1000)
+        self.assertEqual(chances[third.name]['positions'], [1.0, 0.0, 0.0, 0.0])
+        self.assertEqual(chances[first.name]['positions'], [0.0, 1.0, 0.0, 0.0])
+        self.assertEqual(chances[second.name]['positions'], [0.0, 0.0, 1.0, 0.0])
+
+    def test_shards_add_up_to_every_simulation(self):
+        self.result(1, self.teams[0], self.teams[1], 150, 140)
+        self.fixture(2, self.teams[2], self.teams[3])
+        self.fixture(3, self.teams[0], self.teams[2])
+        _, data = qualification.league()
+
+        counts = qualification.run(data, 3001, workers=2, seed=1)
+        self.assertEqual(counts.sum(axis=1).tolist(), [3001] * 4)
+        self.assertEqual(counts.sum(axis=0).tolist(), [3001] * 4)
+
+    @override_settings(QUALIFICATION_SIMULATIONS=2000)
+    def test_reads_serve_the_last_result_and_never_simulate(self):
+        self.result(1, self.teams[0], self.teams[1], 150, 140)
+        fixture = self.fixture(2, self.teams[2], self.teams[3])
+
+        Team.objects.update(logo='team_logos/logo.png')
+        self.client.force_login(User.objects.create_user('fan', password='password'))
+        with mock.patch.object(qualification, 'refresh_later') as refresh_later, \
+                mock.patch.object(qualification, 'simulate', wraps=qualification.simulate) as simulate:
+            # Nothing until the first refresh
+            response = self.client.get('/standings/data/')
+            self.assertIsNone(response.json()['standings'][0]['qualification'])
+
+            qualification.refresh()
+            response = self.client.get('/standings/')
+            self.assertContains(response, 'Top 2')
+            self.assertContains(response, '100%')
+
+            # A completed match leaves the cached chances stale, but they are still served
+            Match.objects.filter(pk=fixture.pk).update(result='Home Win', first_score=120, second_score=100)
+            self.assertIsNone(qualification.current())
+            response = self.client.get('/standings/data/')
+            self.assertEqual(response.json()['standings'][0]['qualification']['qualify'], 1.0)
+        refresh_later.assert_not_called()
+        self.assertEqual(simulate.call_count, 1)
+
+    def test_a_live_match_is_not_a_fixture(self):
+        self.result(1, self.teams[0], self.teams[1], 150, 140)
+        self.fixture(2, self.teams[2], self.teams[3])
+        Match.objects.filter(pk=self.fixture(3, self.teams[0], self.teams[2]).pk).update(is_live=True)
+
+        _, data = qualification.league()
+        self.assertEqual((len(data['home']), len(data['away'])), (1, 1))
+
+    @override_settings(QUALIFICATION_SIMULATIONS=2000)
+    def test_refresh_command(self):
+        self.result(1, self.teams[0], self.teams[1], 150, 140)
+        out = StringIO()
+        call_command('refresh_qualification', stdout=out)
+        self.assertIn('2000 simulations for 4 teams', out.getvalue())
+        self.assertEqual(qualification.current(), qualification.latest())
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('qualification_benchmark', simulations=2000, max_workers=1, stdout=out)
+        self.assertIn('simulations/s', out.getvalue())
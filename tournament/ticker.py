@@ -0,0 +1,78 @@
+"""
+Ticker of every live match, for the home page.
+
+One LiveTickerConsumer socket follows all live matches. Each pushed frame
+also goes out as one compact item to the live_ticker group (once per
+update, however many viewers are subscribed) and each consumer passes on
+only the matches its client asked for.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+GROUP = 'live_ticker'
+
+# Last item sent per match, so frames that leave the ticker line alone are not repeated
+_items = {}
+
+
+def item(match):
+    """Score, wickets, overs and a one-line status for one match"""
+    batting = ''
+    if match.batting_team_id:
+        batting = match.batting_team.short_name or match.batting_team.name
+    if not match.is_live:
+        status = match.win_margin or match.result
+    elif match.innings == 2:
+        needed = match.first_score + 1 - match.total_runs
+        status = f"{batting} need {needed} more runs" if needed > 0 else f"{batting} have reached the target"
+    else:
+        status = f"{batting} batting first"
+    return {
+        'id': match.pk,
+        'live': match.is_live,
+        'batting': batting,
+        'runs': match.total_runs,
+        'wickets': match.total_wickets,
+        'overs': f"{match.current_over}.{match.current_ball}",
+        'status': status,
+    }
+
+
+def snapshot(match_ids=None):
+    """Items for the live matches, or just the given ones"""
+    from . import live
+    from .models import Match
+    matches = Match.objects.filter(is_live=True).select_related('batting_team').order_by('date')
+    if match_ids is not None:
+        matches = matches.filter(pk__in=match_ids)
+    items = []
+    for match in matches:
+        state = live.peek(match.pk)
+        if state is not None:
+            # Fresher than the row while deliveries are still written behind
+            with state.lock:
+                items.append(item(state.match))
+        else:
+            items.append(item(match))
+    return items
+
+
+def send(entry):
+    if _items.get(entry['id']) == entry:
+        return
+    _items[entry['id']] = entry
+    try:
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        async_to_sync(layer.group_send)(GROUP, {'type': 'ticker_update', 'item': entry})
+    except Exception:
+        logger.exception("Could not push ticker update for match %s", entry['id'])
+
+
+def forget_all():
+    _items.clear()
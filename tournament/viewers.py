@@ -0,0 +1,53 @@
+"""
+Signed viewer tokens for the live score websockets.
+
+AuthMiddlewareStack reads the session and user from the database for every
+connection, which turns a match going live into a burst of queries. Pages
+for viewers embed a short-lived token naming the group they may follow
+(see the viewer_token template tag), and ViewerAuthMiddlewareStack checks
+its signature without touching the database. Connections without a valid
+token, such as the scorer's, still go through the session.
+"""
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core import signing
+
+VIEWER_TOKEN_MAX_AGE = 3 * 60 * 60
+
+_signer = signing.TimestampSigner(salt='tournament.viewers')
+
+
+def token_for(group):
+    """A token that lets its holder follow one channel group"""
+    return _signer.sign(group)
+
+
+def verify(token):
+    """The group a token was issued for, or None if it is forged or expired"""
+    max_age = getattr(settings, 'LIVE_VIEWER_TOKEN_MAX_AGE', VIEWER_TOKEN_MAX_AGE)
+    try:
+        return _signer.unsign(token, max_age=max_age)
+    except signing.BadSignature:
+        return None
+
+
+class ViewerTokenMiddleware:
+    """Admits a connection on its token alone, or hands it to session auth"""
+
+    def __init__(self, inner):
+        self.inner = inner
+        self.session_auth = AuthMiddlewareStack(inner)
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        group = verify(query['token'][0]) if 'token' in query else None
+        if group is None:
+            return await self.session_auth(scope, receive, send)
+        return await self.inner(dict(scope, viewer=group, user=AnonymousUser()), receive, send)
+
+
+def ViewerAuthMiddlewareStack(inner):
+    return ViewerTokenMiddleware(inner)
@@ -1,14 +1,20 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, permission_required, user_passes_test
 from django.utils import timezone
-from .models import Team, Player, Match, BattingPerformance, BowlingPerformance, Ball
+from .models import Team, Player, Match, BattingPerformance, BowlingPerformance, Ball, PlayerCareerStats
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login, logout
-from django.http import JsonResponse
+from django.http import Http404, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q, F, Sum, Count
 from .forms import TossForm, TeamForm, PlayerForm
+from . import standings as standings_table
+from . import career
+from . import broadcast, exports, live, qualification, scorecard, scoring, stream, winprob
 from django.contrib import messages
-from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
 from django.views.decorators.cache import never_cache
 from django.contrib.auth import authenticate
 from django.db.models import Sum, Count,IntegerField
@@ -18,7 +24,6 @@ from django.db.models import Case, When, F, Value, FloatField
 from django.db.models.functions import Cast
 from django.shortcuts import render
 from django.db.models.functions import Coalesce
-import math
 
 
 from django.utils import timezone
@@ -28,78 +33,11 @@ def index(request):
     upcoming_matches = Match.objects.filter(date__gte=timezone.now(), is_live=False).order_by('date')[:5]
     recent_matches = Match.objects.filter(date__lt=timezone.now(), is_live=False).order_by('-date')[:5]
     
-    # Get top teams (first calculate standings)
-    for team in Team.objects.all():
-        # Get completed matches involving the team
-        matches = Match.objects.filter(
-            Q(home_team=team) | Q(away_team=team),
-            is_live=False,
-            date__lt=timezone.now()
-        )
-
-        total_matches = matches.count()
-        wins = 0
-        draws = 0
-
-        for match in matches:
-            # Determine scores
-            home = match.home_team
-            away = match.away_team
-            home_score = match.home_score
-            away_score = match.away_score
-
-            # Skip if scores are missing
-            if home_score is None or away_score is None:
-                continue
-
-            # Determine result
-            if home_score == away_score:
-                draws += 1
-            elif home_score > away_score and team == home:
-                wins += 1
-            elif away_score > home_score and team == away:
-                wins += 1
-
-        losses = total_matches - wins - draws
-        points = wins * 3 + draws
-
-        # Update team stats
-        team.total_matches = total_matches
-        team.wins = wins
-        team.losses = losses
-        team.draws = draws
-        team.points = points
-        team.save()
-
-    # Get top 2 teams
-    top_teams = Team.objects.all().order_by('-points', '-wins')[:2]
+    top_teams = standings_table.table()[:2]
     
-    # Get top 2 batsmen
-    top_batsmen = Player.objects.annotate(
-        total_runs_calc=Sum('batting_performances__runs'),
-        total_matches_bat=Count('batting_performances__match', distinct=True),
-        total_balls_faced_calc=Sum('batting_performances__balls_faced'),
-    ).annotate(
-        strike_rate_calc=Case(
-            When(total_balls_faced_calc=0, then=Value(0.0)),
-            default=Cast(F('total_runs_calc') * 100, FloatField()) / Cast(F('total_balls_faced_calc'), FloatField()),
-            output_field=FloatField()
-        )
-    ).filter(total_runs_calc__gt=0).order_by('-total_runs_calc')[:2]
-    
-    # Get top 2 bowlers
-    top_bowlers = Player.objects.annotate(
-        total_wickets_calc=Sum('bowling_performances__wickets'),
-        total_matches_bowl=Count('bowling_performances__match', distinct=True),
-        total_runs_conceded_calc=Sum('bowling_performances__runs_conceded'),
-        total_overs_bowled_calc=Sum('bowling_performances__overs'),
-    ).annotate(
-        bowling_avg=Case(
-            When(total_wickets_calc=0, then=Value(0.0)),
-            default=Cast(F('total_runs_conceded_calc'), FloatField()) / Cast(F('total_wickets_calc'), FloatField()),
-            output_field=FloatField()
-        )
-    ).filter(total_wickets_calc__gt=0).order_by('-total_wickets_calc')[:2]
+    # Get top 2 batsmen and bowlers
+    top_batsmen = PlayerCareerStats.objects.filter(runs__gt=0).select_related('player').order_by('-runs')[:2]
+    top_bowlers = PlayerCareerStats.objects.filter(wickets__gt=0).select_related('player').order_by('-wickets')[:2]
     
     context = {
         'live_matches': live_matches,
@@ -119,9 +57,10 @@ def team_list(request):
 @login_required
 def team_detail(request, team_id):
     team = get_object_or_404(Team, pk=team_id)
-    players = team.players.all().order_by('-role', 'name')
+    players = team.players.with_totals().order_by('-role', 'name')
     upcoming_matches = team.home_matches.filter(date__gte=timezone.now()) | team.away_matches.filter(date__gte=timezone.now())
     past_matches = team.home_matches.filter(date__lt=timezone.now()) | team.away_matches.filter(date__lt=timezone.now())
+    past_matches = past_matches.select_related('home_team', 'away_team')
     
     context = {
         'team': team,
@@ -133,7 +72,7 @@ def team_detail(request, team_id):
 
 @login_required
 def player_list(request):
-    players = Player.objects.all().order_by('team', 'name')
+    players = Player.objects.with_totals().select_related('team').order_by('team', 'name')
     return render(request, 'tournament/players.html', {'players': players})
 
 @login_required
@@ -171,51 +110,19 @@ def match_list(request):
     })
 
 def standings(request):
-    for team in Team.objects.all():
-        # Get completed matches involving the team
-        matches = Match.objects.filter(
-            Q(home_team=team) | Q(away_team=team),
-            is_live=False,
-            date__lt=timezone.now()
-        )
-
-        total_matches = matches.count()
-        wins = 0
-        draws = 0
-
-        for match in matches:
-            # Determine scores
-            home = match.home_team
-            away = match.away_team
-            home_score = match.home_score
-            away_score = match.away_score
-
-            # Skip if scores are missing
-            if home_score is None or away_score is None:
-                continue
-
-            # Determine result
-            if home_score == away_score:
-                draws += 1
-            elif home_score > away_score and team == home:
-                wins += 1
-            elif away_score > home_score and team == away:
-                wins += 1
-
-        losses = total_matches - wins - draws
-        points = wins * 3 + draws
-
-        # Update team stats
-        team.total_matches = total_matches
-        team.wins = wins
-        team.losses = losses
-        team.draws = draws
-        team.points = points
-        team.save()
+    table = standings_table.table()
+    chances = qualification.by_team()
+    return render(request, 'tournament/standings.html', {
+        'standings': [(row, chances.get(row.team.id)) for row in table],
+        'qualifying_places': getattr(settings, 'QUALIFICATION_PLACES', qualification.PLACES),
+    })
 
-    # Order standings
-    teams = Team.objects.all().order_by('-points', '-wins')
-    return render(request, 'tournament/standings.html', {'standings': teams})
+def standings_data(request):
+    table = standings_table.table()
+    chances = qualification.by_team()
+    return JsonResponse({'standings': [
+        dict(row.as_dict(), qualification=chances.get(row.team.id)) for row in table
+    ]})
 
 def register(request):
     if request.method == 'POST':
@@ -259,67 +166,14 @@ def custom_logout(request):
 @login_required
 def player_stats(request):
     # Batting stats - Cricbuzz-style: most runs on top
-    batting_stats = Player.objects.annotate(
-        total_runs_calc=Sum('batting_performances__runs'),
-        total_matches_bat=Count('batting_performances__match', distinct=True),
-        total_fours_calc=Sum('batting_performances__fours'),
-        total_sixes_calc=Sum('batting_performances__sixes'),
-        total_balls_faced_calc=Sum('batting_performances__balls_faced'),
-        fifties_count=Count(
-            Case(
-                When(batting_performances__runs__gte=50, batting_performances__runs__lt=100, then=1),
-                output_field=IntegerField()
-            )
-        ),
-        centuries_count=Count(
-            Case(
-                When(batting_performances__runs__gte=100, then=1),
-                output_field=IntegerField()
-            )
-        ),
-        dismissals_count=Count(
-            Case(
-                When(batting_performances__not_out=False, then=1),
-                output_field=IntegerField()
-            )
-        )
-    ).annotate(
-        batting_avg=Case(
-            When(dismissals_count=0, then=Value(0.0)),
-            default=Cast(F('total_runs_calc'), FloatField()) / Cast(F('dismissals_count'), FloatField()),
-            output_field=FloatField()
-        ),
-        strike_rate_calc=Case(
-            When(total_balls_faced_calc=0, then=Value(0.0)),
-            default=Cast(F('total_runs_calc') * 100, FloatField()) / Cast(F('total_balls_faced_calc'), FloatField()),
-            output_field=FloatField()
-        )
-    ).filter(total_runs_calc__gt=0).order_by('-total_runs_calc')
+    batting_stats = PlayerCareerStats.objects.filter(
+        runs__gt=0
+    ).select_related('player__team').order_by('-runs')
 
     # Bowling stats - Cricbuzz-style: most wickets on top
-    bowling_stats = Player.objects.annotate(
-        total_wickets_calc=Sum('bowling_performances__wickets'),
-        total_matches_bowl=Count('bowling_performances__match', distinct=True),
-        total_runs_conceded_calc=Sum('bowling_performances__runs_conceded'),
-        total_overs_bowled_calc=Sum('bowling_performances__overs'),
-        five_wickets_count=Count(
-            Case(
-                When(bowling_performances__wickets__gte=5, then=1),
-                output_field=IntegerField()
-            )
-        )
-    ).annotate(
-        bowling_avg=Case(
-            When(total_wickets_calc=0, then=Value(0.0)),
-            default=Cast(F('total_runs_conceded_calc'), FloatField()) / Cast(F('total_wickets_calc'), FloatField()),
-            output_field=FloatField()
-        ),
-        economy_rate_calc=Case(
-            When(total_overs_bowled_calc=0, then=Value(0.0)),
-            default=Cast(F('total_runs_conceded_calc'), FloatField()) / Cast(F('total_overs_bowled_calc'), FloatField()),
-            output_field=FloatField()
-        )
-    ).filter(total_wickets_calc__gt=0).order_by('-total_wickets_calc')
+    bowling_stats = PlayerCareerStats.objects.filter(
+        wickets__gt=0
+    ).select_related('player__team').order_by('-wickets')
 
     return render(request, 'tournament/player_stats.html', {
         'batting_stats': batting_stats,
@@ -329,6 +183,7 @@ def player_stats(request):
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def set_match_live(request, match_id):
+    live.release(match_id)
     match = get_object_or_404(Match, id=match_id)
     
     if request.method == 'POST':
@@ -352,6 +207,7 @@ def set_match_live(request, match_id):
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def initialize_match_players(request, match_id):
+    live.release(match_id)
     match = get_object_or_404(Match, id=match_id)
     
     if not match.batting_team or not match.bowling_team:
@@ -380,6 +236,7 @@ def initialize_match_players(request, match_id):
                         sixes=0,
                         not_out=True
                     )
+                career.batting_innings_started(match.striker.id)
                 match.striker_runs = 0
                 match.striker_balls = 0
                 match.striker_fours = 0
@@ -396,6 +253,7 @@ def initialize_match_players(request, match_id):
                         sixes=0,
                         not_out=True
                     )
+                career.batting_innings_started(match.non_striker.id)
                 match.non_striker_runs = 0
                 match.non_striker_balls = 0
                 match.non_striker_fours = 0
@@ -412,6 +270,7 @@ def initialize_match_players(request, match_id):
                         maidens=0,
                         economy=0,
                     ) 
+                career.bowling_innings_started(match.bowler.id)
 
                 match.bowler_runs = 0
                 match.bowler_wickets = 0
@@ -419,6 +278,7 @@ def initialize_match_players(request, match_id):
                 match.bowler_wides = 0
                 match.bowler_no_balls = 0
             match.save()
+            broadcast.publish(match)
             return redirect('update_score', match_id=match.id)
         except Exception as e:
             messages.error(request, f"Error setting players: {str(e)}")
@@ -430,41 +290,101 @@ def initialize_match_players(request, match_id):
     })
 
 def live_match_data(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
-    return JsonResponse({
-        'total_runs': match.total_runs,
-        'total_wickets': match.total_wickets,
-        'current_over': f"{match.current_over}.{match.current_ball}",
-        'striker': match.striker.name if match.striker else '',
-        'striker_runs': match.striker_runs,
-        'striker_balls': match.striker_balls,
-        'non_striker': match.non_striker.name if match.non_striker else '',
-        'non_striker_runs': match.non_striker_runs,
-        'non_striker_balls': match.non_striker_balls,
-        'bowler': match.bowler.name if match.bowler else '',
-        'bowler_runs': match.bowler_runs,
-        'bowler_wickets': match.bowler_wickets,
-        'bowler_overs': (match.bowler_balls // 6),
-    })
+    # A poller that already has the last pushed score is answered without the match
+    etag = broadcast.version(match_id)
+    response = get_conditional_response(request, etag=etag) if etag else None
+    if response is None:
+        state = live.peek(match_id)
+        if state is not None:
+            # This process is scoring the match, so answer from memory
+            with state.lock:
+                response = JsonResponse(broadcast.scoreboard(state.match))
+        else:
+            match = get_object_or_404(Match.objects.select_related('striker', 'non_striker', 'bowler'), id=match_id)
+            response = JsonResponse(broadcast.scoreboard(match))
+    if etag:
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+    return response
+
+
+async def match_stream(request, match_id):
+    """Server-sent events with the same live score updates as the match websocket"""
+    if not await Match.objects.filter(pk=match_id).aexists():
+        raise Http404("No Match matches the given query.")
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    response = StreamingHttpResponse(stream.events(match_id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def match_overs(request, match_id):
+    """Runs per over and the running score of both innings, for the Manhattan and worm charts"""
+    etag = broadcast.version(match_id)
+    response = get_conditional_response(request, etag=etag) if etag else None
+    if response is None:
+        state = live.peek(match_id)
+        if state is not None:
+            # The over being bowled may not be written yet
+            with state.lock:
+                current = scorecard.over_in_progress(state.match)
+        else:
+            match = get_object_or_404(Match.objects.only(
+                'is_live', 'innings', 'current_over', 'current_ball', 'total_runs', 'total_wickets',
+                'over_runs', 'over_wickets', 'over_extras',
+            ), id=match_id)
+            current = scorecard.over_in_progress(match)
+        response = JsonResponse(scorecard.over_series(match_id, current))
+    if etag:
+        response['ETag'] = etag
+        patch_cache_control(response, no_cache=True)
+    return response
+
 
 def match_performances(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
-    
-    batting_performances = BattingPerformance.objects.filter(match=match).select_related('player', 'bowler')
-    bowling_performances = BowlingPerformance.objects.filter(match=match).select_related('player')
-    
-    batting_html = render_to_string('tournament/_batting_table.html', {
-        'batting_performances': batting_performances
-    })
-    
-    bowling_html = render_to_string('tournament/_bowling_table.html', {
-        'bowling_performances': bowling_performances
-    })
-    
-    return JsonResponse({
-        'batting_html': batting_html,
-        'bowling_html': bowling_html
-    })
+    innings, data_version = scorecard.version(match_id)
+    etag = scorecard.etag(match_id, innings, data_version)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        batting_html, bowling_html = scorecard.fragments(match_id, innings, data_version)
+        response = JsonResponse({
+            'batting_html': batting_html,
+            'bowling_html': bowling_html
+        })
+    response['ETag'] = etag
+    # Let browsers keep the tables but revalidate them on every poll
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@login_required
+async def export(request, dataset, fmt):
+    """
+    A dataset as CSV or JSON lines, streamed as it is read.
+
+    ?season=, ?team= (an id), ?from= and ?to= (YYYY-MM-DD) narrow the rows.
+    """
+    if dataset not in exports.DATASETS or fmt not in exports.FORMATS:
+        raise Http404("No such export.")
+    filters = {}
+    try:
+        for param, name, parse in (('season', 'season', int), ('team', 'team', int),
+                                   ('from', 'start', parse_date), ('to', 'end', parse_date)):
+            if request.GET.get(param):
+                filters[name] = parse(request.GET[param])
+                if filters[name] is None:
+                    raise ValueError(param)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid export filter.")
+    response = StreamingHttpResponse(
+        exports.stream(exports.lines(dataset, fmt, **filters)),
+        content_type=exports.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{fmt}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 @never_cache
 def landing(request):
@@ -494,23 +414,21 @@ def login_view(request):
 @login_required
 
 def match_detail(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
+    match = get_object_or_404(Match.objects.select_related(
+        'home_team', 'away_team', 'batting_team', 'bowling_team', 'toss_winner',
+        'man_of_the_match', 'striker', 'non_striker', 'bowler',
+    ), id=match_id)
+    card = scorecard.build(match)
 
-    
-    
     # First innings data
-    first_innings_batting = BattingPerformance.objects.filter(
-        match=match, innings=1
-    ).select_related('player', 'bowler').order_by('-runs')
-    
-    first_innings_bowling = BowlingPerformance.objects.filter(
-        match=match, innings=1
-    ).select_related('player').order_by('-wickets')
-    
-    first_innings_total = first_innings_batting.aggregate(
-        Sum('runs'), Sum('balls_faced'), Sum('fours'), Sum('sixes'))
-    first_innings_wickets = first_innings_batting.filter(not_out=False).count()
-    
+    first_innings = card[1]
+    first_innings_batting = first_innings.batting
+    first_innings_bowling = first_innings.bowling
+    first_innings_total = first_innings.total
+    first_innings_wickets = first_innings.wickets
+    first_innings_falls = first_innings.falls
+    first_innings_partnerships = first_innings.partnerships
+
     first_innings_team = match.batting_team if match.innings == 2 else match.home_team
     first_innings_bowling_team = match.bowling_team if match.innings == 2 else match.away_team
     
@@ -519,21 +437,19 @@ def match_detail(request, match_id):
     second_innings_bowling = None
     second_innings_total = None
     second_innings_wickets = None
+    second_innings_falls = None
+    second_innings_partnerships = None
     second_innings_team = None
     second_innings_bowling_team = None
     
     if match.innings > 1 or match.status == 'COMPLETED':
-        second_innings_batting = BattingPerformance.objects.filter(
-            match=match, innings=2
-        ).select_related('player', 'bowler').order_by('-runs')
-        
-        second_innings_bowling = BowlingPerformance.objects.filter(
-            match=match, innings=2
-        ).select_related('player').order_by('-wickets')
-        
-        second_innings_total = second_innings_batting.aggregate(
-            Sum('runs'), Sum('balls_faced'), Sum('fours'), Sum('sixes'))
-        second_innings_wickets = second_innings_batting.filter(not_out=False).count()
+        second_innings = card[2]
+        second_innings_batting = second_innings.batting
+        second_innings_bowling = second_innings.bowling
+        second_innings_total = second_innings.total
+        second_innings_wickets = second_innings.wickets
+        second_innings_falls = second_innings.falls
+        second_innings_partnerships = second_innings.partnerships
         
         second_innings_team = match.batting_team if match.innings == 1 else match.away_team
         second_innings_bowling_team = match.bowling_team if match.innings == 1 else match.home_team
@@ -554,15 +470,20 @@ def match_detail(request, match_id):
         'first_innings_bowling': first_innings_bowling,
         'first_innings_total': first_innings_total,
         'first_innings_wickets': first_innings_wickets,
+        'first_innings_falls': first_innings_falls,
+        'first_innings_partnerships': first_innings_partnerships,
         'first_innings_team': first_innings_team,
         'first_innings_bowling_team': first_innings_bowling_team,
         'second_innings_batting': second_innings_batting,
         'second_innings_bowling': second_innings_bowling,
         'second_innings_total': second_innings_total,
         'second_innings_wickets': second_innings_wickets,
+        'second_innings_falls': second_innings_falls,
+        'second_innings_partnerships': second_innings_partnerships,
         'second_innings_team': second_innings_team,
         'second_innings_bowling_team': second_innings_bowling_team,
         'target': target,
+        'win_probability': winprob.for_match(match),
     }
     
     return render(request, 'tournament/match_detail.html', context)
@@ -570,6 +491,7 @@ def match_detail(request, match_id):
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def start_second_innings(request, match_id):
+    live.release(match_id)
     match = get_object_or_404(Match, id=match_id)
     
     # Check if we can start second innings
@@ -581,6 +503,8 @@ def start_second_innings(request, match_id):
 
     if first_innings_completed:  
         # Switch innings
+        scoring.finish_innings(match)
+        match.record_innings_total()
         match.innings = 2
         match.batting_team, match.bowling_team = match.bowling_team, match.batting_team
         
@@ -605,8 +529,14 @@ def start_second_innings(request, match_id):
         match.bowler_balls = 0
         match.bowler_wides = 0
         match.bowler_no_balls = 0
+        match.partnership_runs = 0
+        match.partnership_balls = 0
+        match.over_runs = 0
+        match.over_wickets = 0
+        match.over_extras = 0
         
         match.save()
+        broadcast.publish(match)
         
         messages.success(request, "Second innings started successfully!")
         return redirect('initialize_match_players', match_id=match.id)
@@ -614,65 +544,35 @@ def start_second_innings(request, match_id):
         messages.error(request, "Cannot start second innings at this time. First innings must be completed.")
         return redirect('match_detail', match_id=match_id)
     
+# update_score actions that are served from the live state
+LIVE_ACTIONS = {'add_runs', 'add_wide', 'add_noball', 'add_wicket', 'complete_over'}
+WICKET_TYPES = {value for value, _ in Ball._meta.get_field('wicket_type').choices}
+
+
 @login_required
 @user_passes_test(lambda u: u.is_superuser)
 def update_score(request, match_id):
-    match = get_object_or_404(Match, id=match_id)
+    action = request.POST.get('action') if request.method == 'POST' else None
+    if action in LIVE_ACTIONS:
+        # Deliveries are scored against the in-memory state and written behind
+        try:
+            state = live.get(match_id)
+        except Match.DoesNotExist:
+            raise Http404("No Match matches the given query.")
+        match = state.match
+    else:
+        # Everything else reads and saves the whole match row, so pending state goes first
+        live.release(match_id)
+        match = get_object_or_404(Match, id=match_id)
     
     if request.method == 'POST':
-        action = request.POST.get('action')
         
         try:
             # Add Runs
             if action == 'add_runs':
                 runs = int(request.POST.get('runs', 0))
-                match.total_runs += runs
-                match.striker_runs += runs
-                match.striker_balls += 1
-                striker_performance = BattingPerformance.objects.get(
-                    player=match.striker,
-                    match=match,
-                    )
-                bowler_performance = BowlingPerformance.objects.get(
-                    player=match.bowler,
-                    match=match,
-                    )
-                bowler_performance.runs_conceded += runs
-                bowler_performance.overs += 0.1
-                econ_overs=bowler_performance.overs//1
-                econ_temp=math.floor(bowler_performance.overs)
-                econ_balls=bowler_performance.overs-econ_temp
-                t_balls=((econ_overs*6)+econ_balls*10)
-                if t_balls!=0: 
-                    bowler_performance.economy = round((bowler_performance.runs_conceded / t_balls) * 6, 2)
-                bowler_performance.save()
-                striker_performance.runs += runs
-                striker_performance.balls_faced += 1
-                # Update boundaries
-                if runs == 4:
-                    match.striker_fours += 1
-                    striker_performance.fours += 1
-                elif runs == 6:
-                    match.striker_sixes += 1
-                    striker_performance.sixes += 1
-                
-                match.bowler_runs += runs
-                match.bowler_balls += 1
-                striker_performance.save()
-                
-                # Rotate strike for odd runs
-                if runs % 2 != 0:
-                    match.striker, match.non_striker = match.non_striker, match.striker
-                    match.striker_runs, match.non_striker_runs = match.non_striker_runs, match.striker_runs
-                    match.striker_balls, match.non_striker_balls = match.non_striker_balls, match.striker_balls
-                    match.striker_fours, match.non_striker_fours = match.non_striker_fours, match.striker_fours
-                    match.striker_sixes, match.non_striker_sixes = match.non_striker_sixes, match.striker_sixes
-                
-                match.current_ball += 1
-                crr_balls=match.current_over*6+match.current_ball
-                match.current_run_rate=round((match.total_runs/crr_balls)*6,2)
-                match.save()
-                
+                state.record(runs=runs)
+
                 return JsonResponse({
                     'status': 'success',
                     'total_runs': match.total_runs,
@@ -695,24 +595,7 @@ def update_score(request, match_id):
             
             # Add Wide
             elif action == 'add_wide':
-                match.total_runs += 1
-                match.bowler_runs += 1
-                match.bowler_wides += 1
-                crr_balls=match.current_over*6+match.current_ball
-                match.current_run_rate=round((match.total_runs/crr_balls)*6,2)
-                match.save()
-                bowler_performance = BowlingPerformance.objects.get(
-                    player=match.bowler,
-                    match=match,
-                    )
-                bowler_performance.runs_conceded += 1
-                econ_overs=bowler_performance.overs//1
-                econ_temp=math.floor(bowler_performance.overs)
-                econ_balls=bowler_performance.overs-econ_temp
-                t_balls=((econ_overs*6)+econ_balls*10)
-                if t_balls!=0: 
-                    bowler_performance.economy = round((bowler_performance.runs_conceded / t_balls) * 6, 2)
-                bowler_performance.save()
+                state.record(runs=1, extras=scoring.WIDE)
                 
                 return JsonResponse({
                     'status': 'success',
@@ -722,24 +605,7 @@ def update_score(request, match_id):
             
             # Add No Ball
             elif action == 'add_noball':
-                match.total_runs += 1
-                match.bowler_runs += 1
-                match.bowler_no_balls += 1
-                crr_balls=match.current_over*6+match.current_ball
-                match.current_run_rate=round((match.total_runs/crr_balls)*6,2)
-                match.save()
-                bowler_performance = BowlingPerformance.objects.get(
-                    player=match.bowler,
-                    match=match,
-                    )
-                bowler_performance.runs_conceded += 1
-                econ_overs=bowler_performance.overs//1
-                econ_temp=math.floor(bowler_performance.overs)
-                econ_balls=bowler_performance.overs-econ_temp
-                t_balls=((econ_overs*6)+econ_balls*10)
-                if t_balls!=0: 
-                    bowler_performance.economy = round((bowler_performance.runs_conceded / t_balls) * 6, 2)
-                bowler_performance.save()
+                state.record(runs=1, extras=scoring.NO_BALL)
                 return JsonResponse({
                     'status': 'success',
                     'total_runs': match.total_runs,
@@ -749,52 +615,11 @@ def update_score(request, match_id):
             # Add Wicket
             elif action == 'add_wicket':
                 wicket_type = request.POST.get('wicket_type', 'bowled')
+                if wicket_type not in WICKET_TYPES:
+                    # An empty type would be logged as a ball with no wicket
+                    return JsonResponse({'status': 'error', 'message': 'Invalid wicket type'}, status=400)
                 out_player = request.POST.get('out_player', 'striker')
-                
-                # Update match stats
-                match.total_wickets += 1
-                match.bowler_wickets += 1
-                match.current_ball += 1
-                crr_balls=match.current_over*6+match.current_ball
-                match.current_run_rate=round((match.total_runs/crr_balls)*6,2)
-                striker_performance = BattingPerformance.objects.get(
-                    player=match.striker,
-                    match=match,
-                    )
-                striker_performance.balls_faced += 1
-                striker_performance.not_out = False
-                bowler_performance = BowlingPerformance.objects.get(
-                    player=match.bowler,
-                    match=match,
-                    )
-                striker_performance.not_out = False
-                bowler_performance.wickets += 1
-                bowler_performance.overs += 0.1
-                econ_overs=bowler_performance.overs//1
-                econ_temp=math.floor(bowler_performance.overs)
-                econ_balls=bowler_performance.overs-econ_temp
-                t_balls=((econ_overs*6)+econ_balls*10)
-                if t_balls!=0: 
-                    bowler_performance.economy = round((bowler_performance.runs_conceded / t_balls) * 6, 2)
-                bowler_performance.save()
-                match.save()
-                
-                
-                # Clear batsman position
-                if out_player == 'striker':
-                    match.striker = None
-                    match.striker_runs = 0
-                    match.striker_balls = 0
-                    match.striker_fours = 0
-                    match.striker_sixes = 0
-                else:
-                    match.non_striker = None
-                    match.non_striker_runs = 0
-                    match.non_striker_balls = 0
-                    match.non_striker_fours = 0
-                    match.non_striker_sixes = 0
-                
-                match.save()
+                state.record(wicket_type=wicket_type, out_player=out_player)
                 
                 # Get available batsmen
                 batting_team = match.batting_team
@@ -807,8 +632,7 @@ def update_score(request, match_id):
                 available_batsmen = batting_team.players.exclude(
                     id__in=out_batsmen
                 ).exclude(
-                    id__in=[match.striker.id if match.striker else 0, 
-                           match.non_striker.id if match.non_striker else 0]
+                    id__in=[match.striker_id or 0, match.non_striker_id or 0]
                 )
                 
                 return JsonResponse({
@@ -820,39 +644,10 @@ def update_score(request, match_id):
             
             # Complete Over
             elif action == 'complete_over':
-
-
-                bowler_performance = BowlingPerformance.objects.get(
-                    player=match.bowler,
-                    match=match,
-                    )
-                if(match.bowler_runs==0):
-                    bowler_performance.maidens += 1
-                bowler_performance.overs = math.ceil(bowler_performance.overs)
-                bowler_performance.save()
-                
-                # Reset bowler stats
-                match.bowler_runs = 0
-                match.bowler_wickets = 0
-                match.bowler_balls = 0
-                match.bowler_wides = 0
-                match.bowler_no_balls = 0
-                
-                # Rotate strike
-                if match.striker and match.non_striker:
-                    match.striker, match.non_striker = match.non_striker, match.striker
-                    match.striker_runs, match.non_striker_runs = match.non_striker_runs, match.striker_runs
-                    match.striker_balls, match.non_striker_balls = match.non_striker_balls, match.striker_balls
-                    match.striker_fours, match.non_striker_fours = match.non_striker_fours, match.striker_fours
-                    match.striker_sixes, match.non_striker_sixes = match.non_striker_sixes, match.striker_sixes
-                
-                # Update over count
-                match.current_ball = 0
-                match.current_over += 1
-                match.save()
+                state.complete_over()
                 
                 # Get available bowlers
-                available_bowlers = match.bowling_team.players.exclude(id=match.bowler.id if match.bowler else 0)
+                available_bowlers = match.bowling_team.players.exclude(id=match.bowler_id or 0)
                 
                 return JsonResponse({
                     'status': 'success',
@@ -865,6 +660,8 @@ def update_score(request, match_id):
             elif action == 'complete_innings':                
                 # Switch innings if first innings
                 if match.innings == 1:
+                    scoring.finish_innings(match)
+                    match.record_innings_total()
                     match.innings = 2
                     match.batting_team, match.bowling_team = match.bowling_team, match.batting_team
                     
@@ -890,8 +687,14 @@ def update_score(request, match_id):
                     match.bowler_balls = 0
                     match.bowler_wides = 0
                     match.bowler_no_balls = 0
+                    match.partnership_runs = 0
+                    match.partnership_balls = 0
+                    match.over_runs = 0
+                    match.over_wickets = 0
+                    match.over_extras = 0
                     
                     match.save()
+                    broadcast.publish(match)
                     
                     return JsonResponse({
                         'status': 'success',
@@ -903,71 +706,39 @@ def update_score(request, match_id):
                 
                 # Complete match if second innings
                 else:
-                    match.is_live = False
                     match.status = 'COMPLETED'
-                    
-                    # Determine winner
-                    first_innings_runs = BattingPerformance.objects.filter(
-                        match=match, innings=1
-                    ).aggregate(total=Sum('runs'))['total'] or 0
-                    
-                    second_innings_runs = BattingPerformance.objects.filter(
-                        match=match, innings=2
-                    ).aggregate(total=Sum('runs'))['total'] or 0
-                    
-                    if first_innings_runs > second_innings_runs:
-                        match.winner = match.bowling_team
-                        match.result = f"{match.winner.name} won by {first_innings_runs - second_innings_runs} runs"
-                    elif second_innings_runs > first_innings_runs:
-                        match.winner = match.batting_team
-                        wickets_left = 10 - match.total_wickets
-                        match.result = f"{match.winner.name} won by {wickets_left} wickets"
-                    else:
-                        match.result = "Match tied"
-                    
+                    scoring.finish_innings(match)
+                    match.decide_result()
+                    if standings_table.record_result(match):
+                        transaction.on_commit(qualification.refresh_later)
+                    transaction.on_commit(winprob.refresh_later)
+                    match.is_live = False
                     match.save()
+                    broadcast.publish(match)
                     
                     return JsonResponse({
                         'status': 'success',
                         'message': 'Match completed',
-                        'result': match.result,
+                        'result': match.win_margin,
                         'winner': match.winner.name if match.winner else None
                     })
             
             # Complete Match
             elif action == 'complete_match':
-                match.is_live = False
                 match.status = 'COMPLETED'
-                
-                
-                # Determine result
-                if match.innings == 1:
-                    match.result = "Match abandoned after first innings"
-                else:
-                    first_innings_runs = BattingPerformance.objects.filter(
-                        match=match, innings=1
-                    ).aggregate(total=Sum('runs'))['total'] or 0
-                    
-                    second_innings_runs = BattingPerformance.objects.filter(
-                        match=match, innings=2
-                    ).aggregate(total=Sum('runs'))['total'] or 0
-                    
-                    if first_innings_runs > second_innings_runs:
-                        match.winner = match.bowling_team
-                        match.result = f"{match.winner.name} won by {first_innings_runs - second_innings_runs} runs"
-                    elif second_innings_runs > first_innings_runs:
-                        match.winner = match.batting_team
-                        wickets_left = 10 - match.total_wickets
-                        match.result = f"{match.winner.name} won by {wickets_left} wickets"
-                    else:
-                        match.result = "Match tied"
-                
+                scoring.finish_innings(match)
+                match.decide_result()
+                if standings_table.record_result(match):
+                    transaction.on_commit(qualification.refresh_later)
+                transaction.on_commit(winprob.refresh_later)
+                match.is_live = False
                 match.save()
+                broadcast.publish(match)
                 
                 return JsonResponse({
                     'status': 'success',
                     'message': 'Match completed',
-                    'result': match.result,
+                    'result': match.win_margin,
                     'winner': match.winner.name if match.winner else None
                 })
             
@@ -987,6 +758,7 @@ def update_score(request, match_id):
                         sixes=0,
                         not_out=True
                     )
+                career.batting_innings_started(new_batsman.id)
                 
                 if position == 'striker':
                     match.striker = new_batsman
@@ -1002,6 +774,7 @@ def update_score(request, match_id):
                     match.non_striker_sixes = 0
                 
                 match.save()
+                broadcast.publish(match)
                 
                 return JsonResponse({
                     'status': 'success',
@@ -1041,6 +814,7 @@ def update_score(request, match_id):
                         maidens=0,
                         economy=0,
                     )
+                    career.bowling_innings_started(new_bowler.id)
                     created = True
                 match.bowler_runs = 0
                 match.bowler_wickets = 0
@@ -1048,6 +822,7 @@ def update_score(request, match_id):
                 match.bowler_wides = 0
                 match.bowler_no_balls = 0
                 match.save()
+                broadcast.publish(match)
                 
                 return JsonResponse({
                     'status': 'success',
@@ -1105,6 +880,7 @@ def update_score(request, match_id):
         'all_players': Player.objects.filter(
             Q(team=match.home_team) | Q(team=match.away_team)
         ),
+        'win_probability': winprob.for_match(match),
     }
     
     return render(request, 'tournament/update_score.html', context)
\ No newline at end of file
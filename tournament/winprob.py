@@ -0,0 +1,229 @@
+"""
+Win probability of the side chasing in the second innings.
+
+The chance of a chase succeeding depends on the runs needed, the balls
+left and the wickets in hand, so it is tabulated over all of them once and
+every delivery after that is a single array lookup.
+
+The table is fitted from the second innings of finished matches. Their
+balls are read once into NumPy arrays and the state each delivery was
+bowled in is worked out with cumulative sums, per match. A logistic
+regression over the required rate, wickets in hand and balls left gives a
+smooth estimate for every state, pulled towards PRIOR when there is little
+history. Each cell then blends that estimate with how chases actually
+went from that state, weighted by how often it was seen.
+
+The table is fitted in a background thread (fit_later()), started by the
+first request a server process takes (see apps.py) and again whenever a
+match is completed (refresh_later()), so
+a live score is never held up by a fit: until the table is ready the
+probability is left out. table() fits in the caller, for commands and tests.
+"""
+import logging
+import threading
+
+import numpy as np
+from django.db import connection
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+
+from .models import Ball, Match
+from .scoring import NO_BALL, WIDE
+
+logger = logging.getLogger(__name__)
+
+MAX_BALLS = 120
+MAX_RUNS = 300
+WICKETS = 10
+
+# Logistic coefficients of (1, runs needed per ball, share of the wickets in hand, share of the balls left)
+# used before there is any history, and what the fit is held towards after
+PRIOR = np.array([1.0, -3.0, 3.5, 0.0])
+PRIOR_STRENGTH = 50.0
+# How many times a state has to have been seen before its own record outweighs the model
+CELL_WEIGHT = 20.0
+ITERATIONS = 25
+
+_table = None
+# Bumped by forget(), so a fit that read the matches before it is not kept
+_generation = 0
+_lock = threading.Lock()
+_fitting = threading.Lock()
+
+
+def table():
+    """Chance of the chase succeeding, indexed by [balls left, runs needed, wickets in hand]"""
+    global _table
+    if _table is None:
+        with _lock:
+            if _table is None:
+                _table = fit(*history())
+    return _table
+
+
+def forget():
+    global _table, _generation
+    with _lock:
+        _table = None
+        _generation += 1
+
+
+def fit_later():
+    """Fit the table in a background thread, unless one is already running; returns whether one was started"""
+    if not _fitting.acquire(blocking=False):
+        return False
+
+    def work():
+        global _table
+        try:
+            while _table is None:
+                generation = _generation
+                fitted = fit(*history())
+                with _lock:
+                    if generation == _generation:
+                        _table = fitted
+        except Exception:
+            logger.exception("Could not fit the win probability table")
+        finally:
+            connection.close()
+            _fitting.release()
+
+    threading.Thread(target=work, name='winprob', daemon=True).start()
+    return True
+
+
+def refresh_later():
+    """Drop the table and fit it again from the matches as they now stand"""
+    forget()
+    return fit_later()
+
+
+def chance(runs_needed, balls_left, wickets_in_hand):
+    """Chance, from 0 to 1, that a side chasing from this position wins"""
+    return _lookup(table(), runs_needed, balls_left, wickets_in_hand)
+
+
+def _lookup(probabilities, runs_needed, balls_left, wickets_in_hand):
+    if runs_needed <= 0:
+        return 1.0
+    if balls_left <= 0 or wickets_in_hand <= 0:
+        return 0.0
+    return float(probabilities[min(balls_left, MAX_BALLS), min(runs_needed, MAX_RUNS), min(wickets_in_hand, WICKETS)])
+
+
+def for_match(match):
+    """
+    The chasing side's chance as a whole percentage, or None outside a live second innings.
+
+    The balls left are counted from the match's own innings length, its
+    balls_remaining as set up; innings longer than the table covers get
+    None, as does every match while the table is still being fitted.
+    """
+    if not match.is_live or match.innings != 2 or not 0 < match.balls_remaining <= MAX_BALLS:
+        return None
+    probabilities = _table
+    if probabilities is None:
+        return None
+    return round(100 * _lookup(
+        probabilities,
+        match.first_score + 1 - match.total_runs,
+        match.balls_remaining - (match.current_over * 6 + match.current_ball),
+        WICKETS - match.total_wickets,
+    ))
+
+
+def history():
+    """
+    The state before every second innings delivery of a finished match, and how the chase ended.
+
+    Returns arrays of runs needed, balls left, wickets in hand and the result
+    for the chasing side: 1 for a win, 0 for a loss, a half for a tie.
+    """
+    finished = Match.objects.filter(
+        is_live=False, innings=2, result__in=('Home Win', 'Away Win', 'Draw'),
+        # Each chase starts from its own innings length, as long as the table covers it
+        balls_remaining__gt=0, balls_remaining__lte=MAX_BALLS,
+        first_balls__lte=F('balls_remaining'), second_balls__lte=F('balls_remaining'),
+    )
+    matches = np.array(
+        list(finished.order_by('id').values_list('id', 'first_score', 'second_score', 'balls_remaining')),
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    balls = np.array(
+        list(Ball.objects.filter(match__in=finished, innings=2).order_by('match', 'id').values_list(
+            'match_id', F('runs') + F('extra_runs'), 'is_wicket', ExpressionWrapper(~Q(extras__in=(WIDE, NO_BALL)), BooleanField()),
+        )),
+        dtype=np.int64,
+    ).reshape(-1, 4)
+    match_ids, runs, wickets, legal = balls.T
+
+    # Running totals before each ball, started afresh at each match's first ball
+    starts = np.flatnonzero(np.r_[True, match_ids[1:] != match_ids[:-1]]) if len(balls) else np.array([], int)
+    lengths = np.diff(np.r_[starts, len(balls)])
+
+    def before(values):
+        total = np.cumsum(values) - values
+        return total - np.repeat(total[starts], lengths)
+
+    which = np.searchsorted(matches[:, 0], match_ids)
+    first, second, length = matches[which, 1], matches[which, 2], matches[which, 3]
+    needed = first + 1 - before(runs)
+    left = length - before(legal)
+    in_hand = WICKETS - before(wickets)
+    result = np.where(second > first, 1.0, np.where(second == first, 0.5, 0.0))
+
+    playing = (needed > 0) & (left > 0) & (in_hand > 0)
+    return (
+        np.minimum(needed[playing], MAX_RUNS),
+        np.minimum(left[playing], MAX_BALLS),
+        in_hand[playing],
+        result[playing],
+    )
+
+
+def features(needed, left, in_hand):
+    needed, left, in_hand = np.broadcast_arrays(needed, left, in_hand)
+    return np.stack([
+        np.ones(needed.shape),
+        needed / np.maximum(left, 1),
+        in_hand / WICKETS,
+        left / MAX_BALLS,
+    ], axis=-1)
+
+
+def _sigmoid(x):
+    return 1 / (1 + np.exp(-np.clip(x, -30, 30)))
+
+
+def coefficients(x, y):
+    """Logistic regression by Newton's method, with a ridge penalty towards PRIOR"""
+    beta = PRIOR.copy()
+    penalty = PRIOR_STRENGTH * np.eye(len(PRIOR))
+    for _ in range(ITERATIONS):
+        p = _sigmoid(x @ beta)
+        gradient = x.T @ (y - p) - penalty @ (beta - PRIOR)
+        hessian = (x * (p * (1 - p))[:, None]).T @ x + penalty
+        step = np.linalg.solve(hessian, gradient)
+        beta += step
+        if np.abs(step).max() < 1e-6:
+            break
+    return beta
+
+
+def fit(needed, left, in_hand, result):
+    """The full table from the historical states and results"""
+    beta = coefficients(features(needed, left, in_hand), result)
+
+    shape = (MAX_BALLS + 1, MAX_RUNS + 1, WICKETS + 1)
+    grid = np.ix_(np.arange(shape[0]), np.arange(shape[1]), np.arange(shape[2]))
+    model = _sigmoid(features(grid[1], grid[0], grid[2]) @ beta)
+
+    cells = np.ravel_multi_index((left, needed, in_hand), shape)
+    seen = np.bincount(cells, minlength=model.size).reshape(shape)
+    won = np.bincount(cells, weights=result, minlength=model.size).reshape(shape)
+    probability = (won + CELL_WEIGHT * model) / (seen + CELL_WEIGHT)
+
+    # Positions where the chase is already decided
+    probability[:, 0, :] = 1.0
+    probability[0, 1:, :] = 0.0
+    probability[:, 1:, 0] = 0.0
+    return probability.astype(np.float32)